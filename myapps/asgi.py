@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "myapps.settings")
 
 application = get_asgi_application()
+
+# 在同一個行程中處理背景工作（TASK_QUEUE["AUTOSTART"]，見 myapps/myapps/taskqueue.py）
+from myapps.myapps.taskqueue import autostart
+
+autostart()
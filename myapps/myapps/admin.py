@@ -43,7 +43,7 @@ class CourseAdmin(admin.ModelAdmin):
 
 @admin.register(Booking)
 class BookingAdmin(admin.ModelAdmin):
-    list_display = ["course", "student", "schedule_date", "status", "created_at"]
+    list_display = ["course", "student", "start_at", "end_at", "status", "created_at"]
     list_filter = ["status", "created_at"]
     search_fields = ["course__subject", "student__user__name"]
     ordering = ["-created_at"]
@@ -0,0 +1,368 @@
+"""
+教師儀表板統計
+
+每月各狀態的預約數、營收（已完成預約的課程價格總和）與評分趨勢若即時計算，
+每次查看都要對整張 ``bookings`` / ``reviews`` 做 GROUP BY。改為維護兩張每日統計表：
+
+- :class:`~myapps.myapps.models.BookingDailySummary`：
+  (教師, 日期, 課程, 狀態) 的預約數與價格總和
+- :class:`~myapps.myapps.models.ReviewDailySummary`：
+  (教師, 日期, 課程) 的評價數與評分總和
+
+預約與評價的 post_save / post_delete 訊號在同一個交易中以 ``F()``
+原子性地增減對應的一列，儀表板（``GET /api/teachers/{id}/analytics/``）只讀取統計表，
+查詢成本取決於期間長度而不是原始資料量。
+課程更換教師或修改價格時以單一 UPDATE 調整該課程的統計列；
+``bulk_create`` 等不觸發訊號的寫入之後請執行 ``python manage.py rebuild_analytics``。
+"""
+
+import datetime
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, FloatField, QuerySet, Sum, Value
+from django.db.models.functions import Cast, Coalesce, TruncDate, TruncMonth
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+MONTH_FORMAT = "%Y-%m"
+
+
+def _get_models():
+    """回傳 (Booking, Review, BookingDailySummary, ReviewDailySummary)"""
+    from django.apps import apps
+
+    return tuple(
+        apps.get_model("myapps", name)
+        for name in ("Booking", "Review", "BookingDailySummary", "ReviewDailySummary")
+    )
+
+
+def summary_day(moment):
+    """統計使用的日期（當地時間）"""
+    return timezone.localdate(moment)
+
+
+def _apply_delta(model, key, deltas):
+    """
+    以單一 UPDATE 調整統計列，不存在時建立；減少後數量歸零的列直接刪除
+
+    減少時不會建立新列：課程或教師連帶刪除時統計列可能已先被刪除。
+    """
+    updates = {name: F(name) + Value(delta) for name, delta in deltas.items()}
+    if deltas["count"] < 0:
+        model.objects.filter(**key).update(**updates)
+        model.objects.filter(**key, count=0).delete()
+        return
+    if model.objects.filter(**key).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**key, **deltas)
+    except IntegrityError:
+        # 其他請求同時建立了同一列
+        model.objects.filter(**key).update(**updates)
+
+
+def _course_info(course_id, course=None):
+    """課程的 (教師 ID, 價格)；已載入的課程不再查詢"""
+    if course is not None and course.pk == course_id:
+        return course.teacher_id, course.price
+    from .models import Course
+
+    return (
+        Course.objects.filter(pk=course_id).values_list("teacher_id", "price").first()
+    )
+
+
+def _booking_delta(course_id, status, day, sign, course=None):
+    from .models import BookingDailySummary
+
+    info = _course_info(course_id, course)
+    if info is None:
+        return
+    teacher_id, price = info
+    _apply_delta(
+        BookingDailySummary,
+        {
+            "teacher_id": teacher_id,
+            "course_id": course_id,
+            "day": day,
+            "status": status,
+        },
+        {"count": sign, "amount": price * sign},
+    )
+
+
+def _review_delta(course_id, day, rating_delta, count_delta, course=None):
+    from .models import ReviewDailySummary
+
+    info = _course_info(course_id, course)
+    if info is None:
+        return
+    _apply_delta(
+        ReviewDailySummary,
+        {"teacher_id": info[0], "course_id": course_id, "day": day},
+        {"count": count_delta, "rating_sum": float(rating_delta)},
+    )
+
+
+def _cached_course(instance):
+    field = instance._meta.get_field("course")
+    return instance.course if field.is_cached(instance) else None
+
+
+def booking_summary_key(booking):
+    """預約在統計表中的 (課程 ID, 狀態, 日期)"""
+    return (
+        booking.course_id,
+        booking.status,
+        summary_day(booking.start_at or booking.created_at),
+    )
+
+
+def record_booking_save(booking, created, snapshot):
+    """
+    依新增或修改的預約調整每日統計
+
+    ``snapshot`` 為修改前的 (課程 ID, 狀態, 開始時間, 建立時間)。
+    """
+    course = _cached_course(booking)
+    key = booking_summary_key(booking)
+    if created:
+        _booking_delta(*key, 1, course)
+        return
+    old_course_id, old_status, old_start_at, created_at = snapshot
+    old_key = (old_course_id, old_status, summary_day(old_start_at or created_at))
+    if old_key != key:
+        _booking_delta(*old_key, -1, course)
+        _booking_delta(*key, 1, course)
+
+
+def record_booking_delete(booking):
+    _booking_delta(*booking_summary_key(booking), -1, _cached_course(booking))
+
+
+def record_review_save(review, created, rating, snapshot):
+    """依新增或修改的評價調整每日統計，``snapshot`` 為修改前的 (課程 ID, 評分字串)"""
+    from .ratings import parse_rating
+
+    course = _cached_course(review)
+    day = summary_day(review.created_at)
+    if created:
+        _review_delta(review.course_id, day, rating, 1, course)
+        return
+    old_course_id, old_rating = snapshot
+    if old_course_id != review.course_id:
+        _review_delta(old_course_id, day, -parse_rating(old_rating), -1)
+        _review_delta(review.course_id, day, rating, 1, course)
+    elif parse_rating(old_rating) != rating:
+        _review_delta(review.course_id, day, rating - parse_rating(old_rating), 0)
+
+
+def record_review_delete(review, rating):
+    _review_delta(
+        review.course_id,
+        summary_day(review.created_at),
+        -rating,
+        -1,
+        _cached_course(review),
+    )
+
+
+def record_course_change(course):
+    """
+    課程更換教師或修改價格時調整該課程的統計列
+
+    同一門課程的預約價格相同，預約統計的金額即為數量乘以價格，不需要重新讀取預約與評價。
+    """
+    from .models import BookingDailySummary, ReviewDailySummary
+
+    BookingDailySummary.objects.filter(course_id=course.pk).update(
+        teacher_id=course.teacher_id, amount=F("count") * Value(course.price)
+    )
+    ReviewDailySummary.objects.filter(course_id=course.pk).update(
+        teacher_id=course.teacher_id
+    )
+
+
+def deleted_with_course(origin):
+    """刪除是否由課程或教師連帶引起（統計列會一併刪除，不需逐筆扣除）"""
+    from .models import Course, Teacher
+
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model in (Course, Teacher)
+
+
+def _grouped_bookings(booking_model):
+    day = TruncDate(Coalesce("start_at", "created_at"))
+    return (
+        booking_model.objects.order_by()
+        .values("course_id", "status", teacher=F("course__teacher_id"), day=day)
+        .annotate(count=Count("id"), amount=Sum("course__price"))
+    )
+
+
+def _grouped_reviews(review_model):
+    return (
+        review_model.objects.order_by()
+        .values(
+            "course_id",
+            teacher=F("course__teacher_id"),
+            day=TruncDate("created_at"),
+        )
+        .annotate(count=Count("id"), rating_sum=Sum(Cast("rating", FloatField())))
+    )
+
+
+def _rebuild(bookings, reviews, booking_summary, review_summary, batch_size):
+    booking_rows = [
+        booking_summary(
+            teacher_id=row["teacher"],
+            course_id=row["course_id"],
+            day=row["day"],
+            status=row["status"],
+            count=row["count"],
+            amount=row["amount"] or Decimal(0),
+        )
+        for row in bookings
+    ]
+    review_rows = [
+        review_summary(
+            teacher_id=row["teacher"],
+            course_id=row["course_id"],
+            day=row["day"],
+            count=row["count"],
+            rating_sum=row["rating_sum"] or 0.0,
+        )
+        for row in reviews
+    ]
+    booking_summary.objects.bulk_create(booking_rows, batch_size=batch_size)
+    review_summary.objects.bulk_create(review_rows, batch_size=batch_size)
+    return len(booking_rows), len(review_rows)
+
+
+@transaction.atomic
+def rebuild_summaries(batch_size=500):
+    """
+    以 GROUP BY 重建所有每日統計，回傳 (預約統計列數, 評價統計列數)
+
+    統計結果先全部取出（列數遠少於原始資料）再分批寫入，
+    避免在同一個 SQLite 連線上邊讀邊寫。
+    """
+    booking_model, review_model, booking_summary, review_summary = _get_models()
+    bookings = list(_grouped_bookings(booking_model))
+    reviews = list(_grouped_reviews(review_model))
+    booking_summary.objects.all().delete()
+    review_summary.objects.all().delete()
+    return _rebuild(bookings, reviews, booking_summary, review_summary, batch_size)
+
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def parse_month_range(params, max_months):
+    """解析 ``?from=`` / ``?to=``（YYYY-MM，皆包含），預設為包含本月的最近 12 個月"""
+    months = {}
+    for name in ("from", "to"):
+        value = params.get(name)
+        if not value:
+            continue
+        try:
+            months[name] = datetime.datetime.strptime(value, MONTH_FORMAT).date()
+        except ValueError:
+            raise ValidationError({name: "請使用 YYYY-MM 格式"})
+
+    end = months.get("to", timezone.localdate().replace(day=1))
+    start = months.get("from", _add_months(end, -11))
+    if end < start:
+        raise ValidationError({"to": "結束月份不可早於開始月份"})
+    if _add_months(start, max_months) <= end:
+        raise ValidationError({"to": f"查詢期間最多 {max_months} 個月"})
+    return start, end
+
+
+def teacher_dashboard(teacher_id, start, end, course_id=None):
+    """
+    教師在 ``start`` ～ ``end`` 月份（皆包含）的每月統計與合計
+
+    只讀取每日統計表，兩次 GROUP BY 查詢都使用 (teacher, day, ...) 唯一索引的範圍掃描。
+    """
+    from .models import Booking, BookingDailySummary, ReviewDailySummary
+
+    filters = {
+        "teacher_id": teacher_id,
+        "day__gte": start,
+        "day__lt": _add_months(end, 1),
+    }
+    if course_id is not None:
+        filters["course_id"] = course_id
+
+    statuses = [value for value, _ in Booking.STATUS_CHOICES]
+    months = {}
+    month = start
+    while month <= end:
+        months[month] = {
+            "bookings": dict.fromkeys(statuses, 0),
+            "revenue": Decimal(0),
+            "review_count": 0,
+            "rating_sum": 0.0,
+        }
+        month = _add_months(month, 1)
+
+    bookings = (
+        BookingDailySummary.objects.filter(**filters)
+        .order_by()
+        .values("status", month=TruncMonth("day"))
+        .annotate(count=Sum("count"), amount=Sum("amount"))
+    )
+    for row in bookings:
+        entry = months[row["month"]]
+        entry["bookings"][row["status"]] = row["count"]
+        if row["status"] == "completed":
+            entry["revenue"] = row["amount"]
+
+    reviews = (
+        ReviewDailySummary.objects.filter(**filters)
+        .order_by()
+        .values(month=TruncMonth("day"))
+        .annotate(count=Sum("count"), rating_sum=Sum("rating_sum"))
+    )
+    for row in reviews:
+        entry = months[row["month"]]
+        entry["review_count"], entry["rating_sum"] = row["count"], row["rating_sum"]
+
+    totals = {
+        "bookings": dict.fromkeys(statuses, 0),
+        "revenue": Decimal(0),
+        "review_count": 0,
+        "rating_sum": 0.0,
+    }
+    for entry in months.values():
+        for status, count in entry["bookings"].items():
+            totals["bookings"][status] += count
+        for name in ("revenue", "review_count", "rating_sum"):
+            totals[name] += entry[name]
+
+    return {
+        "from": start.strftime(MONTH_FORMAT),
+        "to": end.strftime(MONTH_FORMAT),
+        "months": [
+            {"month": month.strftime(MONTH_FORMAT), **_format_entry(entry)}
+            for month, entry in months.items()
+        ],
+        "totals": _format_entry(totals),
+    }
+
+
+def _format_entry(entry):
+    count = entry["review_count"]
+    return {
+        "bookings": entry["bookings"],
+        "total_bookings": sum(entry["bookings"].values()),
+        "revenue": str(Decimal(entry["revenue"]).quantize(Decimal("0.01"))),
+        "review_count": count,
+        "avg_rating": round(entry["rating_sum"] / count, 2) if count else None,
+    }
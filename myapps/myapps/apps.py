@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class MyappsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "myapps.myapps"
+
+    def ready(self):
+        # profiler 在連線建立時加上查詢記錄的 execute wrapper
+        from . import profiler, signals, tasks  # noqa: F401
@@ -0,0 +1,113 @@
+"""
+ASGI 部署的非同步唯讀端點
+
+DRF 的 ViewSet 都是同步的，在 ASGI 下每個請求都要經過 ``sync_to_async`` 在執行緒中處理。
+``/api/async/teachers/``、``/api/async/courses/``、``/api/async/bookings/`` 與其單筆端點
+改由原生的非同步視圖處理：查詢以 ``acount()`` / ``aiterator()`` / ``aget()`` 執行，
+篩選條件、``?fields=`` / ``?omit=`` 與序列化器沿用對應 ViewSet 的設定，
+回應內容與同步端點相同。
+
+非同步端點不經過回應快取與條件式請求（ETag），也不支援 ``?expand=`` 與游標分頁。
+``python manage.py bench_asgi`` 比較兩者在大量同時請求下的吞吐量與延遲。
+"""
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.http import HttpResponse
+from django.views import View
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from .fields import FieldSelection
+from .pagination import AsyncPageNumberPagination
+from .serializers import (
+    BookingValuesSerializer,
+    CourseListValuesSerializer,
+    TeacherListValuesSerializer,
+)
+from .views import BookingViewSet, CourseViewSet, TeacherViewSet
+
+
+class AsyncReadView(View):
+    """
+    ViewSet 的 ``list`` / ``retrieve`` 的非同步版本
+
+    ``viewset_class`` 提供查詢與單筆的序列化器（只用於不需要查詢資料庫的部分），
+    ``list_serializer_class`` 為列表使用的
+    :class:`~myapps.myapps.values.ValuesSerializer`。
+    """
+
+    viewset_class = None
+    list_serializer_class = None
+    pagination_class = AsyncPageNumberPagination
+    renderer = JSONRenderer()
+
+    async def get(self, request, pk=None):
+        request = Request(request)
+        try:
+            if pk is None:
+                data = await self.list(request)
+            else:
+                data = await self.retrieve(request, pk)
+        except APIException as exc:
+            detail = exc.detail
+            if not isinstance(detail, (dict, list)):
+                detail = {"detail": detail}
+            return self.render(detail, exc.status_code)
+        return self.render(data)
+
+    def get_viewset(self, request, action):
+        return self.viewset_class(
+            request=request,
+            action=action,
+            detail=action == "retrieve",
+            args=(),
+            kwargs={},
+            format_kwarg=None,
+        )
+
+    async def list(self, request):
+        viewset = self.get_viewset(request, "list")
+        selection = FieldSelection.from_request(request)
+        serializer_class = self.list_serializer_class
+        rows = serializer_class.values(viewset.get_queryset(), selection=selection)
+        paginator = self.pagination_class()
+        page = await paginator.apaginate_queryset(rows, request)
+        if page is None:
+            rows = [row async for row in rows.aiterator()]
+            return serializer_class(rows, many=True, selection=selection).data
+        data = serializer_class(page, many=True, selection=selection).data
+        return paginator.get_paginated_response(data).data
+
+    async def retrieve(self, request, pk):
+        viewset = self.get_viewset(request, "retrieve")
+        queryset = viewset.filter_queryset(viewset.get_queryset())
+        model = queryset.model
+        try:
+            instance = await queryset.aget(pk=pk)
+        except (model.DoesNotExist, TypeError, ValueError, DjangoValidationError):
+            # 與 get_object_or_404 相同的訊息
+            raise NotFound(f"No {model._meta.object_name} matches the given query.")
+        return viewset.get_serializer(instance).data
+
+    def render(self, data, status=200):
+        return HttpResponse(
+            self.renderer.render(data),
+            status=status,
+            content_type=self.renderer.media_type,
+        )
+
+
+class TeacherReadView(AsyncReadView):
+    viewset_class = TeacherViewSet
+    list_serializer_class = TeacherListValuesSerializer
+
+
+class CourseReadView(AsyncReadView):
+    viewset_class = CourseViewSet
+    list_serializer_class = CourseListValuesSerializer
+
+
+class BookingReadView(AsyncReadView):
+    viewset_class = BookingViewSet
+    list_serializer_class = BookingValuesSerializer
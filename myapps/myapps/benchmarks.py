@@ -0,0 +1,205 @@
+"""
+效能測試共用工具
+
+``bench_*`` 管理指令使用這裡的函式在獨立的測試資料庫中產生模擬資料並計時，
+不會動到 ``db.sqlite3`` 內的正式資料。
+"""
+
+import random
+import statistics
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db import connections
+
+SURNAMES = (
+    "王李張劉陳楊黃趙吳周徐孫馬朱胡郭何林高羅鄭梁謝宋唐許韓馮鄧曹彭曾蕭田董潘袁蔡蔣余"
+)
+GIVEN_NAME_CHARS = "小明華偉芳娟敏靜麗強磊軍洋勇豔傑娜濤超秀霞平剛桂英志家俊宇婷欣怡"
+SUBJECTS = [
+    "國中數學",
+    "高中數學",
+    "微積分",
+    "英文會話",
+    "多益衝刺",
+    "日文入門",
+    "物理",
+    "化學",
+    "生物",
+    "鋼琴",
+    "吉他",
+    "小提琴",
+    "Python 程式設計",
+    "JavaScript 入門",
+    "資料科學",
+    "國文作文",
+    "歷史",
+    "地理",
+    "素描",
+    "游泳",
+]
+PHRASES = [
+    "資深教師",
+    "教學經驗豐富",
+    "擅長引導學生思考",
+    "國立大學畢業",
+    "耐心細心",
+    "重視基礎觀念",
+    "升學考試衝刺",
+    "一對一家教",
+    "小班制教學",
+    "Python 與資料分析",
+    "English conversation",
+    "TOEIC 900",
+    "多年補習班經驗",
+    "讓學習變得有趣",
+    "課後提供練習題",
+]
+LOCATIONS = [
+    "台北市",
+    "新北市",
+    "桃園市",
+    "台中市",
+    "台南市",
+    "高雄市",
+    "新竹市",
+    "線上",
+]
+
+
+@contextmanager
+def isolated_database(alias="default", verbosity=0, name=None):
+    """
+    建立一個暫時的測試資料庫（SQLite 預設為記憶體資料庫），結束後自動刪除
+
+    ``name`` 指定測試資料庫名稱，例如需要 WAL 等檔案特性時傳入暫存檔路徑。
+    """
+    connection = connections[alias]
+    old_name = connection.settings_dict["NAME"]
+    test_settings = connection.settings_dict["TEST"]
+    old_test_name = test_settings["NAME"]
+    if name is not None:
+        test_settings["NAME"] = name
+    try:
+        connection.creation.create_test_db(
+            verbosity=verbosity, autoclobber=True, serialize=False
+        )
+        try:
+            yield connection
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+    finally:
+        test_settings["NAME"] = old_test_name
+
+
+def measure(func, repeat=5):
+    """執行 ``func`` 多次，回傳每次耗時（秒）"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def summarize(samples):
+    """回傳毫秒為單位的平均值、中位數與最大值"""
+    return {
+        "mean_ms": statistics.mean(samples) * 1000,
+        "median_ms": statistics.median(samples) * 1000,
+        "max_ms": max(samples) * 1000,
+    }
+
+
+def _sentence(rng, count):
+    return "，".join(rng.choice(PHRASES) for _ in range(count))
+
+
+def _name(rng):
+    return rng.choice(SURNAMES) + "".join(rng.choices(GIVEN_NAME_CHARS, k=2))
+
+
+def seed_teachers(count, batch_size=5000, seed=0):
+    """以 bulk_create 產生教師（與對應使用者），回傳教師 ID 清單"""
+    from .models import Teacher, User
+
+    rng = random.Random(seed)
+    start = User.objects.count()
+    for offset in range(0, count, batch_size):
+        size = min(batch_size, count - offset)
+        users = User.objects.bulk_create(
+            User(
+                name=_name(rng),
+                account=f"bench_teacher_{start + offset + i}",
+                password="x",
+                role="teacher",
+            )
+            for i in range(size)
+        )
+        Teacher.objects.bulk_create(
+            Teacher(
+                user=user,
+                name=user.name,
+                email=f"teacher{user.pk}@example.com",
+                phone="0912345678",
+                gender=rng.choice("MFO"),
+                age=str(rng.randint(22, 65)),
+                education=rng.choice(["學士", "碩士", "博士"]),
+                intro=_sentence(rng, 3),
+                teaching_experience=_sentence(rng, 6),
+                status=rng.choice(["active", "active", "inactive", "suspended"]),
+                blue_premium=rng.random() < 0.1,
+            )
+            for user in users
+        )
+    return list(Teacher.objects.values_list("id", flat=True))
+
+
+def seed_students(count, batch_size=5000, seed=1):
+    """以 bulk_create 產生學生（與對應使用者），回傳學生 ID 清單"""
+    from .models import Student, User
+
+    rng = random.Random(seed)
+    start = User.objects.count()
+    for offset in range(0, count, batch_size):
+        size = min(batch_size, count - offset)
+        users = User.objects.bulk_create(
+            User(
+                name=_name(rng),
+                account=f"bench_student_{start + offset + i}",
+                password="x",
+                role="student",
+            )
+            for i in range(size)
+        )
+        Student.objects.bulk_create(
+            Student(
+                user=user,
+                email=f"student{user.pk}@example.com",
+                gender=rng.choice("MFO"),
+                age=str(rng.randint(8, 40)),
+            )
+            for user in users
+        )
+    return list(Student.objects.values_list("id", flat=True))
+
+
+def seed_courses(count, teacher_ids, batch_size=5000, seed=2):
+    """以 bulk_create 產生課程，回傳課程 ID 清單"""
+    from .models import Course
+
+    rng = random.Random(seed)
+    for offset in range(0, count, batch_size):
+        size = min(batch_size, count - offset)
+        Course.objects.bulk_create(
+            Course(
+                subject=rng.choice(SUBJECTS),
+                teacher_id=rng.choice(teacher_ids),
+                description=_sentence(rng, 4),
+                price=Decimal(rng.randrange(300, 3000, 50)),
+                location=rng.choice(LOCATIONS),
+            )
+            for _ in range(size)
+        )
+    return list(Course.objects.values_list("id", flat=True))
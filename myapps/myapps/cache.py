@@ -0,0 +1,181 @@
+"""
+API 回應快取
+
+列表與單筆查詢的回應資料（序列化後的 ``response.data``）
+以「完整網址 + 正規化後的查詢參數」為鍵存入 ``settings.API_RESPONSE_CACHE["ALIAS"]``
+指定的快取（預設為具 LRU 淘汰與 TTL 的 LocMemCache）。
+
+失效方式採用「資料表版本」：每個模型在快取中有一個版本值，快取鍵包含該 ViewSet 所依賴的
+所有模型的版本。模型的 post_save / post_delete 訊號會更換版本值，依賴該模型的所有回應
+立即失效，舊的項目則由 LRU 自然淘汰。例如課程列表的 ``teacher_name`` 來自教師，
+因此課程 ViewSet 依賴 ``Teacher``，修改教師姓名會讓課程列表失效。
+
+LocMemCache 只在單一行程內有效；多個 worker 需共用快取與失效訊號時，請改用
+FileBasedCache 等共享的快取後端。``bulk_update`` 等不觸發訊號、在其他行程執行的批次指令
+（例如 ``geocode_courses``）也無法更換 worker 中的版本值，
+因此 ``cache_freshness_models`` 所列模型的 ``MAX(updated_at)``（以索引讀取）
+也納入快取鍵，批次指令寫入 ``updated_at`` 後所有 worker 的舊回應即不再使用。
+"""
+
+import hashlib
+import uuid
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Max
+from rest_framework.response import Response
+
+from .replicas import reading_from_replicas, snapshot_version
+
+DEFAULTS = {
+    "ENABLED": True,
+    "ALIAS": "api",
+    "TIMEOUT": 60,
+}
+
+# 快取命中統計使用的 ViewSet 命名空間
+CACHE_NAMESPACES = set()
+
+
+def get_setting(name):
+    return getattr(settings, "API_RESPONSE_CACHE", {}).get(name, DEFAULTS[name])
+
+
+def get_cache():
+    return caches[get_setting("ALIAS")]
+
+
+def _version_key(model):
+    return f"api:version:{model._meta.label_lower}"
+
+
+def get_versions(models):
+    """取得各模型目前的版本值，尚未建立的版本會以隨機值初始化"""
+    cache = get_cache()
+    keys = [_version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, uuid.uuid4().hex, None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def invalidate(*models):
+    """更換模型的版本值，讓依賴這些模型的快取回應全部失效"""
+    get_cache().set_many(
+        {_version_key(model): uuid.uuid4().hex for model in models}, None
+    )
+
+
+def latest_update(model):
+    """模型資料最後一次更新的時間（``MAX(updated_at)``）"""
+    return model.objects.aggregate(latest=Max("updated_at"))["latest"]
+
+
+def _record(namespace, outcome):
+    cache = get_cache()
+    key = f"api:stats:{namespace}:{outcome}"
+    if not cache.add(key, 1, None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, 1, None)
+
+
+def get_stats():
+    """回傳各 ViewSet 的快取命中與未命中次數"""
+    cache = get_cache()
+    namespaces = sorted(CACHE_NAMESPACES)
+    keys = [
+        f"api:stats:{namespace}:{outcome}"
+        for namespace in namespaces
+        for outcome in ("hit", "miss")
+    ]
+    counts = cache.get_many(keys)
+    stats = {}
+    for namespace in namespaces:
+        hits = counts.get(f"api:stats:{namespace}:hit", 0)
+        misses = counts.get(f"api:stats:{namespace}:miss", 0)
+        total = hits + misses
+        stats[namespace] = {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+        }
+    return stats
+
+
+class CachedResponseMixin:
+    """
+    為 ViewSet 的 ``list`` / ``retrieve`` 加上回應快取
+
+    ``cache_dependencies`` 列出序列化結果所依賴的模型，任何一個模型變更都會讓快取失效；
+    ``cache_freshness_models`` 列出會由其他行程批次更新的模型，
+    快取鍵另外包含其最後更新時間。
+    回應標頭 ``X-Cache`` 標示 HIT 或 MISS。
+    """
+
+    cache_dependencies = ()
+    cache_freshness_models = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.cache_dependencies:
+            CACHE_NAMESPACES.add(cls.get_cache_namespace())
+
+    @classmethod
+    def get_cache_namespace(cls):
+        return cls.queryset.model._meta.model_name
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def get_response_cache_key(self, request):
+        query = urlencode(
+            sorted(
+                (key, value)
+                for key, values in request.query_params.lists()
+                for value in values
+            )
+        )
+        # 分頁連結為絕對網址，因此鍵需包含主機名稱
+        url = f"{request.scheme}://{request.get_host()}{request.path}?{query}"
+        versions = ":".join(
+            get_versions(self.cache_dependencies)
+            + [str(latest_update(model)) for model in self.cache_freshness_models]
+        )
+        # 副本可能落後主資料庫，兩者的回應分開快取，
+        # 寫入後讀取主資料庫的客戶端不會拿到副本的舊資料；
+        # 副本的回應再依快照區分，重新同步後不再使用舊快照的回應
+        if reading_from_replicas():
+            source = f"replica:{snapshot_version()}"
+        else:
+            source = "primary"
+        digest = hashlib.sha256(f"{url}|{versions}|{source}".encode()).hexdigest()
+        return f"api:response:{self.get_cache_namespace()}:{self.action}:{digest}"
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if not get_setting("ENABLED") or not self.cache_dependencies:
+            return handler(request, *args, **kwargs)
+
+        namespace = self.get_cache_namespace()
+        cache = get_cache()
+        key = self.get_response_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            _record(namespace, "hit")
+            response = Response(data)
+            response["X-Cache"] = "HIT"
+            return response
+
+        _record(namespace, "miss")
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, get_setting("TIMEOUT"))
+        response["X-Cache"] = "MISS"
+        return response
@@ -0,0 +1,158 @@
+"""
+條件式請求（ETag / Last-Modified）
+
+所有模型都有 ``updated_at`` 欄位，驗證值不需要序列化回應內容即可算出：
+
+- 單筆資料：資料本身與 ``conditional_related`` 列出的關聯資料（皆已由 select_related
+  載入）的主鍵與 ``updated_at``
+- 列表：同一組篩選條件下的資料筆數、``MAX(updated_at)`` 以及關聯資料的
+  ``MAX(updated_at)``，以一次彙總查詢取得；網址（含分頁參數）也納入 ETag
+
+``If-None-Match`` / ``If-Modified-Since`` 符合時直接回傳 304，跳過查詢與序列化；
+PUT / PATCH / DELETE 帶有 ``If-Match`` 且與目前的 ETag 不符時回傳 412，
+可作為樂觀鎖，避免覆蓋他人已修改的資料。
+"""
+
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def _make_etag(parts):
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()
+    return quote_etag(digest)
+
+
+def _resolve(instance, path):
+    for attname in path.split("__"):
+        instance = getattr(instance, attname, None)
+        if instance is None:
+            return None
+    return instance
+
+
+class ConditionalRequestMixin:
+    """
+    為 ViewSet 加上 ETag / Last-Modified 與條件式請求處理
+
+    ``conditional_related`` 列出序列化結果會讀取的關聯路徑
+    （例如 ``"course__teacher"``），關聯資料更新時 ETag 也會改變。
+    """
+
+    conditional_related = ()
+
+    def get_object(self):
+        # 條件式判斷時已載入的資料，繼續沿用，避免重複查詢
+        instance = getattr(self, "_conditional_object", None)
+        if instance is not None:
+            return instance
+        return super().get_object()
+
+    def get_conditional_related(self):
+        return self.conditional_related
+
+    def get_object_validators(self, instance):
+        """回傳單筆資料的 (ETag, 最後修改時間)"""
+        parts = [instance._meta.label_lower, instance.pk, instance.updated_at]
+        timestamps = [instance.updated_at]
+        for path in self.get_conditional_related():
+            related = _resolve(instance, path)
+            if related is None:
+                parts.append(None)
+                continue
+            parts.extend([related.pk, related.updated_at])
+            timestamps.append(related.updated_at)
+        return _make_etag(parts), max(filter(None, timestamps), default=None)
+
+    def get_list_validators(self, request):
+        """回傳列表的 (ETag, 最後修改時間)，只執行一次彙總查詢"""
+        queryset = self.filter_queryset(self.get_queryset())
+        aggregates = {"count": Count("pk"), "updated_at": Max("updated_at")}
+        for index, path in enumerate(self.get_conditional_related()):
+            aggregates[f"related_{index}"] = Max(f"{path}__updated_at")
+        result = queryset.order_by().aggregate(**aggregates)
+        timestamps = [value for key, value in result.items() if key != "count"]
+        etag = _make_etag(
+            [request.get_full_path(), result["count"]]
+            + [timestamp.isoformat() if timestamp else None for timestamp in timestamps]
+        )
+        return etag, max(filter(None, timestamps), default=None)
+
+    def not_modified(self, request, etag, last_modified):
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match:
+            etags = parse_etags(if_none_match)
+            return "*" in etags or etag in etags
+        if_modified_since = request.headers.get("If-Modified-Since")
+        if if_modified_since and last_modified is not None:
+            since = parse_http_date_safe(if_modified_since)
+            return since is not None and int(last_modified.timestamp()) <= since
+        return False
+
+    def conditional_response(self, request, validators, handler, *args, **kwargs):
+        etag, last_modified = validators
+        if self.not_modified(request, etag, last_modified):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+        response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified.timestamp())
+        return response
+
+    def list(self, request, *args, **kwargs):
+        validators = self.get_list_validators(request)
+        return self.conditional_response(
+            request, validators, super().list, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        self._conditional_object = self.get_object()
+        validators = self.get_object_validators(self._conditional_object)
+        return self.conditional_response(
+            request, validators, super().retrieve, *args, **kwargs
+        )
+
+    def check_if_match(self, request):
+        """``If-Match`` 與目前的 ETag 不符時回傳 412 回應，否則回傳 None"""
+        if_match = request.headers.get("If-Match")
+        if not if_match:
+            return None
+        self._conditional_object = self.get_object()
+        etag, _ = self.get_object_validators(self._conditional_object)
+        etags = parse_etags(if_match)
+        if "*" in etags or etag in etags:
+            return None
+        response = Response(
+            {"detail": "資料已被修改，請重新取得最新資料後再更新"},
+            status=status.HTTP_412_PRECONDITION_FAILED,
+        )
+        response["ETag"] = etag
+        return response
+
+    def update(self, request, *args, **kwargs):
+        failed = self.check_if_match(request)
+        if failed is not None:
+            return failed
+        response = super().update(request, *args, **kwargs)
+        instance = getattr(self, "_conditional_object", None)
+        if response.status_code == status.HTTP_200_OK and instance is not None:
+            etag, last_modified = self.get_object_validators(instance)
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(last_modified.timestamp())
+        return response
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        self._conditional_object = serializer.instance
+
+    def destroy(self, request, *args, **kwargs):
+        failed = self.check_if_match(request)
+        if failed is not None:
+            return failed
+        return super().destroy(request, *args, **kwargs)
@@ -0,0 +1,125 @@
+"""
+關聯資料展開（``?expand=``）
+
+例如 ``/api/bookings/?expand=course.teacher,student.user`` 會把 ``course`` / ``student``
+欄位從 ID 換成完整的巢狀資料（``course`` 內的 ``teacher`` 也一併展開），
+用戶端不需要再逐筆查詢關聯資料。
+
+可展開的欄位由序列化器的 ``expandable_fields`` 宣告（欄位名稱 -> 序列化器類別），
+序列化器原本沒有的欄位（例如課程列表的 ``teacher``）展開時會加入。
+需要的 ``select_related`` / ``prefetch_related`` 由展開後的序列化器樹推導，
+不論資料有幾筆，查詢次數都固定。
+"""
+
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+
+from .fields import FieldSelection
+
+
+def parse_expand(value):
+    """``"course.teacher,student"`` -> ``{"course": {"teacher": {}}, "student": {}}``"""
+    tree = {}
+    for path in value.split(","):
+        node = tree
+        for name in path.strip().split("."):
+            if name:
+                node = node.setdefault(name, {})
+    return tree
+
+
+def validate_expand(serializer_class, tree, prefix=""):
+    expandable = getattr(serializer_class, "expandable_fields", {})
+    for name, subtree in tree.items():
+        if name not in expandable:
+            available = ", ".join(expandable) or "無"
+            raise ValidationError(
+                {"expand": f"無法展開 {prefix}{name}（可展開：{available}）"}
+            )
+        validate_expand(expandable[name], subtree, f"{prefix}{name}.")
+
+
+def expand_serializer(serializer, tree, selection=None):
+    """
+    以巢狀序列化器取代（或加入）``tree`` 中的欄位
+
+    ``selection`` 為頂層的 ``?fields=`` / ``?omit=``，未選取的欄位不會展開。
+    """
+    expandable = getattr(type(serializer), "expandable_fields", {})
+    for name, subtree in tree.items():
+        if selection is not None and not selection.includes(name):
+            continue
+        nested = expandable[name](read_only=True)
+        serializer.fields[name] = nested
+        expand_serializer(nested, subtree)
+
+
+def related_paths(serializer, prefix=""):
+    """回傳序列化器樹需要的 (select_related 路徑, prefetch_related 路徑)"""
+    select, prefetch = set(), set()
+    for field in serializer.fields.values():
+        if field.write_only or field.source == "*":
+            continue
+        path = prefix + "__".join(field.source_attrs)
+        if isinstance(field, serializers.ListSerializer):
+            prefetch.add(path)
+            child_select, child_prefetch = related_paths(field.child, f"{path}__")
+            prefetch |= child_select | child_prefetch
+        elif isinstance(field, serializers.Serializer):
+            select.add(path)
+            child_select, child_prefetch = related_paths(field, f"{path}__")
+            select |= child_select
+            prefetch |= child_prefetch
+        elif len(field.source_attrs) > 1:
+            select.add(prefix + "__".join(field.source_attrs[:-1]))
+    return select, prefetch
+
+
+class ExpandMixin:
+    """
+    為 ViewSet 的 ``list`` / ``retrieve`` 加上 ``?expand=``
+
+    展開的關聯資料也會納入條件式請求（ETag）的關聯路徑。
+    """
+
+    expand_actions = ("list", "retrieve")
+
+    def get_expand_tree(self):
+        request = self.request
+        if (
+            request is None
+            or request.method not in SAFE_METHODS
+            or self.action not in self.expand_actions
+        ):
+            return {}
+        tree = parse_expand(request.query_params.get("expand", ""))
+        validate_expand(self.get_serializer_class(), tree)
+        return tree
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        tree = self.get_expand_tree()
+        if tree:
+            target = getattr(serializer, "child", serializer)
+            expand_serializer(target, tree, FieldSelection.from_request(self.request))
+        return serializer
+
+    def get_expanded_paths(self):
+        if not self.get_expand_tree():
+            return set(), set()
+        return related_paths(self.get_serializer())
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        select, prefetch = self.get_expanded_paths()
+        if select:
+            queryset = queryset.select_related(*sorted(select))
+        if prefetch:
+            queryset = queryset.prefetch_related(*sorted(prefetch))
+        return queryset
+
+    def get_conditional_related(self):
+        related = list(super().get_conditional_related())
+        select, _ = self.get_expanded_paths()
+        return related + sorted(select - set(related))
@@ -0,0 +1,125 @@
+"""
+課程的分面搜尋
+
+``GET /api/courses/faceted/`` 以 ``price_min`` / ``price_max``、``location``、
+``min_rating``、``subject`` 篩選課程並排序，回應除了分頁結果之外還有目前篩選條件下的
+分面統計：
+
+- ``price``：依 :data:`PRICE_BUCKETS` 分段的價格分布
+- ``location``：各上課地點的課程數
+- ``rating``：平均評分達到 :data:`RATING_BANDS` 各門檻的課程數
+  （與 ``min_rating`` 的篩選方式相同）
+
+三種分面由同一個查詢取得：依地點 GROUP BY，價格區間與評分門檻以條件式 COUNT 一併計算，
+再於 Python 中加總各地點的結果，不需要每個分面各查詢一次。
+"""
+
+import itertools
+import math
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Count, Q
+from rest_framework.exceptions import ValidationError
+
+# 價格區間的分界（最後一段沒有上限）
+PRICE_BUCKETS = (500, 1000, 1500, 2000, 3000)
+# 平均評分門檻
+RATING_BANDS = (4.5, 4.0, 3.5, 3.0)
+
+# ?ordering= 可用的值 -> order_by 參數（皆以 id 作為同值時的排序）
+ORDERINGS = {
+    "price": ("price", "id"),
+    "-price": ("-price", "-id"),
+    "rating": ("avg_rating", "id"),
+    "-rating": ("-avg_rating", "-id"),
+    "created_at": ("created_at", "id"),
+    "-created_at": ("-created_at", "-id"),
+    # 排行榜使用的貝氏加權評分
+    "recommended": ("-rating_score", "-id"),
+}
+DEFAULT_ORDERING = "-created_at"
+
+
+def _parse_number(params, name, parse):
+    value = params.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        number = parse(value)
+        # NaN / Infinity 無法比較大小，也不能寫入 SQL 條件
+        finite = math.isfinite(number)
+    except (ValueError, InvalidOperation):
+        finite = False
+    if not finite:
+        raise ValidationError({name: "請輸入數字"})
+    return number
+
+
+def filter_courses(queryset, params):
+    """依查詢參數篩選課程，``location`` 可以逗號分隔多個地點"""
+    price_min = _parse_number(params, "price_min", Decimal)
+    price_max = _parse_number(params, "price_max", Decimal)
+    min_rating = _parse_number(params, "min_rating", float)
+    if price_min is not None and price_max is not None and price_max < price_min:
+        raise ValidationError({"price_max": "不可小於 price_min"})
+
+    if price_min is not None:
+        queryset = queryset.filter(price__gte=price_min)
+    if price_max is not None:
+        queryset = queryset.filter(price__lte=price_max)
+    if min_rating is not None:
+        queryset = queryset.filter(avg_rating__gte=min_rating)
+    locations = [value for value in params.get("location", "").split(",") if value]
+    if locations:
+        queryset = queryset.filter(location__in=locations)
+    if params.get("subject"):
+        queryset = queryset.filter(subject=params["subject"])
+    if params.get("teacher_id"):
+        queryset = queryset.filter(teacher_id=params["teacher_id"])
+    return queryset
+
+
+def order_courses(queryset, params):
+    ordering = params.get("ordering") or DEFAULT_ORDERING
+    if ordering not in ORDERINGS:
+        raise ValidationError({"ordering": f"可用的排序：{'、'.join(ORDERINGS)}"})
+    return queryset.order_by(*ORDERINGS[ordering])
+
+
+def _price_ranges():
+    bounds = (0, *PRICE_BUCKETS, None)
+    return list(itertools.pairwise(bounds))
+
+
+def course_facets(queryset):
+    """以單一 GROUP BY 查詢計算價格、地點與評分的分面統計"""
+    ranges = _price_ranges()
+    aggregates = {"total": Count("id")}
+    for index, (low, high) in enumerate(ranges):
+        condition = Q(price__gte=low)
+        if high is not None:
+            condition &= Q(price__lt=high)
+        aggregates[f"price_{index}"] = Count("id", filter=condition)
+    for index, threshold in enumerate(RATING_BANDS):
+        aggregates[f"rating_{index}"] = Count("id", filter=Q(avg_rating__gte=threshold))
+
+    rows = list(queryset.order_by().values("location").annotate(**aggregates))
+    rows.sort(key=lambda row: (-row["total"], row["location"]))
+    return {
+        "price": [
+            {
+                "min": low,
+                "max": high,
+                "count": sum(row[f"price_{index}"] for row in rows),
+            }
+            for index, (low, high) in enumerate(ranges)
+        ],
+        "location": [{"value": row["location"], "count": row["total"]} for row in rows],
+        "rating": [
+            {
+                "min_rating": threshold,
+                "count": sum(row[f"rating_{index}"] for row in rows),
+            }
+            for index, threshold in enumerate(RATING_BANDS)
+        ],
+    }
@@ -0,0 +1,173 @@
+"""
+稀疏欄位（``?fields=`` / ``?omit=``）
+
+GET 請求可以只取需要的欄位，例如 ``/api/teachers/1/?fields=id,name`` 或
+``/api/teachers/?omit=intro,teaching_experience``：
+
+- 序列化器移除未選取的欄位，不再逐筆呼叫其 ``to_representation``
+- 查詢改用 ``.only()`` 只讀取剩下欄位對應的資料行，並移除已不需要的 ``select_related``
+  JOIN（例如只取 ``id,name`` 時教師不再 JOIN 使用者資料表）
+
+欄位名稱以該端點序列化器的欄位為準，不存在的欄位回傳 400。
+"""
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+
+
+def _split(value):
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+class FieldSelection:
+    """請求指定的欄位（``fields`` 為 None 表示全部）與要排除的欄位"""
+
+    def __init__(self, fields=None, omit=()):
+        self.fields = fields
+        self.omit = list(omit)
+
+    @classmethod
+    def from_request(cls, request):
+        """非 GET 請求或未指定任何欄位（包含空白的 ``?fields=``）時回傳 None"""
+        if request is None or request.method not in SAFE_METHODS:
+            return None
+        params = request.query_params
+        fields = _split(params.get("fields", "")) or None
+        omit = _split(params.get("omit", ""))
+        if fields is None and not omit:
+            return None
+        return cls(fields, omit)
+
+    def includes(self, name):
+        return (self.fields is None or name in self.fields) and name not in self.omit
+
+    def apply(self, names, expandable=()):
+        """
+        依序列化器原本的欄位順序回傳保留的欄位名稱
+
+        ``expandable`` 為可用 ``?expand=`` 加入的欄位，指定這些名稱不視為錯誤。
+        """
+        names = list(names)
+        unknown = [
+            name
+            for name in (self.fields or []) + self.omit
+            if name not in names and name not in expandable
+        ]
+        if unknown:
+            message = (
+                f"未知的欄位：{', '.join(unknown)}（可用欄位：{', '.join(names)}）"
+            )
+            raise ValidationError({"fields": message})
+        if self.fields is not None:
+            names = [name for name in names if name in self.fields]
+        return [name for name in names if name not in self.omit]
+
+
+def _serializer_paths(serializer, prefix=()):
+    """
+    序列化器（含 ``?expand=`` 展開的巢狀序列化器）各欄位對應的 ORM 路徑，
+    例如 ``teacher.name`` -> ``["teacher", "name"]``；無法對應到資料行的欄位為 None
+    """
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if field.source == "*" or isinstance(
+            field,
+            (
+                serializers.SerializerMethodField,
+                serializers.ManyRelatedField,
+                serializers.ListSerializer,
+            ),
+        ):
+            yield None
+            continue
+        attrs = [*prefix, *field.source_attrs]
+        if isinstance(field, serializers.Serializer):
+            yield from _serializer_paths(field, attrs)
+        else:
+            yield attrs
+
+
+def plan_queryset(queryset, serializer, required=()):
+    """
+    依序列化器剩下的欄位調整查詢：``.only()`` 需要的資料行，``select_related`` 只保留
+    需要的關聯
+
+    ``required`` 為序列化以外仍需讀取的 ORM 路徑（例如條件式請求用的 ``updated_at``）。
+    遇到無法對應到資料行的欄位（例如 property 或 SerializerMethodField）時不調整查詢。
+    """
+    model = queryset.model
+    only = {model._meta.pk.name}
+    related = set()
+    paths = list(_serializer_paths(serializer))
+    paths += [path.split("__") for path in required]
+    for attrs in paths:
+        if not attrs:
+            return queryset
+        current, walked = model, []
+        for index, attname in enumerate(attrs):
+            try:
+                model_field = current._meta.get_field(attname)
+            except FieldDoesNotExist:
+                return queryset
+            walked.append(attname)
+            if index == len(attrs) - 1:
+                break
+            if not (model_field.many_to_one or model_field.one_to_one):
+                return queryset
+            if not model_field.concrete:
+                # 反向一對一關聯無法使用 only()
+                return queryset
+            # select_related 經過的外鍵本身不能被延遲載入
+            related.add("__".join(walked))
+            only.add("__".join(walked))
+            current = model_field.related_model
+        only.add("__".join(walked))
+
+    if queryset.query.select_related is not False:
+        queryset = queryset.select_related(None)
+    if related:
+        queryset = queryset.select_related(*related)
+    return queryset.only(*only)
+
+
+class SparseFieldsMixin:
+    """
+    為 ViewSet 加上 ``?fields=`` / ``?omit=``
+
+    ``list`` / ``retrieve`` 會移除序列化器欄位並調整查詢；
+    使用 :class:`~myapps.myapps.values.ValuesSerializer` 的端點（快速列表、匯出）
+    另外直接套用。
+    """
+
+    sparse_actions = ("list", "retrieve")
+
+    def get_field_selection(self):
+        return FieldSelection.from_request(self.request)
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        selection = self.get_field_selection()
+        if selection is not None and self.action in self.sparse_actions:
+            target = getattr(serializer, "child", serializer)
+            expandable = getattr(target, "expandable_fields", {})
+            keep = set(selection.apply(target.fields, expandable))
+            for name in list(target.fields):
+                if name not in keep:
+                    del target.fields[name]
+        return serializer
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        selection = self.get_field_selection()
+        if selection is None or self.action not in self.sparse_actions:
+            return queryset
+        required = []
+        if self.detail and hasattr(self, "get_conditional_related"):
+            # 單筆資料的 ETag 需要本身與關聯資料的 updated_at
+            required.append("updated_at")
+            for path in self.get_conditional_related():
+                required.append(f"{path}__updated_at")
+        return plan_queryset(queryset, self.get_serializer(), required)
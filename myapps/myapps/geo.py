@@ -0,0 +1,241 @@
+"""
+依座標搜尋附近的課程
+
+課程的 ``latitude`` / ``longitude`` 另外存成 :data:`GEOHASH_PRECISION` 碼的 geohash
+並建立索引。geohash 的前綴即為一個網格：
+``GET /api/courses/nearby/?near=緯度,經度&radius=公里`` 先計算涵蓋查詢範圍外接矩形的網格
+（最多 :data:`MAX_CELLS` 個），每個網格都是 geohash 索引上的一段範圍掃描，
+再以外接矩形與 haversine 距離精確篩選並依距離排序。
+
+``Course.location`` 是自由輸入的文字，``python manage.py geocode_courses`` 以本機的
+地名對照檔（預設為 :data:`DEFAULT_GAZETTEER`，各縣市的行政中心）填入座標，不需要連線。
+"""
+
+import csv
+import math
+from pathlib import Path
+
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+# 儲存的 geohash 長度（約 5 公尺見方）
+GEOHASH_PRECISION = 9
+# 涵蓋查詢範圍時最多使用的網格數
+MAX_CELLS = 16
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+DEFAULT_RADIUS_KM = 5
+MAX_RADIUS_KM = 100
+
+DEFAULT_GAZETTEER = Path(__file__).resolve().parent / "data" / "gazetteer_tw.csv"
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """座標的 geohash（經度與緯度的二分位元交錯，每 5 位元一碼）"""
+    bounds = [[-90.0, 90.0], [-180.0, 180.0]]
+    value = (latitude, longitude)
+    chars, bits, code, is_longitude = [], 0, 0, True
+    while len(chars) < precision:
+        low, high = bounds[is_longitude]
+        middle = (low + high) / 2
+        code <<= 1
+        if value[is_longitude] >= middle:
+            code |= 1
+            bounds[is_longitude][0] = middle
+        else:
+            bounds[is_longitude][1] = middle
+        is_longitude = not is_longitude
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[code])
+            bits, code = 0, 0
+    return "".join(chars)
+
+
+def course_geohash(latitude, longitude):
+    """課程 ``geohash`` 欄位的值，沒有座標時為空字串"""
+    if latitude is None or longitude is None:
+        return ""
+    return encode_geohash(latitude, longitude)
+
+
+def cell_size(precision):
+    """``precision`` 碼 geohash 網格的 (緯度高, 經度寬)（度）"""
+    bits = 5 * precision
+    return 180 / 2 ** (bits // 2), 360 / 2 ** ((bits + 1) // 2)
+
+
+def bounding_box(latitude, longitude, radius):
+    """
+    距離 ``radius`` 公里以內的 (最小緯度, 最小經度, 最大緯度, 最大經度)，不跨越換日線
+    """
+    delta_latitude = radius / KM_PER_DEGREE
+    delta_longitude = radius / (
+        KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01)
+    )
+    return (
+        max(latitude - delta_latitude, -90.0),
+        max(longitude - delta_longitude, -180.0),
+        min(latitude + delta_latitude, 90.0),
+        min(longitude + delta_longitude, 180.0),
+    )
+
+
+def covering_cells(box):
+    """涵蓋外接矩形的 geohash 網格，使用網格數不超過 :data:`MAX_CELLS` 的最長前綴"""
+    south, west, north, east = box
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        rows = range(
+            math.floor((south + 90) / height), math.floor((north + 90) / height) + 1
+        )
+        columns = range(
+            math.floor((west + 180) / width), math.floor((east + 180) / width) + 1
+        )
+        if len(rows) * len(columns) <= MAX_CELLS or precision == 1:
+            break
+    # 以每個網格的中心點求出前綴（超出範圍的列與欄會落在邊界的網格）
+    return sorted(
+        {
+            encode_geohash(
+                min((row + 0.5) * height - 90, 90.0),
+                min((column + 0.5) * width - 180, 180.0),
+                precision,
+            )
+            for row in rows
+            for column in columns
+        }
+    )
+
+
+def haversine(latitude, longitude, other_latitude, other_longitude):
+    """兩點間的大圓距離（公里）"""
+    phi, other_phi = math.radians(latitude), math.radians(other_latitude)
+    value = (
+        math.sin((other_phi - phi) / 2) ** 2
+        + math.cos(phi)
+        * math.cos(other_phi)
+        * math.sin(math.radians(other_longitude - longitude) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(value)))
+
+
+def distance_expression(latitude, longitude):
+    """課程與 (``latitude``, ``longitude``) 的 haversine 距離（公里）的 SQL 運算式"""
+    phi = Radians("latitude")
+    origin = math.radians(latitude)
+    value = Power(Sin((phi - Value(origin)) / 2), 2) + Value(math.cos(origin)) * Cos(
+        phi
+    ) * Power(Sin(Radians(F("longitude") - Value(longitude)) / 2), 2)
+    return Value(2 * EARTH_RADIUS_KM) * ASin(Sqrt(value), output_field=FloatField())
+
+
+def nearby_courses(queryset, latitude, longitude, radius):
+    """
+    ``radius`` 公里內的課程，依距離（``distance``，公里）由近到遠排序
+
+    先以 geohash 網格範圍與外接矩形縮小候選課程，只對候選課程計算距離。
+    """
+    box = bounding_box(latitude, longitude, radius)
+    cells = Q()
+    for cell in covering_cells(box):
+        # geohash 字元都小於 "~"，前綴查詢改寫為索引可用的範圍條件
+        cells |= Q(geohash__gte=cell, geohash__lt=cell + "~")
+    south, west, north, east = box
+    return (
+        queryset.filter(cells)
+        .filter(
+            latitude__gte=south,
+            latitude__lte=north,
+            longitude__gte=west,
+            longitude__lte=east,
+        )
+        .annotate(distance=distance_expression(latitude, longitude))
+        .filter(distance__lte=radius)
+        .order_by("distance", "id")
+    )
+
+
+def parse_near(params):
+    """解析 ``?near=緯度,經度`` 與 ``?radius=``（公里），回傳 (緯度, 經度, 半徑)"""
+    try:
+        latitude, longitude = (
+            float(value) for value in params.get("near", "").split(",")
+        )
+    except ValueError:
+        raise ValidationError({"near": "請使用「緯度,經度」格式"})
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValidationError({"near": "座標超出範圍"})
+    try:
+        radius = float(params.get("radius") or DEFAULT_RADIUS_KM)
+    except ValueError:
+        radius = 0
+    if not 0 < radius <= MAX_RADIUS_KM:
+        raise ValidationError({"radius": f"請輸入 0 ～ {MAX_RADIUS_KM} 公里"})
+    return latitude, longitude, radius
+
+
+def normalize_place(name):
+    return name.strip().replace("臺", "台").replace(" ", "")
+
+
+def load_gazetteer(path=DEFAULT_GAZETTEER):
+    """讀取 ``name,latitude,longitude`` 格式的 CSV，回傳 {正規化地名: (緯度, 經度)}"""
+    with open(path, newline="", encoding="utf-8") as file:
+        return {
+            normalize_place(row["name"]): (
+                float(row["latitude"]),
+                float(row["longitude"]),
+            )
+            for row in csv.DictReader(file)
+            if row.get("name")
+        }
+
+
+def geocode(location, gazetteer):
+    """
+    自由輸入的地點對應的 (緯度, 經度)，找不到時回傳 None
+
+    完全相符優先，否則使用地點中包含的最長地名（「台北市大安區」優先於「台北市」）。
+    """
+    place = normalize_place(location or "")
+    if not place:
+        return None
+    if place in gazetteer:
+        return gazetteer[place]
+    matches = [name for name in gazetteer if name in place]
+    return gazetteer[max(matches, key=len)] if matches else None
+
+
+def geocode_courses(gazetteer, overwrite=False, batch_size=500):
+    """以地名對照填入課程座標，回傳 (更新的課程數, 無法對應的課程數)"""
+    from .models import Course
+
+    queryset = Course.objects.only("pk", "location", "latitude", "longitude")
+    if not overwrite:
+        queryset = queryset.filter(latitude__isnull=True)
+    # 先取出再分批寫回，避免在同一個 SQLite 連線上邊讀邊寫
+    changed, missing = [], 0
+    # bulk_update 不會自動更新 auto_now 欄位，
+    # 需一併寫入 updated_at 讓 ETag 與回應快取改變
+    now = timezone.now()
+    for course in queryset.order_by("pk"):
+        point = geocode(course.location, gazetteer)
+        if point is None:
+            missing += 1
+            continue
+        if point != (course.latitude, course.longitude):
+            course.latitude, course.longitude = point
+            course.geohash = course_geohash(*point)
+            course.updated_at = now
+            changed.append(course)
+    Course.objects.bulk_update(
+        changed,
+        ["latitude", "longitude", "geohash", "updated_at"],
+        batch_size=batch_size,
+    )
+    return len(changed), missing
@@ -0,0 +1,161 @@
+"""
+課程排行榜
+
+直接依 ``avg_rating`` 排序會讓只有一則五星評價的課程排在最前面。課程改為儲存兩個分數，
+由 ``python manage.py recompute_leaderboard`` 批次重新計算：
+
+- ``rating_score``：貝氏加權平均評分 ``(C × m + 評分總和) / (C + 評價數)``，
+  ``m`` 為全站平均評分、``C`` 為 ``PRIOR_WEIGHT``，評價越少越接近全站平均；
+  沒有評價的課程為 0
+- ``trending_score``：最近 ``TRENDING_DAYS`` 天內建立的預約（已取消除外），
+  每筆依建立日期以 ``TRENDING_HALF_LIFE_DAYS`` 為半衰期遞減後加總
+
+藍鑽會員教師的課程兩個分數皆乘上 ``PREMIUM_BOOST``。
+
+``GET /api/courses/top_rated/`` 與 ``GET /api/courses/trending/`` 以 (分數, id)
+游標分頁，可依 ``subject`` / ``location`` 篩選，每頁都是對應索引的有序範圍讀取，
+不需要排序。
+"""
+
+import datetime
+import math
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .pagination import KeysetPagination
+
+DEFAULTS = {
+    # 貝氏平均的先驗權重（相當於幾則全站平均評分的評價）
+    "PRIOR_WEIGHT": 10,
+    # 藍鑽會員教師的分數倍率
+    "PREMIUM_BOOST": 1.05,
+    "TRENDING_DAYS": 28,
+    "TRENDING_HALF_LIFE_DAYS": 7,
+}
+
+# 排行榜名稱 -> 分數欄位
+BOARDS = {"top_rated": "rating_score", "trending": "trending_score"}
+# 可篩選的欄位（各有 (欄位, 分數, id) 索引）
+FILTERS = ("subject", "location")
+
+# 不計入熱門度的預約狀態
+INACTIVE_STATUSES = ("cancelled",)
+
+
+def get_setting(name):
+    return getattr(settings, "LEADERBOARD", {}).get(name, DEFAULTS[name])
+
+
+def bayesian_score(rating_sum, rating_count, prior_mean, prior_weight):
+    """貝氏加權平均評分，沒有評價時為 0"""
+    if not rating_count:
+        return 0.0
+    return (prior_weight * prior_mean + rating_sum) / (prior_weight + rating_count)
+
+
+def trending_scores(now=None):
+    """
+    回傳 {課程 ID: 熱門度}
+
+    以 ``(created_at, id)`` 索引只讀取最近的預約，
+    依課程與建立日期彙總後在 Python 中計算衰減。
+    """
+    from .models import Booking
+
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+    half_life = get_setting("TRENDING_HALF_LIFE_DAYS")
+    rows = (
+        Booking.objects.filter(
+            created_at__gte=now - datetime.timedelta(days=get_setting("TRENDING_DAYS"))
+        )
+        .exclude(status__in=INACTIVE_STATUSES)
+        .order_by()
+        .values("course_id", day=TruncDate("created_at"))
+        .annotate(count=Count("id"))
+    )
+    scores = defaultdict(float)
+    for row in rows:
+        age = (today - row["day"]).days
+        scores[row["course_id"]] += row["count"] * math.pow(0.5, age / half_life)
+    return scores
+
+
+def recompute_scores(batch_size=500):
+    """重新計算所有課程的排行分數，只寫回有變動的課程，回傳更新的課程數量"""
+    from .models import Course
+
+    totals = Course.objects.aggregate(
+        rating_sum=Sum("rating_sum"), rating_count=Sum("rating_count")
+    )
+    prior_mean = (
+        totals["rating_sum"] / totals["rating_count"] if totals["rating_count"] else 0.0
+    )
+    prior_weight = get_setting("PRIOR_WEIGHT")
+    boost = get_setting("PREMIUM_BOOST")
+    trending = trending_scores()
+
+    # 先取出需要變更的課程再分批寫回，避免在同一個 SQLite 連線上邊讀邊寫；
+    # bulk_update 不會自動更新 auto_now 欄位，
+    # 需一併寫入 updated_at 讓 ETag 與回應快取改變
+    changed = []
+    now = timezone.now()
+    for row in Course.objects.values_list(
+        "id",
+        "rating_sum",
+        "rating_count",
+        "teacher__blue_premium",
+        "rating_score",
+        "trending_score",
+    ):
+        pk, rating_sum, rating_count, premium, old_rating, old_trending = row
+        factor = boost if premium else 1.0
+        rating_score = round(
+            bayesian_score(rating_sum, rating_count, prior_mean, prior_weight) * factor,
+            6,
+        )
+        trending_score = round(trending.get(pk, 0.0) * factor, 6)
+        if (old_rating, old_trending) != (rating_score, trending_score):
+            changed.append(
+                Course(
+                    pk=pk,
+                    rating_score=rating_score,
+                    trending_score=trending_score,
+                    updated_at=now,
+                )
+            )
+
+    Course.objects.bulk_update(
+        changed,
+        ["rating_score", "trending_score", "updated_at"],
+        batch_size=batch_size,
+    )
+    return len(changed)
+
+
+def leaderboard_queryset(queryset, params):
+    """依 ``?subject=`` / ``?location=`` 篩選（完全相符）"""
+    for name in FILTERS:
+        value = params.get(name)
+        if value:
+            queryset = queryset.filter(**{name: value})
+    return queryset
+
+
+class LeaderboardPagination(KeysetPagination):
+    """以 ``(分數, id)`` 複合鍵由高到低排序的游標分頁"""
+
+    def __init__(self, score_field):
+        # 沿用 KeysetPagination 的游標欄位，只是改為分數
+        self.time_field = score_field
+        self.ordering = (f"-{score_field}", "-id")
+
+    def parse_position(self, value):
+        return float(value)
+
+    def format_position(self, value):
+        return repr(float(value))
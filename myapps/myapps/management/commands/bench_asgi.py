@@ -0,0 +1,181 @@
+import asyncio
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import override_settings
+
+from myapps.myapps.benchmarks import (
+    isolated_database,
+    seed_courses,
+    seed_students,
+    seed_teachers,
+)
+
+HOST = "bench.local"
+RESOURCES = ("teachers", "courses", "bookings")
+
+
+class Command(BaseCommand):
+    help = (
+        "在同一個行程中以大量同時請求呼叫 ASGI 應用程式，"
+        "比較同步 ViewSet 與非同步端點的每秒請求數與延遲"
+        "（在暫時的檔案資料庫中執行，回應快取關閉）"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency", type=int, default=500, help="同時進行的請求數（預設 500）"
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=2_000,
+            help="每種路徑的請求總數（預設 2000）",
+        )
+        parser.add_argument(
+            "--rows", type=int, default=2_000, help="產生的教師、學生與課程數量"
+        )
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            name = str(Path(directory) / "bench.sqlite3")
+            with isolated_database(name=name):
+                ids = self.seed(options["rows"])
+                # 每個請求的連線在請求結束時關閉，與建議的 ASGI 設定相同
+                settings_dict = connections["default"].settings_dict
+                saved = settings_dict["CONN_MAX_AGE"]
+                settings_dict["CONN_MAX_AGE"] = 0
+                connections.close_all()
+                try:
+                    with override_settings(
+                        DEBUG=False,
+                        ALLOWED_HOSTS=[HOST],
+                        API_RESPONSE_CACHE={"ENABLED": False},
+                    ):
+                        results = [
+                            (label, asyncio.run(self.run_path(prefix, ids, options)))
+                            for label, prefix in (
+                                ("sync", "/api/"),
+                                ("async", "/api/async/"),
+                            )
+                        ]
+                finally:
+                    settings_dict["CONN_MAX_AGE"] = saved
+
+        self.stdout.write(
+            f"\n{options['concurrency']} 個同時請求、"
+            f"每種路徑 {options['requests']} 個請求\n"
+        )
+        self.stdout.write(
+            f"{'路徑':<8}{'請求/s':>10}{'p50(ms)':>10}{'p99(ms)':>10}{'錯誤':>8}"
+        )
+        for label, result in results:
+            self.stdout.write(
+                f"{label:<8}{result['rps']:>10.0f}{result['p50']:>10.1f}"
+                f"{result['p99']:>10.1f}{result['errors']:>8}"
+            )
+
+    def seed(self, rows):
+        from myapps.myapps.models import Booking
+
+        teacher_ids = seed_teachers(rows)
+        student_ids = seed_students(rows)
+        course_ids = seed_courses(rows, teacher_ids)
+        rng = random.Random(3)
+        Booking.objects.bulk_create(
+            Booking(
+                course_id=rng.choice(course_ids), student_id=rng.choice(student_ids)
+            )
+            for _ in range(rows)
+        )
+        return {
+            "teachers": teacher_ids,
+            "courses": course_ids,
+            "bookings": list(Booking.objects.values_list("pk", flat=True)),
+        }
+
+    def urls(self, prefix, ids, count):
+        """列表（前幾頁）與單筆查詢各半"""
+        rng = random.Random(0)
+        for _ in range(count):
+            resource = rng.choice(RESOURCES)
+            if rng.random() < 0.5:
+                yield f"{prefix}{resource}/?page={rng.randint(1, 5)}"
+            else:
+                yield f"{prefix}{resource}/{rng.choice(ids[resource])}/"
+
+    async def run_path(self, prefix, ids, options):
+        application = get_asgi_application()
+        queue = asyncio.Queue()
+        for url in self.urls(prefix, ids, options["requests"]):
+            queue.put_nowait(url)
+        latencies, errors = [], []
+
+        async def worker():
+            while not queue.empty():
+                url = queue.get_nowait()
+                started = time.perf_counter()
+                status = await request(application, url)
+                latencies.append(time.perf_counter() - started)
+                if status != 200:
+                    errors.append(url)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(options["concurrency"])))
+        elapsed = time.perf_counter() - started
+        quantiles = statistics.quantiles(latencies, n=100)
+        return {
+            "rps": len(latencies) / elapsed,
+            "p50": quantiles[49] * 1000,
+            "p99": quantiles[98] * 1000,
+            "errors": len(errors),
+        }
+
+
+async def request(application, url):
+    """以 ASGI 協定送出 GET 請求，回傳狀態碼"""
+    parts = urlsplit(url)
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": parts.path,
+        "raw_path": parts.path.encode(),
+        "query_string": parts.query.encode(),
+        "root_path": "",
+        "headers": [(b"host", HOST.encode()), (b"accept", b"application/json")],
+        "client": ("127.0.0.1", 50000),
+        "server": (HOST, 80),
+    }
+    finished = asyncio.Event()
+    received = False
+    status = None
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # 回應送出後才斷線，否則 Django 會取消處理中的請求
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body" and not message.get("more_body"):
+            finished.set()
+
+    await application(scope, receive, send)
+    finished.set()
+    return status
@@ -0,0 +1,89 @@
+import random
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count, FloatField, Sum
+from django.db.models.functions import Cast
+
+from myapps.myapps.benchmarks import (
+    isolated_database,
+    measure,
+    seed_courses,
+    seed_teachers,
+    summarize,
+)
+
+DEFAULT_SIZES = [10, 1_000, 10_000, 100_000]
+
+
+class Command(BaseCommand):
+    help = (
+        "比較評價寫入時以 F() 累加差值與重新計算整門課程評分的耗時"
+        "（在暫時的測試資料庫中執行）"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reviews",
+            type=int,
+            action="append",
+            dest="sizes",
+            help="單一課程的評價數，可重複指定（預設 10、1000、10000、100000）",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=20, help="每種情況重複次數（預設 20）"
+        )
+
+    def handle(self, *args, **options):
+        from myapps.myapps.models import Course, Review
+        from myapps.myapps.ratings import apply_rating_delta
+
+        sizes = sorted(options["sizes"] or DEFAULT_SIZES)
+        repeat = options["repeat"]
+        rng = random.Random(0)
+
+        with isolated_database():
+            course_ids = seed_courses(len(sizes), seed_teachers(1))
+            self.stdout.write(f"產生 {sum(sizes)} 則評價...")
+            for course_id, size in zip(course_ids, sizes):
+                Review.objects.bulk_create(
+                    (
+                        Review(course_id=course_id, rating=str(rng.randint(1, 5)))
+                        for _ in range(size)
+                    ),
+                    batch_size=5000,
+                )
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+
+            def recompute(course_id):
+                # 讀取該課程所有評價重新計算（成本隨評價數增加）
+                totals = Review.objects.filter(course_id=course_id).aggregate(
+                    rating_sum=Sum(Cast("rating", FloatField())),
+                    rating_count=Count("id"),
+                )
+                Course.objects.filter(pk=course_id).update(
+                    rating_sum=totals["rating_sum"] or 0.0,
+                    rating_count=totals["rating_count"],
+                )
+
+            self.stdout.write(
+                f"\n{'評價數':>8}  {'F() 差值(ms)':>14}{'重新計算(ms)':>14}{'倍數':>8}"
+            )
+            for course_id, size in zip(course_ids, sizes):
+                delta_ms = summarize(
+                    measure(
+                        lambda course_id=course_id: apply_rating_delta(course_id, 5, 1),
+                        repeat=repeat,
+                    )
+                )["median_ms"]
+                recompute_ms = summarize(
+                    measure(
+                        lambda course_id=course_id: recompute(course_id),
+                        repeat=repeat,
+                    )
+                )["median_ms"]
+                self.stdout.write(
+                    f"{size:>8}  {delta_ms:>14.3f}{recompute_ms:>14.3f}"
+                    f"{recompute_ms / delta_ms:>7.1f}x"
+                )
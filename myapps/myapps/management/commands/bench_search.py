@@ -0,0 +1,107 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from myapps.myapps.benchmarks import (
+    isolated_database,
+    measure,
+    seed_courses,
+    seed_teachers,
+    summarize,
+)
+
+DEFAULT_QUERIES = [
+    "數學",
+    "資深教師",
+    "經驗豐富",
+    "王",
+    "python",
+    "Python 資料",
+    "微積分",
+]
+
+
+class Command(BaseCommand):
+    help = "比較 n-gram 全文索引與 icontains 查詢的搜尋效能（在暫時的測試資料庫中執行）"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows",
+            type=int,
+            default=100_000,
+            help="產生的教師與課程數量（預設 100000）",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="每個查詢重複次數（預設 5）"
+        )
+        parser.add_argument(
+            "--query",
+            action="append",
+            dest="queries",
+            help="要測試的關鍵字，可重複指定（預設使用內建的中英混合關鍵字）",
+        )
+
+    def handle(self, *args, **options):
+        from myapps.myapps.models import Course, Teacher
+        from myapps.myapps.search import (
+            COURSE_INDEX,
+            TEACHER_INDEX,
+            rebuild_index,
+            search_courses,
+            search_teachers,
+        )
+
+        rows = options["rows"]
+        repeat = options["repeat"]
+        queries = options["queries"] or DEFAULT_QUERIES
+        page_size = 20
+
+        with isolated_database():
+            self.stdout.write(f"產生 {rows} 位教師與 {rows} 門課程...")
+            teacher_ids = seed_teachers(rows)
+            seed_courses(rows, teacher_ids)
+            for index in (TEACHER_INDEX, COURSE_INDEX):
+                (elapsed,) = measure(lambda index=index: rebuild_index(index), repeat=1)
+                self.stdout.write(f"建立 {index.table} 索引：{elapsed:.2f} 秒")
+
+            teachers = Teacher.objects.select_related("user")
+            courses = Course.objects.select_related("teacher")
+
+            def icontains_teachers(query):
+                return teachers.filter(
+                    Q(name__icontains=query)
+                    | Q(email__icontains=query)
+                    | Q(intro__icontains=query)
+                ).order_by("name")
+
+            def icontains_courses(query):
+                return courses.filter(
+                    Q(subject__icontains=query) | Q(description__icontains=query)
+                ).order_by("-created_at")
+
+            cases = [
+                ("teachers", "icontains", icontains_teachers),
+                ("teachers", "ngram", lambda q: search_teachers(teachers, q)),
+                ("courses", "icontains", icontains_courses),
+                ("courses", "ngram", lambda q: search_courses(courses, q)),
+            ]
+
+            self.stdout.write(
+                f"\n{'資料表':<10}{'關鍵字':<14}{'方式':<11}"
+                f"{'筆數':>8}{'平均(ms)':>12}{'中位數(ms)':>12}"
+            )
+            for query in queries:
+                for table, label, build in cases:
+                    results = build(query)
+                    # 與 API 相同：一次 count 加上第一頁資料
+                    samples = measure(
+                        lambda results=results: (
+                            results.count(),
+                            list(results[:page_size]),
+                        ),
+                        repeat=repeat,
+                    )
+                    stats = summarize(samples)
+                    self.stdout.write(
+                        f"{table:<10}{query:<14}{label:<11}{results.count():>8}"
+                        f"{stats['mean_ms']:>12.2f}{stats['median_ms']:>12.2f}"
+                    )
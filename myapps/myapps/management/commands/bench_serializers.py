@@ -0,0 +1,96 @@
+from django.core.management.base import BaseCommand
+
+from myapps.myapps.benchmarks import (
+    isolated_database,
+    measure,
+    seed_courses,
+    seed_teachers,
+    summarize,
+)
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+
+
+class Command(BaseCommand):
+    help = (
+        "比較 ModelSerializer 與 values() 快速序列化器產生列表 JSON 的效能"
+        "（在暫時的測試資料庫中執行）"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--size",
+            type=int,
+            action="append",
+            dest="sizes",
+            help="每頁筆數，可重複指定（預設 1000、10000、100000）",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=3, help="每種情況重複次數（預設 3）"
+        )
+
+    def handle(self, *args, **options):
+        from rest_framework.renderers import JSONRenderer
+
+        from myapps.myapps.models import Course, Teacher
+        from myapps.myapps.serializers import (
+            CourseListSerializer,
+            CourseListValuesSerializer,
+            TeacherListSerializer,
+            TeacherListValuesSerializer,
+        )
+
+        sizes = sorted(options["sizes"] or DEFAULT_SIZES)
+        repeat = options["repeat"]
+        renderer = JSONRenderer()
+
+        with isolated_database():
+            rows = sizes[-1]
+            self.stdout.write(f"產生 {rows} 位教師與 {rows} 門課程...")
+            teacher_ids = seed_teachers(rows)
+            seed_courses(rows, teacher_ids)
+
+            teachers = Teacher.objects.order_by("name")
+            courses = Course.objects.select_related("teacher").order_by(
+                "-created_at", "-id"
+            )
+            cases = [
+                (
+                    "teachers",
+                    teachers,
+                    TeacherListSerializer,
+                    TeacherListValuesSerializer,
+                ),
+                ("courses", courses, CourseListSerializer, CourseListValuesSerializer),
+            ]
+
+            self.stdout.write(
+                f"\n{'資料表':<10}{'筆數':>8}  {'方式':<8}"
+                f"{'中位數(ms)':>12}{'rows/s':>12}{'加速':>8}"
+            )
+            for table, queryset, model_serializer, values_serializer in cases:
+                for size in sizes:
+                    # 與 API 相同：查詢一頁資料、序列化並輸出 JSON
+                    def model_path(
+                        queryset=queryset, size=size, serializer=model_serializer
+                    ):
+                        page = list(queryset[:size])
+                        return renderer.render(serializer(page, many=True).data)
+
+                    def values_path(
+                        queryset=queryset, size=size, serializer=values_serializer
+                    ):
+                        page = list(serializer.values(queryset)[:size])
+                        return renderer.render(serializer(page, many=True).data)
+
+                    if model_path() != values_path():
+                        self.stderr.write(f"{table} {size} 筆：兩種方式的輸出不一致")
+
+                    baseline = None
+                    for label, func in (("model", model_path), ("values", values_path)):
+                        median = summarize(measure(func, repeat=repeat))["median_ms"]
+                        baseline = baseline or median
+                        self.stdout.write(
+                            f"{table:<10}{size:>8}  {label:<8}{median:>12.1f}"
+                            f"{size / (median / 1000):>12.0f}{baseline / median:>7.1f}x"
+                        )
@@ -0,0 +1,159 @@
+import random
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections, connections, transaction
+from django.utils import timezone
+
+from myapps.myapps.benchmarks import (
+    isolated_database,
+    seed_courses,
+    seed_students,
+    seed_teachers,
+)
+
+# 原本的設定：預設的 rollback journal、DEFERRED 交易、每個請求重新連線
+BASELINE = {"OPTIONS": {}, "CONN_MAX_AGE": 0}
+
+
+class Command(BaseCommand):
+    help = (
+        "以多個執行緒模擬同時讀寫預約，"
+        "比較原本的 SQLite 設定與 settings.py 中調校後的設定"
+        "（在暫時的檔案資料庫中執行）"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--threads", type=int, default=8, help="同時執行的請求數（預設 8）"
+        )
+        parser.add_argument(
+            "--duration", type=float, default=5.0, help="每種設定執行秒數（預設 5）"
+        )
+        parser.add_argument(
+            "--write-ratio",
+            type=float,
+            default=0.2,
+            help="寫入請求的比例（預設 0.2）",
+        )
+        parser.add_argument(
+            "--rows", type=int, default=2_000, help="產生的教師、學生與課程數量"
+        )
+
+    def handle(self, *args, **options):
+        tuned = settings.DATABASES["default"]
+        modes = [
+            ("baseline", BASELINE),
+            (
+                "tuned",
+                {
+                    "OPTIONS": tuned.get("OPTIONS", {}),
+                    "CONN_MAX_AGE": tuned.get("CONN_MAX_AGE", 0),
+                },
+            ),
+        ]
+        self.stdout.write(
+            f"{options['threads']} 個執行緒、寫入比例 {options['write_ratio']:.0%}、"
+            f"每種設定 {options['duration']:.0f} 秒\n"
+        )
+        self.stdout.write(
+            f"{'設定':<10}{'讀取/s':>10}{'寫入/s':>10}{'鎖定錯誤':>10}"
+            f"{'讀取 p95(ms)':>14}{'寫入 p95(ms)':>14}"
+        )
+        for label, mode in modes:
+            result = self.run_mode(mode, options)
+            self.stdout.write(
+                f"{label:<10}{result['reads'] / options['duration']:>10.0f}"
+                f"{result['writes'] / options['duration']:>10.0f}"
+                f"{result['errors']:>10}{result['read_p95']:>14.1f}"
+                f"{result['write_p95']:>14.1f}"
+            )
+
+    def run_mode(self, mode, options):
+        from myapps.myapps.models import Booking, Course
+
+        with tempfile.TemporaryDirectory() as directory:
+            name = str(Path(directory) / "bench.sqlite3")
+            with isolated_database(name=name) as connection:
+                rows = options["rows"]
+                teacher_ids = seed_teachers(rows)
+                student_ids = seed_students(rows)
+                course_ids = seed_courses(rows, teacher_ids)
+
+                # 各執行緒的連線依共用的 settings_dict 建立，需在啟動執行緒前替換
+                settings_dict = connection.settings_dict
+                saved = {key: settings_dict[key] for key in mode}
+                settings_dict.update(mode)
+                connection.close()
+
+                def read(rng):
+                    queryset = Booking.objects.select_related(
+                        "course", "student", "student__user", "course__teacher"
+                    ).filter(course_id=rng.choice(course_ids))
+                    queryset.count()
+                    list(queryset[:20])
+
+                def write(rng):
+                    # 與序列化器驗證相同：先讀取關聯資料再寫入
+                    with transaction.atomic():
+                        course = Course.objects.get(pk=rng.choice(course_ids))
+                        Booking.objects.create(
+                            course=course,
+                            student_id=rng.choice(student_ids),
+                            start_at=timezone.now(),
+                        )
+
+                latencies = {"read": [], "write": []}
+                errors = []
+                deadline = time.perf_counter() + options["duration"]
+
+                def worker(seed):
+                    rng = random.Random(seed)
+                    try:
+                        while time.perf_counter() < deadline:
+                            kind = (
+                                "write"
+                                if rng.random() < options["write_ratio"]
+                                else "read"
+                            )
+                            started = time.perf_counter()
+                            try:
+                                (write if kind == "write" else read)(rng)
+                            except OperationalError:
+                                errors.append(kind)
+                            else:
+                                latencies[kind].append(time.perf_counter() - started)
+                            finally:
+                                # 與請求結束時相同，依 CONN_MAX_AGE 決定是否關閉連線
+                                close_old_connections()
+                    finally:
+                        connections.close_all()
+
+                threads = [
+                    threading.Thread(target=worker, args=(seed,))
+                    for seed in range(options["threads"])
+                ]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                settings_dict.update(saved)
+
+        return {
+            "reads": len(latencies["read"]),
+            "writes": len(latencies["write"]),
+            "errors": len(errors),
+            "read_p95": _p95(latencies["read"]),
+            "write_p95": _p95(latencies["write"]),
+        }
+
+
+def _p95(samples):
+    if len(samples) < 2:
+        return sum(samples) * 1000
+    return statistics.quantiles(samples, n=20)[-1] * 1000
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from myapps.myapps.similarity import TOP_K, rebuild_similarities
+
+
+class Command(BaseCommand):
+    help = "重建所有課程的 TF-IDF 向量與預先計算的相似課程"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--top-k",
+            type=int,
+            default=TOP_K,
+            help=f"每門課程保留的相似課程數（預設 {TOP_K}）",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="每批寫入的資料列數（預設 1000）",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        courses, terms = rebuild_similarities(
+            top_k=options["top_k"], batch_size=options["batch_size"]
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"已重建 {courses} 門課程的相似課程（{terms} 個詞權重）")
+        )
+        self.stdout.write(f"耗時 {(time.perf_counter() - started) * 1000:.0f} ms")
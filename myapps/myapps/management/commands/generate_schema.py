@@ -0,0 +1,43 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import resolve, reverse
+
+from myapps.myapps.schema import ARTIFACTS, encode_schema, get_schema_dir
+
+
+class Command(BaseCommand):
+    help = "產生 OpenAPI 文件（JSON / YAML）供文件端點直接回傳"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--url",
+            default=None,
+            help="文件中的 API 網址（例如 https://api.example.com），預設不指定主機",
+        )
+        parser.add_argument(
+            "--output-dir",
+            default=None,
+            help="輸出目錄（預設為 settings.API_SCHEMA_DIR）",
+        )
+
+    def handle(self, *args, **options):
+        view = resolve(reverse("schema-json", kwargs={"format": ".json"})).func
+        view_class = getattr(view, "cls", None)
+        if not hasattr(view_class, "generate_schema"):
+            raise CommandError("schema-json 路由未使用 get_precomputed_schema_view")
+
+        schema = view_class.generate_schema(url=options["url"])
+        output_dir = Path(options["output_dir"] or get_schema_dir())
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        for fmt, (filename, _) in ARTIFACTS.items():
+            path = output_dir / filename
+            content = encode_schema(schema, fmt)
+            # 先寫入暫存檔再改名，服務中的 worker 不會讀到寫到一半的檔案
+            tmp_path = path.with_name(f".{filename}.tmp")
+            tmp_path.write_bytes(content)
+            tmp_path.replace(path)
+            self.stdout.write(
+                self.style.SUCCESS(f"已產生 {path}（{len(content)} bytes）")
+            )
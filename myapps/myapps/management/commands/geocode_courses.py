@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from myapps.myapps.geo import DEFAULT_GAZETTEER, geocode_courses, load_gazetteer
+
+
+class Command(BaseCommand):
+    help = "以本機的地名對照檔填入課程的經緯度（不需要連線）"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--gazetteer",
+            default=str(DEFAULT_GAZETTEER),
+            help="name,latitude,longitude 格式的 CSV（預設為內建的縣市對照表）",
+        )
+        parser.add_argument(
+            "--overwrite",
+            action="store_true",
+            help="重新對應已有座標的課程",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="每批寫回的課程數量（預設 500）",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            gazetteer = load_gazetteer(options["gazetteer"])
+        except (OSError, KeyError, ValueError) as error:
+            raise CommandError(f"無法讀取地名對照檔：{error}")
+        updated, missing = geocode_courses(
+            gazetteer, overwrite=options["overwrite"], batch_size=options["batch_size"]
+        )
+        self.stdout.write(self.style.SUCCESS(f"已更新 {updated} 門課程的座標"))
+        if missing:
+            self.stdout.write(f"{missing} 門課程的地點無法對應（例如線上課程）")
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from myapps.myapps.analytics import rebuild_summaries
+
+
+class Command(BaseCommand):
+    help = "以預約與評價資料重建教師儀表板使用的每日統計表"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="每批寫入的統計列數（預設 500）",
+        )
+
+    def handle(self, *args, **options):
+        bookings, reviews = rebuild_summaries(batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"已重建 {bookings} 列每日預約統計、{reviews} 列每日評價統計"
+            )
+        )
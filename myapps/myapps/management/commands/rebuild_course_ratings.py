@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from myapps.myapps.cache import invalidate
+from myapps.myapps.models import Course
+from myapps.myapps.ratings import rebuild_course_ratings
+
+
+class Command(BaseCommand):
+    help = "以評價資料重建所有課程的評分總和、數量與平均評分"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="每批寫回的課程數量（預設 500）",
+        )
+
+    def handle(self, *args, **options):
+        updated = rebuild_course_ratings(batch_size=options["batch_size"])
+        # bulk_update 不會觸發訊號，需手動讓課程相關的快取失效
+        invalidate(Course)
+        self.stdout.write(self.style.SUCCESS(f"已更新 {updated} 門課程的評分統計"))
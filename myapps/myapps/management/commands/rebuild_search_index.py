@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from myapps.myapps.search import (
+    COURSE_INDEX,
+    TEACHER_INDEX,
+    rebuild_index,
+    search_enabled,
+)
+
+
+class Command(BaseCommand):
+    help = "重建教師與課程的全文搜尋索引（SQLite FTS5）"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database",
+            default="default",
+            help="要重建索引的資料庫別名（預設 default）",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="每批寫入索引的資料筆數（預設 1000）",
+        )
+
+    def handle(self, *args, **options):
+        using = options["database"]
+        if not search_enabled(using):
+            self.stdout.write(
+                self.style.WARNING("此資料庫不支援 FTS5，搜尋將使用一般查詢")
+            )
+            return
+        for index in (TEACHER_INDEX, COURSE_INDEX):
+            count = rebuild_index(index, using=using, batch_size=options["batch_size"])
+            self.stdout.write(
+                self.style.SUCCESS(f"已重建 {index.table}：{count} 筆資料")
+            )
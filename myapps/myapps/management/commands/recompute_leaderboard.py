@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from myapps.myapps.leaderboard import recompute_scores
+
+
+class Command(BaseCommand):
+    help = "重新計算課程排行榜使用的加權評分與熱門度"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="每批寫回的課程數量（預設 500）",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=None,
+            help="每隔幾秒持續重新計算（例如 3600）",
+        )
+
+    def handle(self, *args, **options):
+        interval = options["interval"]
+        while True:
+            updated = recompute_scores(batch_size=options["batch_size"])
+            self.stdout.write(self.style.SUCCESS(f"已更新 {updated} 門課程的排行分數"))
+            if interval is None:
+                break
+            time.sleep(interval)
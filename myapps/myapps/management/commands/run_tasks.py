@@ -0,0 +1,53 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from myapps.myapps.taskqueue import (
+    WorkerPool,
+    requeue_stale,
+    retry_failed,
+    run_pending,
+)
+
+
+class Command(BaseCommand):
+    help = "執行背景工作佇列的 worker（Ctrl+C 或 SIGTERM 時等待執行中的工作完成後結束）"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, default=None, help="worker 執行緒數（預設為設定值）"
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=None,
+            help="佇列為空時的輪詢間隔秒數（預設為設定值）",
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="執行目前可執行的工作後結束"
+        )
+        parser.add_argument(
+            "--retry-failed", action="store_true", help="先將失敗的工作重新排入佇列"
+        )
+
+    def handle(self, *args, **options):
+        if options["retry_failed"]:
+            self.stdout.write(f"已重新排入 {retry_failed()} 筆失敗的工作")
+        if options["once"]:
+            requeue_stale()
+            succeeded, failed = run_pending()
+            self.stdout.write(
+                self.style.SUCCESS(f"已執行 {succeeded} 筆工作，失敗 {failed} 筆")
+            )
+            return
+
+        pool = WorkerPool(options["workers"], options["poll_interval"])
+        signal.signal(signal.SIGTERM, lambda *args: pool.stopping.set())
+        pool.start()
+        self.stdout.write(self.style.SUCCESS(f"已啟動 {pool.workers} 個 worker"))
+        try:
+            while not pool.stopping.wait(1):
+                pass
+        except KeyboardInterrupt:
+            pass
+        pool.stop()
@@ -0,0 +1,48 @@
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from myapps.myapps.replicas import get_setting, sync_replica
+
+
+class Command(BaseCommand):
+    help = "以 VACUUM INTO 快照將主資料庫同步到唯讀副本（SQLite）"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "aliases",
+            nargs="*",
+            help="要同步的副本（預設為 settings.READ_REPLICAS['ALIASES']）",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=None,
+            help="每隔幾秒持續同步；應小於 READ_REPLICAS['STICKY_SECONDS']",
+        )
+
+    def handle(self, *args, **options):
+        aliases = options["aliases"] or list(get_setting("ALIASES"))
+        if not aliases:
+            raise CommandError("沒有設定任何副本")
+        interval = options["interval"]
+        while True:
+            self.sync(aliases)
+            if interval is None:
+                break
+            time.sleep(interval)
+
+    def sync(self, aliases):
+        started = time.perf_counter()
+        for alias in aliases:
+            try:
+                size = sync_replica(alias)
+            except ImproperlyConfigured as error:
+                raise CommandError(str(error))
+            self.stdout.write(
+                self.style.SUCCESS(f"已同步 {alias}（{size / 1024 / 1024:.1f} MB）")
+            )
+        # 回應快取鍵包含副本快照的修改時間（見 cache.py），
+        # 各 worker 不會再使用舊快照的回應
+        self.stdout.write(f"耗時 {(time.perf_counter() - started) * 1000:.0f} ms")
@@ -0,0 +1,289 @@
+"""
+Prometheus 指標
+
+:class:`MetricsMiddleware` 以路由名稱（例如 ``booking-list``、``teacher-search``）
+為標籤，記錄每個請求的延遲、狀態碼、回應大小與資料庫時間，
+``GET /metrics`` 以 Prometheus 文字格式輸出。
+
+每個行程的統計先累積在記憶體中（只有加總與直方圖計數，記錄成本固定），
+設定 ``settings.METRICS["DIRECTORY"]`` 時每隔 ``FLUSH_INTERVAL`` 秒寫入該目錄下的
+``metrics-<pid>.json``；``/metrics`` 讀取目錄中所有行程的檔案合併後輸出，
+因此由任何一個 worker 回應都能得到全部 worker 的統計。部署重新啟動前請清空該目錄。
+"""
+
+import bisect
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+
+from .profiler import get_setting as get_profiler_setting
+from .profiler import profile_queries
+
+DEFAULTS = {
+    "ENABLED": True,
+    # 多個 worker 共用的目錄，None 表示只統計目前的行程
+    "DIRECTORY": None,
+    "FLUSH_INTERVAL": 1.0,
+    # 不記錄的路由名稱
+    "EXCLUDE": ("metrics",),
+}
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+SIZE_BUCKETS = (100, 1000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+# 名稱 -> (類型, 說明, 直方圖區間)
+METRICS = {
+    "http_requests_total": ("counter", "請求數", None),
+    "http_request_duration_seconds": ("histogram", "請求處理時間", LATENCY_BUCKETS),
+    "http_response_size_bytes": ("histogram", "回應大小（串流回應不計）", SIZE_BUCKETS),
+    "http_request_db_duration_seconds": ("histogram", "請求的資料庫時間", DB_BUCKETS),
+    "http_request_db_queries_total": ("counter", "請求執行的查詢數", None),
+}
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def get_setting(name):
+    return getattr(settings, "METRICS", {}).get(name, DEFAULTS[name])
+
+
+class Registry:
+    """
+    單一行程的指標
+
+    計數器為 {(名稱, 標籤): 值}，直方圖為 {(名稱, 標籤): [各區間計數..., 總和]}
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.pid = os.getpid()
+        self.counters = defaultdict(float)
+        self.histograms = {}
+        self.last_flush = time.monotonic()
+
+    def _check_pid(self):
+        # fork 出來的 worker 不沿用父行程的統計
+        if self.pid != os.getpid():
+            self.reset()
+
+    def inc(self, name, labels, value=1):
+        with self.lock:
+            self._check_pid()
+            self.counters[name, labels] += value
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        with self.lock:
+            self._check_pid()
+            counts = self.histograms.get((name, labels))
+            if counts is None:
+                counts = self.histograms[name, labels] = [0] * (len(buckets) + 2)
+            counts[bisect.bisect_left(buckets, value)] += 1
+            counts[-1] += value
+
+    def snapshot(self):
+        with self.lock:
+            self._check_pid()
+            return {
+                "counters": [
+                    [name, list(labels), value]
+                    for (name, labels), value in self.counters.items()
+                ],
+                "histograms": [
+                    [name, list(labels), list(counts)]
+                    for (name, labels), counts in self.histograms.items()
+                ],
+            }
+
+    def get_path(self):
+        directory = get_setting("DIRECTORY")
+        if directory is None:
+            return None
+        return Path(directory) / f"metrics-{os.getpid()}.json"
+
+    def flush(self, force=False):
+        """將統計寫入行程自己的檔案（原子性取代）"""
+        path = self.get_path()
+        if path is None:
+            return
+        now = time.monotonic()
+        if not force and now - self.last_flush < get_setting("FLUSH_INTERVAL"):
+            return
+        self.last_flush = now
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".metrics-")
+        with os.fdopen(fd, "w") as file:
+            json.dump(self.snapshot(), file)
+        os.replace(tmp, path)
+
+
+registry = Registry()
+
+
+def collect():
+    """合併所有行程的統計，回傳 (計數器, 直方圖)"""
+    snapshots = []
+    own = registry.get_path()
+    if own is not None:
+        for path in own.parent.glob("metrics-*.json"):
+            if path == own:
+                continue
+            try:
+                snapshots.append(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                # 其他行程正在取代檔案或檔案已被清除
+                continue
+    snapshots.append(registry.snapshot())
+
+    counters, histograms = defaultdict(float), {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot["counters"]:
+            counters[name, tuple(map(tuple, labels))] += value
+        for name, labels, counts in snapshot["histograms"]:
+            key = name, tuple(map(tuple, labels))
+            if key in histograms:
+                histograms[key] = [a + b for a, b in zip(histograms[key], counts)]
+            else:
+                histograms[key] = list(counts)
+    return counters, histograms
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels, extra=()):
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+def _number(value):
+    return (
+        repr(float(value))
+        if isinstance(value, float) and value % 1
+        else str(int(value))
+    )
+
+
+def render():
+    """以 Prometheus 文字格式輸出"""
+    counters, histograms = collect()
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.extend((f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"))
+        if kind == "counter":
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+            continue
+        for (metric, labels), counts in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip((*buckets, "+Inf"), counts):
+                cumulative += count
+                le = (("le", bound if bound == "+Inf" else repr(float(bound))),)
+                lines.append(f"{name}_bucket{_labels(labels, le)} {cumulative}")
+            lines.extend(
+                (
+                    f"{name}_sum{_labels(labels)} {_number(counts[-1])}",
+                    f"{name}_count{_labels(labels)} {cumulative}",
+                )
+            )
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view(request):
+    """Prometheus 指標"""
+    registry.flush(force=True)
+    return HttpResponse(render(), content_type=CONTENT_TYPE)
+
+
+def get_route(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None or not match.url_name:
+        return "unmatched"
+    return match.url_name
+
+
+class MetricsMiddleware:
+    """
+    記錄每個請求的指標
+
+    應放在 :class:`~myapps.myapps.profiler.QueryProfilerMiddleware` 之前，
+    以沿用其查詢統計。
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not get_setting("ENABLED"):
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        if get_profiler_setting("ENABLED"):
+            response = self.get_response(request)
+            profile = getattr(request, "query_profile", None)
+        else:
+            with profile_queries() as profile:
+                response = self.get_response(request)
+        return self.finish(request, response, started, profile)
+
+    async def __acall__(self, request):
+        if not get_setting("ENABLED"):
+            return await self.get_response(request)
+
+        started = time.perf_counter()
+        if get_profiler_setting("ENABLED"):
+            response = await self.get_response(request)
+            profile = getattr(request, "query_profile", None)
+        else:
+            with profile_queries() as profile:
+                response = await self.get_response(request)
+        return self.finish(request, response, started, profile)
+
+    def finish(self, request, response, started, profile):
+        duration = time.perf_counter() - started
+
+        route = get_route(request)
+        if route not in get_setting("EXCLUDE"):
+            self.record(request, response, route, duration, profile)
+            registry.flush()
+        return response
+
+    def record(self, request, response, route, duration, profile):
+        labels = (("route", route), ("method", request.method))
+        registry.inc(
+            "http_requests_total", (*labels, ("status", str(response.status_code)))
+        )
+        registry.observe("http_request_duration_seconds", labels, duration)
+        if not response.streaming:
+            registry.observe("http_response_size_bytes", labels, len(response.content))
+        if profile is not None:
+            registry.observe(
+                "http_request_db_duration_seconds", labels, profile.duration
+            )
+            registry.inc("http_request_db_queries_total", labels, profile.count)
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:18
+
+from django.db import migrations, models
+from django.db.models import Count, FloatField, Sum
+from django.db.models.functions import Cast
+
+
+def backfill_course_ratings(apps, schema_editor):
+    # 以單一 GROUP BY 查詢計算每門課程的評分總和與數量
+    # （邏輯固定在遷移中，不隨 ratings.py 變動）
+    Course = apps.get_model("myapps", "Course")
+    Review = apps.get_model("myapps", "Review")
+    totals = {
+        row["course_id"]: (row["rating_sum"] or 0.0, row["rating_count"])
+        for row in Review.objects.order_by()
+        .values("course_id")
+        .annotate(
+            rating_sum=Sum(Cast("rating", FloatField())),
+            rating_count=Count("id"),
+        )
+    }
+    courses = list(Course.objects.only("id"))
+    for course in courses:
+        course.rating_sum, course.rating_count = totals.get(course.pk, (0.0, 0))
+        course.avg_rating = (
+            round(course.rating_sum / course.rating_count, 2)
+            if course.rating_count
+            else 0.0
+        )
+    Course.objects.bulk_update(
+        courses, ["rating_sum", "rating_count", "avg_rating"], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = (("myapps", "0001_initial"),)
+
+    operations = (
+        migrations.AddField(
+            model_name="course",
+            name="rating_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="評價數量"
+            ),
+        ),
+        migrations.AddField(
+            model_name="course",
+            name="rating_sum",
+            field=models.FloatField(
+                default=0.0, editable=False, verbose_name="評分總和"
+            ),
+        ),
+        migrations.RunPython(backfill_course_ratings, migrations.RunPython.noop),
+    )
@@ -0,0 +1,48 @@
+from django.db import migrations
+
+# 索引定義固定在遷移中，不隨 search.py 變動
+TABLE = "teachers_fts"
+FIELDS = (
+    "name",
+    "email",
+    "intro",
+    "education",
+    "certifications",
+    "teaching_experience",
+)
+
+
+def create_teacher_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != "sqlite":
+        return
+    Teacher = apps.get_model("myapps", "Teacher")
+    rows = [
+        [teacher.pk] + [getattr(teacher, field) or "" for field in FIELDS]
+        for teacher in Teacher.objects.only("id", *FIELDS).order_by("id")
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+            f"{', '.join(FIELDS)}, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+        cursor.executemany(
+            f"INSERT INTO {TABLE} (rowid, {', '.join(FIELDS)}) "
+            f"VALUES ({', '.join(['%s'] * (len(FIELDS) + 1))})",
+            rows,
+        )
+
+
+def drop_teacher_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+
+class Migration(migrations.Migration):
+    dependencies = (("myapps", "0002_course_rating_aggregates"),)
+
+    operations = (
+        migrations.RunPython(create_teacher_search_index, drop_teacher_search_index),
+    )
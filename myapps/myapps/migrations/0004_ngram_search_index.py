@@ -0,0 +1,88 @@
+import re
+
+from django.db import migrations
+
+# 索引定義與切詞規則固定在遷移中，不隨 search.py 變動
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af"
+_TOKEN_RE = re.compile(rf"[{_CJK}]+|(?:(?![{_CJK}])[^\W_])+")
+_CJK_RE = re.compile(rf"[{_CJK}]")
+
+TEACHER_FIELDS = (
+    "name",
+    "email",
+    "intro",
+    "education",
+    "certifications",
+    "teaching_experience",
+)
+INDEXES = (
+    ("teachers_fts", "Teacher", TEACHER_FIELDS),
+    ("courses_fts", "Course", ("subject", "description")),
+)
+
+
+def tokenize_text(text):
+    tokens = []
+    for run in _TOKEN_RE.findall(text or ""):
+        if not _CJK_RE.match(run):
+            tokens.append(run.lower())
+        elif len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i : i + 2] for i in range(len(run) - 1))
+            tokens.append(run[-1])
+    return " ".join(tokens)
+
+
+def _create_index(apps, connection, table, model_name, fields, prefix, transform):
+    model = apps.get_model("myapps", model_name)
+    rows = [
+        [instance.pk] + [transform(getattr(instance, field)) for field in fields]
+        for instance in model.objects.only("id", *fields).order_by("id")
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE {table} USING fts5({', '.join(fields)}, "
+            f"tokenize = 'unicode61 remove_diacritics 2', prefix = '{prefix}')"
+        )
+        cursor.executemany(
+            f"INSERT INTO {table} (rowid, {', '.join(fields)}) "
+            f"VALUES ({', '.join(['%s'] * (len(fields) + 1))})",
+            rows,
+        )
+
+
+def create_ngram_search_indexes(apps, schema_editor):
+    """以 n-gram 切分重建教師索引，並建立課程索引"""
+    connection = schema_editor.connection
+    if connection.vendor != "sqlite":
+        return
+    for table, model_name, fields in INDEXES:
+        _create_index(apps, connection, table, model_name, fields, "1 2", tokenize_text)
+
+
+def restore_teacher_search_index(apps, schema_editor):
+    """移除課程索引，教師索引恢復為 0003 的未切分內容"""
+    connection = schema_editor.connection
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("DROP TABLE IF EXISTS courses_fts")
+    _create_index(
+        apps,
+        connection,
+        "teachers_fts",
+        "Teacher",
+        TEACHER_FIELDS,
+        "2 3",
+        lambda value: value or "",
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = (("myapps", "0003_teacher_search_index"),)
+
+    operations = (
+        migrations.RunPython(create_ngram_search_indexes, restore_teacher_search_index),
+    )
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = (("myapps", "0004_ngram_search_index"),)
+
+    operations = (
+        migrations.AddIndex(
+            model_name="booking",
+            index=models.Index(
+                fields=["created_at", "id"], name="bookings_created_at_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="course",
+            index=models.Index(
+                fields=["created_at", "id"], name="courses_created_at_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="review",
+            index=models.Index(
+                fields=["created_at", "id"], name="reviews_created_at_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(
+                fields=["created_at", "id"], name="users_created_at_id_idx"
+            ),
+        ),
+    )
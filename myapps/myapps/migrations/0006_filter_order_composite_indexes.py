@@ -0,0 +1,64 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = (("myapps", "0005_created_at_keyset_indexes"),)
+
+    operations = (
+        migrations.AddIndex(
+            model_name="booking",
+            index=models.Index(
+                fields=["status", "created_at", "id"],
+                name="bookings_status_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="booking",
+            index=models.Index(
+                fields=["student", "created_at", "id"],
+                name="bookings_student_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="booking",
+            index=models.Index(
+                fields=["course", "created_at", "id"],
+                name="bookings_course_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="course",
+            index=models.Index(
+                fields=["teacher", "created_at", "id"],
+                name="courses_teacher_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="review",
+            index=models.Index(
+                fields=["course", "created_at", "id"], name="reviews_course_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="teacher",
+            index=models.Index(fields=["name"], name="teachers_name_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="teacher",
+            index=models.Index(
+                fields=["status", "name"], name="teachers_status_name_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(
+                fields=["role", "created_at", "id"], name="users_role_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(fields=["name"], name="users_name_idx"),
+        ),
+    )
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:02
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = (("myapps", "0006_filter_order_composite_indexes"),)
+
+    operations = (
+        migrations.AddField(
+            model_name="booking",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True,
+                default=django.utils.timezone.now,
+                verbose_name="更新時間",
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="course",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True,
+                default=django.utils.timezone.now,
+                verbose_name="更新時間",
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="review",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True,
+                default=django.utils.timezone.now,
+                verbose_name="更新時間",
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="student",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True,
+                default=django.utils.timezone.now,
+                verbose_name="更新時間",
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="teacher",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True,
+                default=django.utils.timezone.now,
+                verbose_name="更新時間",
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True,
+                default=django.utils.timezone.now,
+                verbose_name="更新時間",
+            ),
+            preserve_default=False,
+        ),
+    )
@@ -0,0 +1,152 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:05
+
+import datetime
+import re
+
+from django.db import migrations, models
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+# 舊版自由輸入的 schedule_date 解析（固定於此，不隨應用程式的程式碼改變）
+DEFAULT_DURATION = datetime.timedelta(hours=1)
+MAX_DURATION = datetime.timedelta(hours=8)
+DATETIME_FORMATS = ("%Y/%m/%d %H:%M", "%Y/%m/%d", "%m/%d %H:%M")
+_TIME = re.compile(r"^(\d{1,2}):(\d{2})$")
+_TIME_RANGE = re.compile(
+    r"^(?P<start>.*?\d{1,2}:\d{2})\s*(?:-|~|～|至|到)\s*(?P<end>\d{1,2}:\d{2})$"
+)
+
+
+def _parse_time(value):
+    match = _TIME.match(value)
+    if match is None:
+        return None
+    hour, minute = int(match.group(1)), int(match.group(2))
+    if hour > 23 or minute > 59:
+        return None
+    return datetime.time(hour, minute)
+
+
+def _parse_start(value, reference):
+    try:
+        parsed = parse_datetime(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        date = parse_date(value) if len(value) == 10 else None
+        if date is not None:
+            parsed = datetime.datetime.combine(date, datetime.time())
+    if parsed is None:
+        for fmt in DATETIME_FORMATS:
+            try:
+                parsed = datetime.datetime.strptime(value, fmt)
+            except ValueError:
+                continue
+            if "%Y" not in fmt:
+                parsed = parsed.replace(year=reference.year)
+            break
+    if parsed is None:
+        time = _parse_time(value)
+        if time is not None:
+            # 只有時間時以建立預約的日期為準
+            parsed = datetime.datetime.combine(reference.date(), time)
+    if parsed is not None and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def parse_schedule(value, reference):
+    """
+    解析 ``"2025-07-25 14:00"``、``"2025/07/25 14:00-15:30"``、``"14:00"`` 等字串，
+    回傳 (開始, 結束)；無法解析時回傳 (None, None)
+
+    沒有日期時使用 ``reference``（預約建立時間）的日期，沒有結束時間時為開始後一小時；
+    超過 ``MAX_DURATION`` 的時段縮短為上限長度。
+    """
+    value = (value or "").strip()
+    reference = timezone.localtime(reference)
+    end_time = None
+    match = _TIME_RANGE.match(value)
+    if match is not None:
+        value, end_time = match.group("start").strip(), _parse_time(match.group("end"))
+    start = _parse_start(value, reference)
+    if start is None:
+        return None, None
+    end = start + DEFAULT_DURATION
+    if end_time is not None:
+        local_start = timezone.localtime(start)
+        candidate = local_start.replace(hour=end_time.hour, minute=end_time.minute)
+        if candidate > local_start:
+            end = min(candidate, start + MAX_DURATION)
+    return start, end
+
+
+def forwards(apps, schema_editor):
+    """依主鍵分批解析 schedule_date 寫入 start_at / end_at"""
+    Booking = apps.get_model("myapps", "Booking")
+    last_pk = 0
+    queryset = Booking.objects.only("pk", "schedule_date", "created_at")
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk).order_by("pk")[:500])
+        if not batch:
+            return
+        for booking in batch:
+            booking.start_at, booking.end_at = parse_schedule(
+                booking.schedule_date, booking.created_at
+            )
+        Booking.objects.bulk_update(batch, ["start_at", "end_at"])
+        last_pk = batch[-1].pk
+
+
+def backwards(apps, schema_editor):
+    Booking = apps.get_model("myapps", "Booking")
+    batch = []
+    for booking in Booking.objects.only("pk", "start_at").iterator(chunk_size=500):
+        if booking.start_at is not None:
+            start = timezone.localtime(booking.start_at)
+            booking.schedule_date = start.strftime("%Y-%m-%d %H:%M")
+            batch.append(booking)
+        if len(batch) >= 500:
+            Booking.objects.bulk_update(batch, ["schedule_date"])
+            batch = []
+    Booking.objects.bulk_update(batch, ["schedule_date"])
+
+
+class Migration(migrations.Migration):
+    dependencies = (("myapps", "0007_updated_at"),)
+
+    operations = (
+        migrations.AddField(
+            model_name="booking",
+            name="start_at",
+            field=models.DateTimeField(null=True, verbose_name="開始時間"),
+        ),
+        migrations.AddField(
+            model_name="booking",
+            name="end_at",
+            field=models.DateTimeField(null=True, verbose_name="結束時間"),
+        ),
+        migrations.RunPython(forwards, backwards),
+        # 有預設值，反向遷移時才能重新加回欄位
+        migrations.AlterField(
+            model_name="booking",
+            name="schedule_date",
+            field=models.CharField(default="", max_length=100, verbose_name="預約時間"),
+        ),
+        migrations.RemoveField(
+            model_name="booking",
+            name="schedule_date",
+        ),
+        migrations.AddIndex(
+            model_name="booking",
+            index=models.Index(
+                fields=["course", "start_at"], name="bookings_course_start_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="booking",
+            index=models.Index(
+                fields=["student", "start_at"], name="bookings_student_start_idx"
+            ),
+        ),
+    )
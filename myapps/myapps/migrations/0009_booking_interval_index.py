@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = (("myapps", "0008_booking_start_end"),)
+
+    operations = (
+        migrations.RemoveIndex(
+            model_name="booking",
+            name="bookings_course_start_idx",
+        ),
+        migrations.AddIndex(
+            model_name="booking",
+            index=models.Index(
+                fields=["course", "start_at", "end_at"],
+                name="bookings_course_interval_idx",
+            ),
+        ),
+    )
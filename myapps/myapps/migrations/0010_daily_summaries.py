@@ -0,0 +1,186 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:52
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, FloatField, Sum
+from django.db.models.functions import Cast, Coalesce, TruncDate
+
+
+def backfill_summaries(apps, schema_editor):
+    # 以 GROUP BY 建立每日統計（邏輯固定在遷移中，不隨 analytics.py 變動）
+    Booking = apps.get_model("myapps", "Booking")
+    Review = apps.get_model("myapps", "Review")
+    BookingDailySummary = apps.get_model("myapps", "BookingDailySummary")
+    ReviewDailySummary = apps.get_model("myapps", "ReviewDailySummary")
+    bookings = list(
+        Booking.objects.order_by()
+        .values(
+            "course_id",
+            "status",
+            teacher=F("course__teacher_id"),
+            day=TruncDate(Coalesce("start_at", "created_at")),
+        )
+        .annotate(count=Count("id"), amount=Sum("course__price"))
+    )
+    reviews = list(
+        Review.objects.order_by()
+        .values(
+            "course_id", teacher=F("course__teacher_id"), day=TruncDate("created_at")
+        )
+        .annotate(count=Count("id"), rating_sum=Sum(Cast("rating", FloatField())))
+    )
+    BookingDailySummary.objects.bulk_create(
+        [
+            BookingDailySummary(
+                teacher_id=row["teacher"],
+                course_id=row["course_id"],
+                day=row["day"],
+                status=row["status"],
+                count=row["count"],
+                amount=row["amount"] or Decimal(0),
+            )
+            for row in bookings
+        ],
+        batch_size=500,
+    )
+    ReviewDailySummary.objects.bulk_create(
+        [
+            ReviewDailySummary(
+                teacher_id=row["teacher"],
+                course_id=row["course_id"],
+                day=row["day"],
+                count=row["count"],
+                rating_sum=row["rating_sum"] or 0.0,
+            )
+            for row in reviews
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = (("myapps", "0009_booking_interval_index"),)
+
+    operations = (
+        migrations.CreateModel(
+            name="BookingDailySummary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField(verbose_name="日期")),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "待確認"),
+                            ("confirmed", "已確認"),
+                            ("completed", "已完成"),
+                            ("cancelled", "已取消"),
+                        ],
+                        max_length=20,
+                        verbose_name="狀態",
+                    ),
+                ),
+                (
+                    "count",
+                    models.PositiveIntegerField(default=0, verbose_name="預約數量"),
+                ),
+                (
+                    "amount",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=Decimal(0),
+                        max_digits=14,
+                        verbose_name="課程價格總和",
+                    ),
+                ),
+                (
+                    "course",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="myapps.course",
+                        verbose_name="課程",
+                    ),
+                ),
+                (
+                    "teacher",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="myapps.teacher",
+                        verbose_name="教師",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "每日預約統計",
+                "verbose_name_plural": "每日預約統計",
+                "db_table": "booking_daily_summaries",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("teacher", "day", "course", "status"),
+                        name="booking_summary_key",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="ReviewDailySummary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField(verbose_name="日期")),
+                (
+                    "count",
+                    models.PositiveIntegerField(default=0, verbose_name="評價數量"),
+                ),
+                ("rating_sum", models.FloatField(default=0.0, verbose_name="評分總和")),
+                (
+                    "course",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="myapps.course",
+                        verbose_name="課程",
+                    ),
+                ),
+                (
+                    "teacher",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="myapps.teacher",
+                        verbose_name="教師",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "每日評價統計",
+                "verbose_name_plural": "每日評價統計",
+                "db_table": "review_daily_summaries",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("teacher", "day", "course"), name="review_summary_key"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    )
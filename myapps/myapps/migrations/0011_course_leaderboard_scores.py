@@ -0,0 +1,130 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:55
+
+import datetime
+import math
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def backfill_scores(apps, schema_editor):
+    # 計算貝氏加權評分與熱門度（邏輯固定在遷移中，不隨 leaderboard.py 變動）
+    Course = apps.get_model("myapps", "Course")
+    Booking = apps.get_model("myapps", "Booking")
+    options = {
+        "PRIOR_WEIGHT": 10,
+        "PREMIUM_BOOST": 1.05,
+        "TRENDING_DAYS": 28,
+        "TRENDING_HALF_LIFE_DAYS": 7,
+        **getattr(settings, "LEADERBOARD", {}),
+    }
+
+    totals = Course.objects.aggregate(
+        rating_sum=Sum("rating_sum"), rating_count=Sum("rating_count")
+    )
+    prior_mean = (
+        totals["rating_sum"] / totals["rating_count"] if totals["rating_count"] else 0.0
+    )
+    prior_weight = options["PRIOR_WEIGHT"]
+
+    now = timezone.now()
+    today = timezone.localdate(now)
+    trending = defaultdict(float)
+    for row in (
+        Booking.objects.filter(
+            created_at__gte=now - datetime.timedelta(days=options["TRENDING_DAYS"])
+        )
+        .exclude(status="cancelled")
+        .order_by()
+        .values("course_id", day=TruncDate("created_at"))
+        .annotate(count=Count("id"))
+    ):
+        age = (today - row["day"]).days
+        trending[row["course_id"]] += row["count"] * math.pow(
+            0.5, age / options["TRENDING_HALF_LIFE_DAYS"]
+        )
+
+    courses = []
+    for pk, rating_sum, rating_count, premium in Course.objects.values_list(
+        "id", "rating_sum", "rating_count", "teacher__blue_premium"
+    ):
+        factor = options["PREMIUM_BOOST"] if premium else 1.0
+        rating_score = (
+            (prior_weight * prior_mean + rating_sum) / (prior_weight + rating_count)
+            if rating_count
+            else 0.0
+        )
+        courses.append(
+            Course(
+                pk=pk,
+                rating_score=round(rating_score * factor, 6),
+                trending_score=round(trending.get(pk, 0.0) * factor, 6),
+            )
+        )
+    Course.objects.bulk_update(
+        courses, ["rating_score", "trending_score"], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = (("myapps", "0010_daily_summaries"),)
+
+    operations = (
+        migrations.AddField(
+            model_name="course",
+            name="rating_score",
+            field=models.FloatField(
+                default=0.0, editable=False, verbose_name="加權評分"
+            ),
+        ),
+        migrations.AddField(
+            model_name="course",
+            name="trending_score",
+            field=models.FloatField(default=0.0, editable=False, verbose_name="熱門度"),
+        ),
+        migrations.AddIndex(
+            model_name="course",
+            index=models.Index(
+                fields=["rating_score", "id"], name="courses_rating_score_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="course",
+            index=models.Index(
+                fields=["subject", "rating_score", "id"],
+                name="courses_subject_rating_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="course",
+            index=models.Index(
+                fields=["location", "rating_score", "id"],
+                name="courses_location_rating_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="course",
+            index=models.Index(
+                fields=["trending_score", "id"], name="courses_trending_score_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="course",
+            index=models.Index(
+                fields=["subject", "trending_score", "id"],
+                name="courses_subject_trending_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="course",
+            index=models.Index(
+                fields=["location", "trending_score", "id"],
+                name="courses_location_trending_idx",
+            ),
+        ),
+        migrations.RunPython(backfill_scores, migrations.RunPython.noop),
+    )
@@ -0,0 +1,219 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:02
+
+import heapq
+import math
+import re
+from collections import Counter, defaultdict
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# 切詞規則與 TF-IDF 參數固定在遷移中，不隨 search.py / similarity.py 變動
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af"
+_TOKEN_RE = re.compile(rf"[{_CJK}]+|(?:(?![{_CJK}])[^\W_])+")
+_CJK_RE = re.compile(rf"[{_CJK}]")
+
+TOP_K = 10
+SUBJECT_WEIGHT = 3
+LOCATION_BOOST = 0.2
+PRICE_BAND_BOOST = 0.1
+COMMON_TERM_RATIO = 0.5
+COMMON_TERM_MIN_COURSES = 100
+MAX_POSTINGS = 100
+MAX_TERM_LENGTH = 64
+
+
+def tokenize(text):
+    tokens = []
+    for run in _TOKEN_RE.findall(text or ""):
+        if not _CJK_RE.match(run):
+            tokens.append(run.lower())
+        elif len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i : i + 2] for i in range(len(run) - 1))
+            tokens.append(run[-1])
+    return tokens
+
+
+def tfidf_vector(counts, document_frequencies, total):
+    vector = {
+        term: (1 + math.log(count))
+        * (math.log((1 + total) / (1 + document_frequencies.get(term, 0))) + 1)
+        for term, count in counts.items()
+    }
+    norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+    return {term: weight / norm for term, weight in vector.items()} if norm else {}
+
+
+def price_band(price):
+    return int(math.log2(price)) if price and price > 0 else -1
+
+
+def build_similarities(apps, schema_editor):
+    """以倒排索引計算所有課程的 TF-IDF 向量與相似課程"""
+    Course = apps.get_model("myapps", "Course")
+    CourseTermWeight = apps.get_model("myapps", "CourseTermWeight")
+    CourseSimilarity = apps.get_model("myapps", "CourseSimilarity")
+
+    counts, attributes = {}, {}
+    for pk, subject, description, location, price in Course.objects.values_list(
+        "id", "subject", "description", "location", "price"
+    ).order_by("id"):
+        terms = Counter()
+        for text, weight in ((subject, SUBJECT_WEIGHT), (description, 1)):
+            for token in tokenize(text):
+                terms[token[:MAX_TERM_LENGTH]] += weight
+        counts[pk] = terms
+        attributes[pk] = (location, price_band(price))
+
+    total = len(counts)
+    document_frequencies = Counter()
+    for terms in counts.values():
+        document_frequencies.update(terms.keys())
+    vectors = {
+        pk: tfidf_vector(terms, document_frequencies, total)
+        for pk, terms in counts.items()
+    }
+    postings = defaultdict(list)
+    for pk, vector in vectors.items():
+        for term, weight in vector.items():
+            common = (
+                total >= COMMON_TERM_MIN_COURSES
+                and document_frequencies[term] > total * COMMON_TERM_RATIO
+            )
+            if not common:
+                postings[term].append((pk, weight))
+    for term, entries in postings.items():
+        postings[term] = heapq.nlargest(
+            MAX_POSTINGS, entries, key=lambda item: (item[1], item[0])
+        )
+
+    term_rows, similarity_rows = [], []
+    for pk, vector in vectors.items():
+        term_rows.extend(
+            CourseTermWeight(course_id=pk, term=term, weight=weight)
+            for term, weight in vector.items()
+        )
+        dot_products = defaultdict(float)
+        for term, weight in vector.items():
+            for other, other_weight in postings.get(term, ()):
+                dot_products[other] += weight * other_weight
+        location, band = attributes[pk]
+        scores = {}
+        for other, dot in dot_products.items():
+            if other == pk or dot <= 0:
+                continue
+            factor = 1.0
+            if attributes[other][0] == location:
+                factor += LOCATION_BOOST
+            if attributes[other][1] == band:
+                factor += PRICE_BAND_BOOST
+            scores[other] = dot * factor
+        similarity_rows.extend(
+            CourseSimilarity(course_id=pk, similar_id=other, score=round(score, 6))
+            for other, score in heapq.nlargest(
+                TOP_K, scores.items(), key=lambda item: (item[1], item[0])
+            )
+        )
+
+    CourseTermWeight.objects.bulk_create(term_rows, batch_size=1000)
+    CourseSimilarity.objects.bulk_create(similarity_rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = (("myapps", "0011_course_leaderboard_scores"),)
+
+    operations = (
+        migrations.CreateModel(
+            name="CourseSimilarity",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("score", models.FloatField(verbose_name="相似度")),
+                (
+                    "course",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="similarities",
+                        to="myapps.course",
+                        verbose_name="課程",
+                    ),
+                ),
+                (
+                    "similar",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="similar_entries",
+                        to="myapps.course",
+                        verbose_name="相似課程",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "相似課程",
+                "verbose_name_plural": "相似課程",
+                "db_table": "course_similarities",
+                "indexes": [
+                    models.Index(
+                        fields=["course", "score", "similar"],
+                        name="course_similarity_score_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("course", "similar"), name="course_similarity_key"
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="CourseTermWeight",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("term", models.CharField(max_length=64, verbose_name="詞")),
+                ("weight", models.FloatField(verbose_name="權重")),
+                (
+                    "course",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="myapps.course",
+                        verbose_name="課程",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "課程詞權重",
+                "verbose_name_plural": "課程詞權重",
+                "db_table": "course_term_weights",
+                "indexes": [
+                    models.Index(
+                        fields=["term", "weight", "course"],
+                        name="course_term_posting_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("course", "term"), name="course_term_weight_key"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(build_similarities, migrations.RunPython.noop),
+    )
@@ -0,0 +1,130 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:06
+
+import django.core.validators
+from django.db import migrations, models
+from django.utils import timezone
+
+# 遷移當時內建的縣市對照表與 geohash 編碼，固定在遷移中，不隨 geo.py 與對照檔變動
+GAZETTEER = {
+    "台北市": (25.0375, 121.5637),
+    "新北市": (25.0120, 121.4657),
+    "桃園市": (24.9936, 121.3010),
+    "台中市": (24.1477, 120.6736),
+    "台南市": (22.9999, 120.2270),
+    "高雄市": (22.6273, 120.3014),
+    "基隆市": (25.1276, 121.7392),
+    "新竹市": (24.8138, 120.9675),
+    "嘉義市": (23.4801, 120.4491),
+    "新竹縣": (24.8387, 121.0177),
+    "苗栗縣": (24.5602, 120.8214),
+    "彰化縣": (24.0518, 120.5161),
+    "南投縣": (23.9096, 120.6840),
+    "雲林縣": (23.7075, 120.5439),
+    "嘉義縣": (23.4596, 120.3329),
+    "屏東縣": (22.6690, 120.4862),
+    "宜蘭縣": (24.7570, 121.7533),
+    "花蓮縣": (23.9769, 121.6044),
+    "台東縣": (22.7583, 121.1444),
+    "澎湖縣": (23.5711, 119.5793),
+    "金門縣": (24.4493, 118.3767),
+    "連江縣": (26.1505, 119.9499),
+}
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+GEOHASH_PRECISION = 9
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    bounds = [[-90.0, 90.0], [-180.0, 180.0]]
+    value = (latitude, longitude)
+    chars, bits, code, is_longitude = [], 0, 0, True
+    while len(chars) < precision:
+        low, high = bounds[is_longitude]
+        middle = (low + high) / 2
+        code <<= 1
+        if value[is_longitude] >= middle:
+            code |= 1
+            bounds[is_longitude][0] = middle
+        else:
+            bounds[is_longitude][1] = middle
+        is_longitude = not is_longitude
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[code])
+            bits, code = 0, 0
+    return "".join(chars)
+
+
+def geocode(location):
+    place = (location or "").strip().replace("臺", "台").replace(" ", "")
+    if not place:
+        return None
+    if place in GAZETTEER:
+        return GAZETTEER[place]
+    matches = [name for name in GAZETTEER if name in place]
+    return GAZETTEER[max(matches, key=len)] if matches else None
+
+
+def geocode_existing_courses(apps, schema_editor):
+    # 以內建的縣市對照表填入既有課程的座標，並更新 updated_at 讓 ETag 改變
+    Course = apps.get_model("myapps", "Course")
+    now = timezone.now()
+    changed = []
+    for course in Course.objects.only("pk", "location").order_by("pk"):
+        point = geocode(course.location)
+        if point is not None:
+            course.latitude, course.longitude = point
+            course.geohash = encode_geohash(*point)
+            course.updated_at = now
+            changed.append(course)
+    Course.objects.bulk_update(
+        changed, ["latitude", "longitude", "geohash", "updated_at"], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = (("myapps", "0012_course_similarity"),)
+
+    operations = (
+        migrations.AddField(
+            model_name="course",
+            name="geohash",
+            field=models.CharField(
+                blank=True,
+                default="",
+                editable=False,
+                max_length=12,
+                verbose_name="geohash",
+            ),
+        ),
+        migrations.AddField(
+            model_name="course",
+            name="latitude",
+            field=models.FloatField(
+                blank=True,
+                null=True,
+                validators=[
+                    django.core.validators.MinValueValidator(-90),
+                    django.core.validators.MaxValueValidator(90),
+                ],
+                verbose_name="緯度",
+            ),
+        ),
+        migrations.AddField(
+            model_name="course",
+            name="longitude",
+            field=models.FloatField(
+                blank=True,
+                null=True,
+                validators=[
+                    django.core.validators.MinValueValidator(-180),
+                    django.core.validators.MaxValueValidator(180),
+                ],
+                verbose_name="經度",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="course",
+            index=models.Index(fields=["geohash"], name="courses_geohash_idx"),
+        ),
+        migrations.RunPython(geocode_existing_courses, migrations.RunPython.noop),
+    )
@@ -0,0 +1,85 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:18
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = (("myapps", "0013_course_coordinates"),)
+
+    operations = (
+        migrations.CreateModel(
+            name="Task",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100, verbose_name="工作名稱")),
+                ("kwargs", models.JSONField(default=dict, verbose_name="參數")),
+                ("dedupe_key", models.CharField(max_length=64, verbose_name="去重鍵")),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "待執行"),
+                            ("running", "執行中"),
+                            ("failed", "失敗"),
+                        ],
+                        default="pending",
+                        max_length=10,
+                        verbose_name="狀態",
+                    ),
+                ),
+                (
+                    "attempts",
+                    models.PositiveSmallIntegerField(
+                        default=0, verbose_name="執行次數"
+                    ),
+                ),
+                (
+                    "run_after",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, verbose_name="可執行時間"
+                    ),
+                ),
+                (
+                    "locked_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="開始執行時間"
+                    ),
+                ),
+                (
+                    "last_error",
+                    models.TextField(blank=True, default="", verbose_name="最後錯誤"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="建立時間"),
+                ),
+            ],
+            options={
+                "verbose_name": "背景工作",
+                "verbose_name_plural": "背景工作",
+                "db_table": "tasks",
+                "indexes": [
+                    models.Index(
+                        fields=["status", "run_after", "id"],
+                        name="tasks_status_run_after_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        condition=models.Q(("status", "pending")),
+                        fields=("dedupe_key",),
+                        name="tasks_pending_dedupe_key",
+                    )
+                ],
+            },
+        ),
+    )
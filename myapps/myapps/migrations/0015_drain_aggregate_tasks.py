@@ -0,0 +1,112 @@
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Count, F, FloatField, Sum
+from django.db.models.functions import Cast, Coalesce, TruncDate
+from django.utils import timezone
+
+AGGREGATE_TASKS = ("course_rating", "course_summaries")
+
+
+def drain_aggregate_tasks(apps, schema_editor):
+    # 評分與每日統計改回在寫入的交易中以 F() 差值更新，
+    # 尚未執行的重新計算工作在此完成後刪除
+    # （邏輯固定在遷移中，不隨 ratings.py / analytics.py 變動）
+    Task = apps.get_model("myapps", "Task")
+    Course = apps.get_model("myapps", "Course")
+    Review = apps.get_model("myapps", "Review")
+    Booking = apps.get_model("myapps", "Booking")
+    BookingDailySummary = apps.get_model("myapps", "BookingDailySummary")
+    ReviewDailySummary = apps.get_model("myapps", "ReviewDailySummary")
+
+    tasks = Task.objects.filter(name__in=AGGREGATE_TASKS)
+    course_ids = {
+        kwargs["course_id"] for kwargs in tasks.values_list("kwargs", flat=True)
+    }
+    if not course_ids:
+        tasks.delete()
+        return
+
+    totals = {
+        row["course_id"]: (row["rating_sum"] or 0.0, row["rating_count"])
+        for row in Review.objects.filter(course_id__in=course_ids)
+        .order_by()
+        .values("course_id")
+        .annotate(
+            rating_sum=Sum(Cast("rating", FloatField())),
+            rating_count=Count("id"),
+        )
+    }
+    courses = list(Course.objects.filter(pk__in=course_ids).only("id"))
+    now = timezone.now()
+    for course in courses:
+        course.updated_at = now
+        course.rating_sum, course.rating_count = totals.get(course.pk, (0.0, 0))
+        course.avg_rating = (
+            round(course.rating_sum / course.rating_count, 2)
+            if course.rating_count
+            else 0.0
+        )
+    Course.objects.bulk_update(
+        courses,
+        ["rating_sum", "rating_count", "avg_rating", "updated_at"],
+        batch_size=500,
+    )
+
+    bookings = list(
+        Booking.objects.filter(course_id__in=course_ids)
+        .order_by()
+        .values(
+            "course_id",
+            "status",
+            teacher=F("course__teacher_id"),
+            day=TruncDate(Coalesce("start_at", "created_at")),
+        )
+        .annotate(count=Count("id"), amount=Sum("course__price"))
+    )
+    reviews = list(
+        Review.objects.filter(course_id__in=course_ids)
+        .order_by()
+        .values(
+            "course_id", teacher=F("course__teacher_id"), day=TruncDate("created_at")
+        )
+        .annotate(count=Count("id"), rating_sum=Sum(Cast("rating", FloatField())))
+    )
+    BookingDailySummary.objects.filter(course_id__in=course_ids).delete()
+    ReviewDailySummary.objects.filter(course_id__in=course_ids).delete()
+    BookingDailySummary.objects.bulk_create(
+        [
+            BookingDailySummary(
+                teacher_id=row["teacher"],
+                course_id=row["course_id"],
+                day=row["day"],
+                status=row["status"],
+                count=row["count"],
+                amount=row["amount"] or Decimal(0),
+            )
+            for row in bookings
+        ],
+        batch_size=500,
+    )
+    ReviewDailySummary.objects.bulk_create(
+        [
+            ReviewDailySummary(
+                teacher_id=row["teacher"],
+                course_id=row["course_id"],
+                day=row["day"],
+                count=row["count"],
+                rating_sum=row["rating_sum"] or 0.0,
+            )
+            for row in reviews
+        ],
+        batch_size=500,
+    )
+    tasks.delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = (("myapps", "0014_task_queue"),)
+
+    operations = (
+        migrations.RunPython(drain_aggregate_tasks, migrations.RunPython.noop),
+    )
@@ -0,0 +1,14 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = (("myapps", "0015_drain_aggregate_tasks"),)
+
+    operations = (
+        migrations.AddIndex(
+            model_name="course",
+            index=models.Index(fields=["updated_at"], name="courses_updated_at_idx"),
+        ),
+    )
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:59
+
+import datetime
+
+import django.db.models.expressions
+from django.db import migrations, models
+from django.utils import timezone
+
+# 遷移當時的預約長度上限（固定於此，不隨 schedule.py 變動）
+MAX_DURATION = datetime.timedelta(hours=8)
+
+
+def clamp_long_bookings(apps, schema_editor):
+    # 舊資料（例如 "08:00-20:00"）可能超過上限，加上檢查約束前先縮短為上限長度
+    Booking = apps.get_model("myapps", "Booking")
+    Booking.objects.filter(end_at__gt=models.F("start_at") + MAX_DURATION).update(
+        end_at=models.F("start_at") + MAX_DURATION, updated_at=timezone.now()
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = (("myapps", "0016_course_updated_at_index"),)
+
+    operations = (
+        migrations.RunPython(clamp_long_bookings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="booking",
+            constraint=models.CheckConstraint(
+                condition=models.Q(
+                    (
+                        "end_at__lte",
+                        django.db.models.expressions.CombinedExpression(
+                            models.F("start_at"),
+                            "+",
+                            models.Value(datetime.timedelta(seconds=28800)),
+                        ),
+                    )
+                ),
+                name="bookings_max_duration",
+            ),
+        ),
+    )
@@ -1,7 +1,21 @@
-from django.db import models
+from django.db import models, router, transaction
 from django.contrib.auth.models import AbstractUser
+from django.core.exceptions import ValidationError
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.utils import timezone
 from decimal import Decimal
 
+from .schedule import MAX_DURATION
+
+
+class AtomicSaveMixin:
+    """儲存與 post_save 訊號中的統計差值更新在同一個交易中完成"""
+
+    def save(self, *args, using=None, **kwargs):
+        using = using or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, using=using, **kwargs)
+
 
 class User(models.Model):
     """使用者基礎資料表"""
@@ -17,11 +31,22 @@ class User(models.Model):
     ]
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, verbose_name="角色")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="建立時間")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新時間")
 
     class Meta:
         verbose_name = "使用者"
         verbose_name_plural = "使用者"
         db_table = "users"
+        indexes = (
+            # 游標分頁依 (created_at, id) 排序與定位
+            models.Index(fields=["created_at", "id"], name="users_created_at_id_idx"),
+            # 依角色篩選後依建立時間排序
+            models.Index(
+                fields=["role", "created_at", "id"], name="users_role_created_idx"
+            ),
+            # 學生列表依使用者姓名排序
+            models.Index(fields=["name"], name="users_name_idx"),
+        )
 
     def __str__(self):
         return f"{self.name} ({self.account})"
@@ -67,11 +92,17 @@ class Teacher(models.Model):
         max_length=20, choices=STATUS_CHOICES, verbose_name="狀態"
     )
     blue_premium = models.BooleanField(default=False, verbose_name="藍鑽會員")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新時間")
 
     class Meta:
         verbose_name = "教師"
         verbose_name_plural = "教師"
         db_table = "teachers"
+        indexes = (
+            # 教師列表依姓名排序，可先依狀態篩選
+            models.Index(fields=["name"], name="teachers_name_idx"),
+            models.Index(fields=["status", "name"], name="teachers_status_name_idx"),
+        )
 
     def __str__(self):
         return self.name
@@ -90,6 +121,7 @@ class Student(models.Model):
     ]
     gender = models.CharField(max_length=1, choices=GENDER_CHOICES, verbose_name="性別")
     age = models.CharField(max_length=10, verbose_name="年齡")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新時間")
 
     class Meta:
         verbose_name = "學生"
@@ -100,7 +132,7 @@ class Student(models.Model):
         return f"{self.user.name} (學生)"
 
 
-class Course(models.Model):
+class Course(AtomicSaveMixin, models.Model):
     """課程資料表"""
 
     subject = models.CharField(max_length=200, verbose_name="科目")
@@ -111,23 +143,102 @@ class Course(models.Model):
     avg_rating = models.FloatField(
         default=0.0, blank=True, null=True, verbose_name="平均評分"
     )
+    rating_sum = models.FloatField(default=0.0, editable=False, verbose_name="評分總和")
+    rating_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="評價數量"
+    )
+    # 排行榜分數，由 recompute_leaderboard 批次計算（見 leaderboard.py）
+    rating_score = models.FloatField(
+        default=0.0, editable=False, verbose_name="加權評分"
+    )
+    trending_score = models.FloatField(
+        default=0.0, editable=False, verbose_name="熱門度"
+    )
+    latitude = models.FloatField(
+        blank=True,
+        null=True,
+        validators=[MinValueValidator(-90), MaxValueValidator(90)],
+        verbose_name="緯度",
+    )
+    longitude = models.FloatField(
+        blank=True,
+        null=True,
+        validators=[MinValueValidator(-180), MaxValueValidator(180)],
+        verbose_name="經度",
+    )
+    # 由座標計算，附近課程查詢以前綴範圍讀取（見 geo.py）
+    geohash = models.CharField(
+        max_length=12, blank=True, default="", editable=False, verbose_name="geohash"
+    )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="建立時間")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新時間")
 
     class Meta:
         verbose_name = "課程"
         verbose_name_plural = "課程"
         db_table = "courses"
+        indexes = (
+            # 游標分頁依 (created_at, id) 排序與定位
+            models.Index(fields=["created_at", "id"], name="courses_created_at_id_idx"),
+            models.Index(
+                fields=["teacher", "created_at", "id"],
+                name="courses_teacher_created_idx",
+            ),
+            # 排行榜依 (分數, id) 由高到低讀取，可先依科目或地點篩選
+            models.Index(
+                fields=["rating_score", "id"], name="courses_rating_score_idx"
+            ),
+            models.Index(
+                fields=["subject", "rating_score", "id"],
+                name="courses_subject_rating_idx",
+            ),
+            models.Index(
+                fields=["location", "rating_score", "id"],
+                name="courses_location_rating_idx",
+            ),
+            models.Index(
+                fields=["trending_score", "id"], name="courses_trending_score_idx"
+            ),
+            models.Index(
+                fields=["subject", "trending_score", "id"],
+                name="courses_subject_trending_idx",
+            ),
+            models.Index(
+                fields=["location", "trending_score", "id"],
+                name="courses_location_trending_idx",
+            ),
+            models.Index(fields=["geohash"], name="courses_geohash_idx"),
+            # 回應快取鍵包含 MAX(updated_at)，批次更新課程後所有行程的快取都會失效
+            models.Index(fields=["updated_at"], name="courses_updated_at_idx"),
+        )
 
     def __str__(self):
         return f"{self.subject} - {self.teacher.name}"
 
-
-class Booking(models.Model):
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # 記錄載入時的教師與價格，變更時需調整該課程的每日統計
+        instance._summary_snapshot = (
+            instance.__dict__.get("teacher_id"),
+            instance.__dict__.get("price"),
+        )
+        # 相似課程依內容、地點與價格計算，只有這些欄位變更時才需要更新
+        instance._similarity_snapshot = tuple(
+            instance.__dict__.get(name)
+            for name in ("subject", "description", "location", "price")
+        )
+        return instance
+
+
+class Booking(AtomicSaveMixin, models.Model):
     """預約資料表"""
 
     course = models.ForeignKey(Course, on_delete=models.CASCADE, verbose_name="課程")
     student = models.ForeignKey(Student, on_delete=models.CASCADE, verbose_name="學生")
-    schedule_date = models.CharField(max_length=100, verbose_name="預約時間")
+    # 舊資料中無法解析的預約時間為空值
+    start_at = models.DateTimeField(null=True, verbose_name="開始時間")
+    end_at = models.DateTimeField(null=True, verbose_name="結束時間")
 
     STATUS_CHOICES = [
         ("pending", "待確認"),
@@ -139,17 +250,67 @@ class Booking(models.Model):
         max_length=20, choices=STATUS_CHOICES, verbose_name="狀態"
     )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="建立時間")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新時間")
 
     class Meta:
         verbose_name = "預約"
         verbose_name_plural = "預約"
         db_table = "bookings"
+        indexes = (
+            # 游標分頁依 (created_at, id) 排序與定位
+            models.Index(
+                fields=["created_at", "id"], name="bookings_created_at_id_idx"
+            ),
+            # 依狀態、學生或課程篩選後依建立時間排序
+            models.Index(
+                fields=["status", "created_at", "id"],
+                name="bookings_status_created_idx",
+            ),
+            models.Index(
+                fields=["student", "created_at", "id"],
+                name="bookings_student_created_idx",
+            ),
+            models.Index(
+                fields=["course", "created_at", "id"],
+                name="bookings_course_created_idx",
+            ),
+            # 行事曆與時段衝突檢查：教師（經由課程）與學生在某段期間內的預約
+            models.Index(
+                fields=["course", "start_at", "end_at"],
+                name="bookings_course_interval_idx",
+            ),
+            models.Index(
+                fields=["student", "start_at"], name="bookings_student_start_idx"
+            ),
+        )
+        constraints = (
+            # busy_bookings() 的重疊查詢只掃描開始時間晚於 start - MAX_DURATION 的預約
+            models.CheckConstraint(
+                condition=models.Q(end_at__lte=models.F("start_at") + MAX_DURATION),
+                name="bookings_max_duration",
+            ),
+        )
 
     def __str__(self):
         return f"{self.student.user.name} - {self.course.subject}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # 記錄載入時的課程、狀態與日期，供更新時調整每日統計
+        instance._summary_snapshot = tuple(
+            instance.__dict__.get(name)
+            for name in ("course_id", "status", "start_at", "created_at")
+        )
+        return instance
+
+    def clean(self):
+        if self.start_at and self.end_at and self.end_at - self.start_at > MAX_DURATION:
+            hours = MAX_DURATION.total_seconds() / 3600
+            raise ValidationError({"end_at": f"預約時間最長 {hours:g} 小時"})
 
-class Review(models.Model):
+
+class Review(AtomicSaveMixin, models.Model):
     """評價資料表"""
 
     course = models.ForeignKey(Course, on_delete=models.CASCADE, verbose_name="課程")
@@ -158,11 +319,211 @@ class Review(models.Model):
         max_length=1000, blank=True, null=True, verbose_name="評論"
     )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="建立時間")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新時間")
 
     class Meta:
         verbose_name = "評價"
         verbose_name_plural = "評價"
         db_table = "reviews"
+        indexes = (
+            # 游標分頁依 (created_at, id) 排序與定位
+            models.Index(fields=["created_at", "id"], name="reviews_created_at_id_idx"),
+            models.Index(
+                fields=["course", "created_at", "id"],
+                name="reviews_course_created_idx",
+            ),
+        )
 
     def __str__(self):
         return f"{self.course.subject} - 評分: {self.rating}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # 記錄載入時的課程與評分，供更新時計算評分差值
+        instance._rating_snapshot = (
+            instance.__dict__.get("course_id"),
+            instance.__dict__.get("rating"),
+        )
+        return instance
+
+
+class BookingDailySummary(models.Model):
+    """每日預約統計（依教師、課程、日期、狀態彙總，由預約的訊號增量維護）"""
+
+    teacher = models.ForeignKey(
+        Teacher, on_delete=models.CASCADE, related_name="+", verbose_name="教師"
+    )
+    course = models.ForeignKey(
+        Course, on_delete=models.CASCADE, related_name="+", verbose_name="課程"
+    )
+    # 上課日期（當地時間），舊資料沒有上課時間時以建立日期為準
+    day = models.DateField(verbose_name="日期")
+    status = models.CharField(
+        max_length=20, choices=Booking.STATUS_CHOICES, verbose_name="狀態"
+    )
+    count = models.PositiveIntegerField(default=0, verbose_name="預約數量")
+    amount = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal(0),
+        verbose_name="課程價格總和",
+    )
+
+    class Meta:
+        verbose_name = "每日預約統計"
+        verbose_name_plural = "每日預約統計"
+        db_table = "booking_daily_summaries"
+        constraints = (
+            # 教師在前、日期次之，教師儀表板的期間查詢直接使用此索引
+            models.UniqueConstraint(
+                fields=["teacher", "day", "course", "status"],
+                name="booking_summary_key",
+            ),
+        )
+
+    def __str__(self):
+        return f"{self.day} {self.course_id} {self.status}: {self.count}"
+
+
+class ReviewDailySummary(models.Model):
+    """每日評價統計（依教師、課程、日期彙總，由評價的訊號增量維護）"""
+
+    teacher = models.ForeignKey(
+        Teacher, on_delete=models.CASCADE, related_name="+", verbose_name="教師"
+    )
+    course = models.ForeignKey(
+        Course, on_delete=models.CASCADE, related_name="+", verbose_name="課程"
+    )
+    # 評價建立日期（當地時間）
+    day = models.DateField(verbose_name="日期")
+    count = models.PositiveIntegerField(default=0, verbose_name="評價數量")
+    rating_sum = models.FloatField(default=0.0, verbose_name="評分總和")
+
+    class Meta:
+        verbose_name = "每日評價統計"
+        verbose_name_plural = "每日評價統計"
+        db_table = "review_daily_summaries"
+        constraints = (
+            models.UniqueConstraint(
+                fields=["teacher", "day", "course"], name="review_summary_key"
+            ),
+        )
+
+    def __str__(self):
+        return f"{self.day} {self.course_id}: {self.count}"
+
+
+class CourseTermWeight(models.Model):
+    """課程內容的 TF-IDF 稀疏向量（每個詞一列，已正規化為單位長度）"""
+
+    course = models.ForeignKey(
+        Course, on_delete=models.CASCADE, related_name="+", verbose_name="課程"
+    )
+    term = models.CharField(max_length=64, verbose_name="詞")
+    weight = models.FloatField(verbose_name="權重")
+
+    class Meta:
+        verbose_name = "課程詞權重"
+        verbose_name_plural = "課程詞權重"
+        db_table = "course_term_weights"
+        constraints = (
+            models.UniqueConstraint(
+                fields=["course", "term"], name="course_term_weight_key"
+            ),
+        )
+        indexes = (
+            # 倒排索引：單一課程更新時依權重由高到低讀取含有相同詞的課程
+            models.Index(
+                fields=["term", "weight", "course"], name="course_term_posting_idx"
+            ),
+        )
+
+    def __str__(self):
+        return f"{self.course_id} {self.term}: {self.weight:.4f}"
+
+
+class CourseSimilarity(models.Model):
+    """預先計算的相似課程（每門課程保留分數最高的前幾門）"""
+
+    course = models.ForeignKey(
+        Course,
+        on_delete=models.CASCADE,
+        related_name="similarities",
+        verbose_name="課程",
+    )
+    similar = models.ForeignKey(
+        Course,
+        on_delete=models.CASCADE,
+        related_name="similar_entries",
+        verbose_name="相似課程",
+    )
+    score = models.FloatField(verbose_name="相似度")
+
+    class Meta:
+        verbose_name = "相似課程"
+        verbose_name_plural = "相似課程"
+        db_table = "course_similarities"
+        constraints = (
+            models.UniqueConstraint(
+                fields=["course", "similar"], name="course_similarity_key"
+            ),
+        )
+        indexes = (
+            # 相似課程端點依相似度由高到低讀取
+            models.Index(
+                fields=["course", "score", "similar"],
+                name="course_similarity_score_idx",
+            ),
+        )
+
+    def __str__(self):
+        return f"{self.course_id} -> {self.similar_id}: {self.score:.4f}"
+
+
+class Task(models.Model):
+    """背景工作佇列（見 taskqueue.py），執行成功的工作直接刪除"""
+
+    PENDING = "pending"
+    RUNNING = "running"
+    FAILED = "failed"
+    STATUS_CHOICES = (
+        (PENDING, "待執行"),
+        (RUNNING, "執行中"),
+        (FAILED, "失敗"),
+    )
+
+    name = models.CharField(max_length=100, verbose_name="工作名稱")
+    kwargs = models.JSONField(default=dict, verbose_name="參數")
+    dedupe_key = models.CharField(max_length=64, verbose_name="去重鍵")
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=PENDING, verbose_name="狀態"
+    )
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="執行次數")
+    run_after = models.DateTimeField(default=timezone.now, verbose_name="可執行時間")
+    locked_at = models.DateTimeField(null=True, blank=True, verbose_name="開始執行時間")
+    last_error = models.TextField(blank=True, default="", verbose_name="最後錯誤")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="建立時間")
+
+    class Meta:
+        verbose_name = "背景工作"
+        verbose_name_plural = "背景工作"
+        db_table = "tasks"
+        constraints = (
+            # 相同名稱與參數的待執行工作只保留一筆
+            models.UniqueConstraint(
+                fields=["dedupe_key"],
+                condition=models.Q(status="pending"),
+                name="tasks_pending_dedupe_key",
+            ),
+        )
+        indexes = (
+            # worker 依可執行時間取出待執行的工作
+            models.Index(
+                fields=["status", "run_after", "id"],
+                name="tasks_status_run_after_idx",
+            ),
+        )
+
+    def __str__(self):
+        return f"{self.name}({self.kwargs}) [{self.status}]"
@@ -0,0 +1,168 @@
+"""
+分頁
+
+預設仍使用 ``PageNumberPagination``（``?page=``）。依建立時間排序的列表端點可改用
+:class:`KeysetPagination`：以最後一筆資料的 ``(created_at, id)`` 作為游標，
+每頁只需一次索引範圍查詢，不需要 ``COUNT(*)`` 與 ``OFFSET``，翻到再深的頁數都一樣快。
+
+用戶端在查詢參數加上 ``pagination=cursor``（或直接帶入 ``cursor``）即可切換，
+回應中的 ``next`` / ``previous`` 連結會帶著游標。只有 ``keyset_actions`` 列出的動作
+（依 ``(created_at, id)`` 排序的列表）會切換，
+搜尋、分面搜尋等自有排序的動作仍使用頁碼分頁。
+
+非同步端點使用 :class:`AsyncPageNumberPagination`，
+回應格式與 ``PageNumberPagination`` 相同。
+"""
+
+import base64
+import binascii
+from datetime import datetime
+
+from django.core.paginator import InvalidPage, Page
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(CursorPagination):
+    """以 ``(created_at, id)`` 複合鍵由新到舊排序的游標分頁"""
+
+    ordering = ("-created_at", "-id")
+    time_field = "created_at"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        reverse, position = self.cursor or (False, None)
+
+        if reverse:
+            # 往前翻頁：由舊到新取出游標之後的資料，再反轉回原本的順序
+            queryset = queryset.order_by(self.time_field, "id")
+            if position is not None:
+                queryset = queryset.filter(self._after(*position))
+        else:
+            queryset = queryset.order_by(f"-{self.time_field}", "-id")
+            if position is not None:
+                queryset = queryset.filter(self._before(*position))
+
+        results = list(queryset[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[: self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_previous = has_more
+            self.has_next = True
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+        return self.page
+
+    def _before(self, timestamp, pk):
+        # 先以 created_at <= 游標限定索引範圍，再處理同一時間的資料
+        field = self.time_field
+        return Q(**{f"{field}__lte": timestamp}) & (
+            Q(**{f"{field}__lt": timestamp}) | Q(pk__lt=pk)
+        )
+
+    def _after(self, timestamp, pk):
+        field = self.time_field
+        return Q(**{f"{field}__gte": timestamp}) & (
+            Q(**{f"{field}__gt": timestamp}) | Q(pk__gt=pk)
+        )
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor((False, self._position(self.page[-1])))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor((True, self._position(self.page[0])))
+
+    def _position(self, instance):
+        # 快速序列化時分頁的是 values() 取出的 dict
+        if isinstance(instance, dict):
+            return instance[self.time_field], instance["id"]
+        return getattr(instance, self.time_field), instance.pk
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            decoded = base64.urlsafe_b64decode(encoded.encode("ascii")).decode("ascii")
+            direction, position, pk = decoded.split("|")
+            return direction == "r", (self.parse_position(position), int(pk))
+        except (TypeError, ValueError, UnicodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+    def parse_position(self, value):
+        return datetime.fromisoformat(value)
+
+    def format_position(self, value):
+        return value.isoformat()
+
+    def encode_cursor(self, cursor):
+        reverse, (position, pk) = cursor
+        raw = f"{'r' if reverse else 'f'}|{self.format_position(position)}|{pk}"
+        encoded = base64.urlsafe_b64encode(raw.encode("ascii")).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+
+class KeysetPaginationMixin:
+    """
+    讓 ViewSet 的列表可選擇改用游標分頁
+
+    ``keyset_actions`` 中的動作在查詢參數帶有 ``pagination=cursor`` 或 ``cursor`` 時
+    使用 :class:`KeysetPagination`，否則沿用 ViewSet 原本的分頁方式。
+    """
+
+    keyset_pagination_class = KeysetPagination
+    # 結果依 (created_at, id) 由新到舊排序的動作
+    keyset_actions = ("list",)
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            params = self.request.query_params if self.request else {}
+            wants_cursor = params.get("pagination") == "cursor" or params.get("cursor")
+            if wants_cursor and self.action in self.keyset_actions:
+                self._paginator = self.keyset_pagination_class()
+            else:
+                return super().paginator
+        return self._paginator
+
+
+class AsyncPageNumberPagination(PageNumberPagination):
+    """以 ``acount()`` 與 ``aiterator()`` 查詢的 ``PageNumberPagination``"""
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        # 先填入總數，Paginator 計算頁數時不會再同步查詢
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        if page_number in self.last_page_strings:
+            page_number = paginator.num_pages
+        try:
+            number = paginator.validate_number(page_number)
+        except InvalidPage as exc:
+            raise NotFound(
+                self.invalid_page_message.format(
+                    page_number=page_number, message=str(exc)
+                )
+            )
+        bottom = (number - 1) * page_size
+        rows = [row async for row in queryset[bottom : bottom + page_size].aiterator()]
+        self.page = Page(rows, number, paginator)
+        return rows
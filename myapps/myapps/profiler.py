@@ -0,0 +1,208 @@
+"""
+每個請求的查詢分析
+
+:class:`QueryProfilerMiddleware` 記錄每個請求在所有資料庫連線上的查詢次數、資料庫耗時，
+以及參數化後相同的 SQL（指紋）重複執行的次數——同一個指紋重複出現通常就是 N+1 查詢。
+
+每個連線建立時都會加上常駐的 execute wrapper（:func:`record_queries`），查詢記錄到目前
+情境（``ContextVar``）中的 :class:`QueryProfile`。``sync_to_async`` 會複製情境，因此
+非同步 ORM（``acount()`` / ``aget()`` 等）在其他執行緒的連線上執行的查詢也會算在請求中。
+
+結果以 ``Server-Timing`` 標頭回傳（瀏覽器開發者工具的 Timing 分頁可直接看到），
+超出 ``settings.QUERY_PROFILER`` 預算的請求會寫入 ``myapps.profiler`` logger；
+``STRICT`` 模式下則直接拋出 :class:`QueryBudgetExceeded`，適合在測試與開發環境使用。
+"""
+
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger("myapps.profiler")
+
+DEFAULTS = {
+    "ENABLED": True,
+    # 回應是否加上 Server-Timing 標頭
+    "HEADERS": True,
+    # 單一請求的預算，None 表示不限制
+    "MAX_QUERIES": 20,
+    "MAX_DB_TIME_MS": 200,
+    "MAX_DUPLICATES": 5,
+    # 超出預算時拋出例外而不只是記錄
+    "STRICT": False,
+}
+
+_IN_LIST = re.compile(r"\(\s*%s(?:\s*,\s*%s)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+# 目前情境中正在記錄的 QueryProfile（巢狀的 profile_queries 各自記錄）
+_active_profiles = ContextVar("query_profiles", default=())
+
+
+def get_setting(name):
+    return getattr(settings, "QUERY_PROFILER", {}).get(name, DEFAULTS[name])
+
+
+def fingerprint(sql):
+    """SQL 指紋：參數已是 %s，再把長度不同的 IN (...) 與空白正規化"""
+    return _WHITESPACE.sub(" ", _IN_LIST.sub("(%s, ...)", sql)).strip()
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryProfile:
+    """一段期間內執行的查詢統計"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def record(self, sql, duration):
+        self.duration += duration
+        self.count += 1
+        self.fingerprints[sql] += 1
+
+    @property
+    def duration_ms(self):
+        return self.duration * 1000
+
+    @property
+    def duplicates(self):
+        """重複執行的查詢次數（每個指紋第一次之外的次數總和）"""
+        return sum(count - 1 for count in self.fingerprints.values() if count > 1)
+
+    def most_duplicated(self):
+        sql, count = (
+            self.fingerprints.most_common(1)[0] if self.fingerprints else ("", 0)
+        )
+        return (sql, count) if count > 1 else None
+
+    def over_budget(self):
+        """回傳超出預算的項目說明"""
+        problems = []
+        checks = [
+            ("MAX_QUERIES", self.count, "次查詢"),
+            ("MAX_DB_TIME_MS", self.duration_ms, " ms 資料庫時間"),
+            ("MAX_DUPLICATES", self.duplicates, "次重複查詢"),
+        ]
+        for name, value, unit in checks:
+            budget = get_setting(name)
+            if budget is not None and value > budget:
+                problems.append(f"{value:.0f}{unit}（預算 {budget}）")
+        return problems
+
+    def server_timing(self):
+        metrics = [f'db;dur={self.duration_ms:.2f};desc="{self.count} queries"']
+        if self.duplicates:
+            metrics.append(f'db-dup;desc="{self.duplicates} duplicated"')
+        return metrics
+
+
+def record_queries(execute, sql, params, many, context):
+    """常駐在每個連線上的 execute wrapper，沒有進行中的記錄時直接執行"""
+    profiles = _active_profiles.get()
+    if not profiles:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        key = fingerprint(sql)
+        for profile in profiles:
+            profile.record(key, duration)
+
+
+def install_recorder(connection, **kwargs):
+    if record_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_queries)
+
+
+connection_created.connect(install_recorder, dispatch_uid="myapps.profiler")
+
+
+@contextmanager
+def profile_queries():
+    """
+    記錄區塊內執行的查詢，產生 :class:`QueryProfile`
+
+    包含區塊內以 ``sync_to_async`` 在其他執行緒執行的查詢。
+    """
+    # 在此之前已建立的連線
+    for connection in connections.all(initialized_only=True):
+        install_recorder(connection)
+    profile = QueryProfile()
+    token = _active_profiles.set((*_active_profiles.get(), profile))
+    try:
+        yield profile
+    finally:
+        _active_profiles.reset(token)
+
+
+class QueryProfilerMiddleware:
+    """記錄每個請求的查詢，加上 Server-Timing 標頭並檢查預算"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # ASGI 下直接 await 下一層，非同步視圖不需要切換到執行緒
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not get_setting("ENABLED"):
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        with profile_queries() as profile:
+            response = self.get_response(request)
+        return self.finish(request, response, started, profile)
+
+    async def __acall__(self, request):
+        if not get_setting("ENABLED"):
+            return await self.get_response(request)
+
+        started = time.perf_counter()
+        with profile_queries() as profile:
+            response = await self.get_response(request)
+        return self.finish(request, response, started, profile)
+
+    def finish(self, request, response, started, profile):
+        total_ms = (time.perf_counter() - started) * 1000
+        # 測試可由 response.wsgi_request.query_profile 取得統計
+        request.query_profile = profile
+
+        if get_setting("HEADERS"):
+            metrics = profile.server_timing() + [f"app;dur={total_ms:.2f}"]
+            existing = response.get("Server-Timing")
+            response["Server-Timing"] = ", ".join(filter(None, [existing, *metrics]))
+
+        problems = profile.over_budget()
+        if problems:
+            duplicated = profile.most_duplicated()
+            message = (
+                f"{request.method} {request.get_full_path()} "
+                f"超出查詢預算：{'、'.join(problems)}"
+            )
+            if duplicated:
+                sql, count = duplicated
+                message += f"；重複最多的查詢（{count} 次）：{sql}"
+            if get_setting("STRICT"):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
@@ -0,0 +1,89 @@
+"""
+課程評分統計
+
+課程的 ``rating_sum`` / ``rating_count`` 為評價的累計值，新增、修改、刪除評價時
+以 ``F()`` 表達式在單一 UPDATE 中原子性地調整，``avg_rating`` 由同一敘述一併算出，
+不需要重新讀取該課程的所有評價。差值更新與評價的寫入在同一個交易中（見 models.py），
+不會只完成其中一項；:func:`rebuild_course_ratings` 只用於離線修復。
+"""
+
+from django.db.models import Case, Count, F, FloatField, Sum, Value, When
+from django.db.models.functions import Cast, Round
+from django.utils import timezone
+
+
+def parse_rating(rating):
+    """將評分字串轉為浮點數"""
+    return float(rating)
+
+
+def apply_rating_delta(course_id, sum_delta, count_delta):
+    """以原子更新調整課程評分累計值，並重新計算平均評分"""
+    from .models import Course
+
+    new_sum = F("rating_sum") + Value(float(sum_delta))
+    new_count = F("rating_count") + Value(int(count_delta))
+    return Course.objects.filter(pk=course_id).update(
+        rating_sum=new_sum,
+        rating_count=new_count,
+        # UPDATE 右側的欄位皆為更新前的值，因此條件為「原數量 + 差值 > 0」
+        avg_rating=Case(
+            When(
+                rating_count__gt=-int(count_delta),
+                then=Round(new_sum / new_count, 2),
+            ),
+            default=Value(0.0),
+            output_field=FloatField(),
+        ),
+        updated_at=timezone.now(),
+    )
+
+
+def rebuild_course_ratings(batch_size=500, course_model=None, review_model=None):
+    """
+    重建所有課程的評分統計
+
+    以單一 GROUP BY 查詢取得每門課程的評分總和與數量，再分批寫回課程資料表。
+    回傳更新的課程數量。
+    """
+    if course_model is None or review_model is None:
+        from .models import Course as course_model
+        from .models import Review as review_model
+
+    totals = {
+        row["course_id"]: (row["rating_sum"] or 0.0, row["rating_count"])
+        for row in review_model.objects.order_by()
+        .values("course_id")
+        .annotate(
+            rating_sum=Sum(Cast("rating", FloatField())),
+            rating_count=Count("id"),
+        )
+    }
+
+    fields = ["rating_sum", "rating_count", "avg_rating"]
+    # 舊版資料表（例如遷移過程中的歷史模型）可能還沒有 updated_at 欄位
+    touch = any(field.name == "updated_at" for field in course_model._meta.fields)
+    if touch:
+        fields.append("updated_at")
+    now = timezone.now()
+
+    # SQLite 在同一連線中邊讀邊寫同一張表並不安全，先取出需要變更的課程再分批寫回
+    changed = []
+    for pk, old_sum, old_count, old_avg in course_model.objects.values_list(
+        "id", "rating_sum", "rating_count", "avg_rating"
+    ):
+        rating_sum, rating_count = totals.get(pk, (0.0, 0))
+        avg_rating = round(rating_sum / rating_count, 2) if rating_count else 0.0
+        if (old_sum, old_count, old_avg) != (rating_sum, rating_count, avg_rating):
+            changed.append(
+                course_model(
+                    pk=pk,
+                    rating_sum=rating_sum,
+                    rating_count=rating_count,
+                    avg_rating=avg_rating,
+                    **({"updated_at": now} if touch else {}),
+                )
+            )
+
+    course_model.objects.bulk_update(changed, fields, batch_size=batch_size)
+    return len(changed)
@@ -0,0 +1,172 @@
+"""
+讀寫分離
+
+:class:`ReadReplicaMiddleware` 讓 GET / HEAD / OPTIONS 請求的查詢由
+:class:`ReadReplicaRouter` 分配到 ``settings.READ_REPLICAS["ALIASES"]`` 中的唯讀副本，
+寫入與其他請求一律使用主資料庫。
+
+副本會落後主資料庫（本機以 ``python manage.py sync_replicas`` 的 ``VACUUM INTO``
+快照同步），因此客戶端送出 POST / PUT / PATCH / DELETE 後會收到一個短期 cookie，
+``STICKY_SECONDS`` 秒內該客戶端的讀取仍走主資料庫，確保讀得到自己剛寫入的資料。
+"""
+
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+
+DEFAULTS = {
+    "ENABLED": False,
+    "ALIASES": [],
+    # 寫入後仍讀取主資料庫的秒數，應大於副本同步的間隔
+    "STICKY_SECONDS": 10,
+    "COOKIE_NAME": "db_primary",
+}
+
+_use_replicas = ContextVar("use_replicas", default=False)
+
+
+def get_setting(name):
+    return getattr(settings, "READ_REPLICAS", {}).get(name, DEFAULTS[name])
+
+
+def get_replicas():
+    """目前可供讀取的副本，未啟用時為空"""
+    return list(get_setting("ALIASES")) if get_setting("ENABLED") else []
+
+
+def reading_from_replicas():
+    """目前的讀取是否會分配到副本"""
+    return _use_replicas.get() and bool(get_replicas())
+
+
+def snapshot_version():
+    """
+    各副本檔案的修改時間，副本重新同步後即改變
+
+    回應快取以此區分不同快照的回應；``sync_replicas`` 在另一個行程中執行，
+    無法讓各 worker 行程內的快取失效。
+    """
+    versions = []
+    for alias in get_replicas():
+        try:
+            path = Path(connections[alias].settings_dict["NAME"])
+            versions.append(str(path.stat().st_mtime_ns))
+        except (OSError, TypeError):
+            versions.append("")
+    return ",".join(versions)
+
+
+@contextmanager
+def read_from_replicas(enabled=True):
+    """區塊內的讀取查詢分配到副本（管理指令或背景工作也可使用）"""
+    token = _use_replicas.set(enabled)
+    try:
+        yield
+    finally:
+        _use_replicas.reset(token)
+
+
+def sync_replica(alias, source=DEFAULT_DB_ALIAS):
+    """
+    以 ``VACUUM INTO`` 產生主資料庫的一致快照並取代副本檔案，回傳檔案大小
+
+    快照先寫入暫存檔再改名，正在讀取舊副本的連線不受影響，下次連線即讀到新快照。
+    """
+    source_connection, replica = connections[source], connections[alias]
+    if source_connection.vendor != "sqlite" or replica.vendor != "sqlite":
+        raise ImproperlyConfigured(
+            "sync_replica 僅支援 SQLite，其他資料庫請使用原生的複寫"
+        )
+    target = Path(replica.settings_dict["NAME"])
+    tmp_path = target.with_name(f".{target.name}.tmp")
+    tmp_path.unlink(missing_ok=True)
+    with source_connection.cursor() as cursor:
+        cursor.execute("VACUUM INTO %s", [str(tmp_path)])
+    tmp_path.replace(target)
+    return target.stat().st_size
+
+
+class ReadReplicaRouter:
+    """讀取依請求分配到副本，寫入一律使用主資料庫，副本不執行 migration"""
+
+    def db_for_read(self, model, **hints):
+        if not _use_replicas.get():
+            return None
+        replicas = get_replicas()
+        if not replicas:
+            return None
+        # 由已載入的物件延伸的查詢（例如 course.teacher）沿用同一個資料庫
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        # 從副本讀出的物件儲存時也寫回主資料庫
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *get_setting("ALIASES")}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in get_setting("ALIASES"):
+            return False
+        return None
+
+
+class ReadReplicaMiddleware:
+    """安全方法的請求讀取副本；寫入請求之後以 cookie 讓該客戶端暫時讀取主資料庫"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not get_setting("ENABLED"):
+            return self.get_response(request)
+
+        with read_from_replicas(self.use_replicas(request)):
+            response = self.get_response(request)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        if not get_setting("ENABLED"):
+            return await self.get_response(request)
+
+        with read_from_replicas(self.use_replicas(request)):
+            response = await self.get_response(request)
+        return self.finish(request, response)
+
+    def use_replicas(self, request):
+        return (
+            request.method in SAFE_METHODS
+            and get_setting("COOKIE_NAME") not in request.COOKIES
+        )
+
+    def finish(self, request, response):
+        if request.method not in SAFE_METHODS:
+            response.set_cookie(
+                get_setting("COOKIE_NAME"),
+                "1",
+                max_age=get_setting("STICKY_SECONDS"),
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
@@ -0,0 +1,257 @@
+"""
+預約時段與行事曆
+
+預約以 ``start_at`` / ``end_at`` 記錄上課時段，``(course, start_at, end_at)`` 與
+``(student, start_at)`` 索引讓「某位教師 / 學生某段期間的預約」以索引範圍掃描完成。
+``GET /api/teachers/{id}/calendar/`` 與 ``GET /api/students/{id}/calendar/`` 以
+``?from=`` / ``?to=`` 指定期間（預設為本週）。
+
+同一位教師的預約時段不可重疊：建立或修改預約時在寫入鎖定的交易中以
+``(course, start_at, end_at)`` 索引查詢重疊的預約（:func:`find_conflicts`）。
+預約長度上限 :data:`MAX_DURATION` 讓重疊查詢只需掃描 ``start_at`` 的一小段範圍；
+上限由 ``Booking.clean()`` 與資料庫的檢查約束保證，不只依賴序列化器的驗證。
+"""
+
+import datetime
+import re
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+
+# 未指定結束時間時的預設上課時間長度
+DEFAULT_DURATION = datetime.timedelta(hours=1)
+# 單一預約的最長時間，重疊查詢依此限定 start_at 的範圍
+MAX_DURATION = datetime.timedelta(hours=8)
+# 不佔用教師時段的預約狀態
+INACTIVE_STATUSES = ("cancelled",)
+
+_TIME = re.compile(r"^(\d{1,2}):(\d{2})$")
+
+
+def _parse_time(value):
+    match = _TIME.match(value)
+    if match is None:
+        return None
+    hour, minute = int(match.group(1)), int(match.group(2))
+    if hour > 23 or minute > 59:
+        return None
+    return datetime.time(hour, minute)
+
+
+class BookingConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "教師在此時段已有其他預約"
+    default_code = "booking_conflict"
+
+    def __init__(self, conflicts):
+        super().__init__()
+        # 衝突的預約 ID 維持整數，不經過 APIException 的字串轉換
+        self.detail = {"detail": self.detail, "conflicting_bookings": conflicts}
+
+
+def busy_bookings(teacher_id, start, end):
+    """
+    教師在 [start, end) 期間內佔用時段的預約（依開始時間排序）
+
+    開始時間不早於 ``start - MAX_DURATION``，因此每門課程都是
+    ``(course, start_at, end_at)`` 索引上的一段範圍掃描。
+    """
+    from .models import Booking
+
+    return (
+        Booking.objects.filter(
+            course__teacher_id=teacher_id,
+            start_at__gt=start - MAX_DURATION,
+            start_at__lt=end,
+            end_at__gt=start,
+        )
+        .exclude(status__in=INACTIVE_STATUSES)
+        .order_by("start_at", "id")
+    )
+
+
+def find_conflicts(teacher_id, start, end, exclude_pk=None):
+    """回傳與 [start, end) 重疊的預約 ID"""
+    queryset = busy_bookings(teacher_id, start, end)
+    if exclude_pk is not None:
+        queryset = queryset.exclude(pk=exclude_pk)
+    return list(queryset.values_list("pk", flat=True))
+
+
+@transaction.atomic
+def reserve(teacher_id, start, end, save, exclude_pk=None):
+    """
+    確認時段未被佔用後呼叫 ``save()``，有衝突時拋出 :class:`BookingConflict`
+
+    SQLite 的交易以 BEGIN IMMEDIATE 開始，檢查與寫入之間不會有其他寫入；
+    其他資料庫則以 SELECT ... FOR UPDATE 鎖定教師，同一位教師的預約依序處理。
+    """
+    from .models import Teacher
+
+    list(Teacher.objects.select_for_update().filter(pk=teacher_id).values("pk"))
+    conflicts = find_conflicts(teacher_id, start, end, exclude_pk)
+    if conflicts:
+        raise BookingConflict(conflicts)
+    return save()
+
+
+def free_windows(busy, start, end, day_start, day_end, min_length):
+    """
+    由依開始時間排序的佔用時段 [(開始, 結束)] 計算 [start, end) 內每天
+    ``day_start``～``day_end``（當地時間）之間的空檔，只保留不短於 ``min_length`` 的空檔
+    """
+    busy = iter(busy)
+    current = next(busy, None)
+    windows = []
+    day = timezone.localtime(start).date()
+    while True:
+        open_at = timezone.make_aware(datetime.datetime.combine(day, day_start))
+        close_at = timezone.make_aware(datetime.datetime.combine(day, day_end))
+        if open_at >= end:
+            return windows
+        cursor, close_at = max(open_at, start), min(close_at, end)
+        while cursor < close_at:
+            # 略過已結束的佔用時段
+            while current is not None and current[1] <= cursor:
+                current = next(busy, None)
+            if current is None or current[0] >= close_at:
+                gap_end = close_at
+            else:
+                gap_end = max(current[0], cursor)
+            if gap_end > cursor and gap_end - cursor >= min_length:
+                windows.append((cursor, gap_end))
+            if current is None or current[0] >= close_at:
+                break
+            cursor = max(cursor, current[1])
+        day += datetime.timedelta(days=1)
+
+
+def parse_availability_options(params):
+    """解析 ``?day_start=`` / ``?day_end=``（當地時間 HH:MM）與 ``?min_minutes=``"""
+    times = {}
+    for name, default in (("day_start", "09:00"), ("day_end", "21:00")):
+        times[name] = _parse_time(params.get(name) or default)
+        if times[name] is None:
+            raise ValidationError({name: "請使用 HH:MM 格式"})
+    if times["day_end"] <= times["day_start"]:
+        raise ValidationError({"day_end": "必須晚於 day_start"})
+    try:
+        min_minutes = int(params.get("min_minutes") or 60)
+    except ValueError:
+        min_minutes = 0
+    if min_minutes < 1:
+        raise ValidationError({"min_minutes": "請輸入正整數"})
+    return (
+        times["day_start"],
+        times["day_end"],
+        datetime.timedelta(minutes=min_minutes),
+    )
+
+
+def parse_calendar_range(params, max_days):
+    """
+    解析 ``?from=`` / ``?to=``（日期或日期時間，``to`` 不含），預設為本週一起的七天
+    """
+    bounds = {}
+    for name in ("from", "to"):
+        value = params.get(name)
+        if not value:
+            continue
+        try:
+            parsed = parse_datetime(value)
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            try:
+                date = parse_date(value)
+            except ValueError:
+                date = None
+            if date is None:
+                raise ValidationError({name: "請使用 YYYY-MM-DD 或 ISO 8601 日期時間"})
+            parsed = datetime.datetime.combine(date, datetime.time())
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        bounds[name] = parsed
+
+    start = bounds.get("from")
+    if start is None:
+        today = timezone.localdate()
+        monday = today - datetime.timedelta(days=today.weekday())
+        start = timezone.make_aware(datetime.datetime.combine(monday, datetime.time()))
+    end = bounds.get("to", start + datetime.timedelta(days=7))
+    if end <= start:
+        raise ValidationError({"to": "結束時間必須晚於開始時間"})
+    if end - start > datetime.timedelta(days=max_days):
+        raise ValidationError({"to": f"查詢期間最多 {max_days} 天"})
+    return start, end
+
+
+class CalendarMixin:
+    """
+    為教師 / 學生 ViewSet 加上 ``calendar`` 端點
+
+    ``calendar_lookup`` 為預約指向該資料的查詢路徑
+    （例如 ``student``、``course__teacher``），
+    ``booking_serializer_class`` 為輸出預約使用的序列化器。
+    """
+
+    calendar_lookup = None
+    booking_serializer_class = None
+    max_calendar_days = 92
+
+    def get_calendar_queryset(self, owner, start, end):
+        from .models import Booking
+
+        return (
+            Booking.objects.select_related(
+                "course", "student", "student__user", "course__teacher"
+            )
+            .filter(
+                **{self.calendar_lookup: owner.pk},
+                start_at__gte=start,
+                start_at__lt=end,
+            )
+            .order_by("start_at", "id")
+        )
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(
+                "from",
+                openapi.IN_QUERY,
+                description="開始日期或日期時間（預設為本週一）",
+                type=openapi.TYPE_STRING,
+            ),
+            openapi.Parameter(
+                "to",
+                openapi.IN_QUERY,
+                description="結束日期或日期時間，不含（預設為開始後七天）",
+                type=openapi.TYPE_STRING,
+            ),
+            openapi.Parameter(
+                "status",
+                openapi.IN_QUERY,
+                description="按預約狀態篩選",
+                type=openapi.TYPE_STRING,
+            ),
+        ],
+        operation_description="指定期間內的預約，依開始時間排序",
+    )
+    @action(detail=True, methods=["get"])
+    def calendar(self, request, pk=None):
+        """預約行事曆"""
+        owner = self.get_object()
+        start, end = parse_calendar_range(request.query_params, self.max_calendar_days)
+        bookings = self.get_calendar_queryset(owner, start, end)
+        status_filter = request.query_params.get("status")
+        if status_filter is not None:
+            bookings = bookings.filter(status=status_filter)
+        serializer = self.booking_serializer_class(bookings, many=True)
+        return Response({"from": start, "to": end, "results": serializer.data})
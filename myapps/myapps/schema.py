@@ -0,0 +1,123 @@
+"""
+預先產生的 OpenAPI 文件
+
+drf_yasg 每次請求 ``/swagger.json`` 都會重新檢視所有 ViewSet 與序列化器（包含
+``help_text`` 等說明），相當耗費 CPU。部署時先執行 ``python manage.py generate_schema``
+將文件寫入 ``settings.API_SCHEMA_DIR``，文件端點便直接由記憶體回傳檔案內容，
+並以內容雜湊作為 ETag。
+
+找不到預先產生的檔案時，只有 ``DEBUG`` 模式會即時產生文件，正式環境回傳 503。
+Swagger UI / ReDoc 頁面本身不需要檢視 API，仍由 drf_yasg 產生。
+"""
+
+import hashlib
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
+from drf_yasg.codecs import OpenAPICodecJson, OpenAPICodecYaml
+from drf_yasg.views import get_schema_view
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+
+# 各格式對應的檔名與編碼器
+ARTIFACTS = {
+    "json": ("openapi.json", OpenAPICodecJson),
+    "yaml": ("openapi.yaml", OpenAPICodecYaml),
+}
+# 渲染器格式（drf_yasg 相容模式會加上 "." 前綴）對應的檔案格式
+RENDERER_FORMATS = {"json": "json", "openapi": "json", "yaml": "yaml"}
+
+# 已載入的檔案：路徑 -> (修改時間, 內容, ETag)
+_loaded = {}
+
+
+class SchemaUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "API 文件尚未產生，請執行 python manage.py generate_schema"
+    default_code = "schema_unavailable"
+
+
+def get_schema_dir():
+    return Path(getattr(settings, "API_SCHEMA_DIR", settings.BASE_DIR / "schema"))
+
+
+def get_artifact_path(fmt):
+    return get_schema_dir() / ARTIFACTS[fmt][0]
+
+
+def encode_schema(schema, fmt):
+    """將 drf_yasg 產生的 ``Swagger`` 物件編碼為 JSON / YAML 位元組"""
+    return ARTIFACTS[fmt][1]([]).encode(schema)
+
+
+def load_artifact(fmt):
+    """
+    回傳 (內容, ETag)，檔案不存在時回傳 None
+
+    內容只在檔案修改時間改變時重新讀取，重新產生文件後不需要重新啟動服務。
+    """
+    path = get_artifact_path(fmt)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        _loaded.pop(path, None)
+        return None
+    cached = _loaded.get(path)
+    if cached is None or cached[0] != mtime:
+        content = path.read_bytes()
+        etag = quote_etag(hashlib.sha256(content).hexdigest())
+        cached = _loaded[path] = (mtime, content, etag)
+    return cached[1], cached[2]
+
+
+def get_precomputed_schema_view(info, **kwargs):
+    """
+    與 ``drf_yasg.views.get_schema_view`` 相同的參數，回傳的 SchemaView 會優先使用
+    預先產生的文件
+    """
+    base = get_schema_view(info, **kwargs)
+
+    class PrecomputedSchemaView(base):
+        @classmethod
+        def generate_schema(cls, url=None):
+            """以模擬請求產生完整的 ``Swagger`` 物件（供 generate_schema 指令使用）"""
+            # ViewSet 的 get_queryset 需要 request；未指定 url 時文件不寫入主機名稱
+            request = APIView().initialize_request(APIRequestFactory().get("/"))
+            generator = cls.generator_class(info, "", url or "")
+            return generator.get_schema(request, cls.public)
+
+        def get(self, request, version="", format=None):
+            renderer_format = request.accepted_renderer.format.lstrip(".")
+            fmt = RENDERER_FORMATS.get(renderer_format)
+            if fmt is None:
+                # Swagger UI / ReDoc 頁面
+                return super().get(request, version, format)
+
+            artifact = load_artifact(fmt)
+            if artifact is None:
+                if settings.DEBUG:
+                    return super().get(request, version, format)
+                raise SchemaUnavailable()
+
+            content, etag = artifact
+            if_none_match = request.headers.get("If-None-Match")
+            if if_none_match and etag in parse_etags(if_none_match):
+                response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+            else:
+                renderer = request.accepted_renderer
+                response = HttpResponse(
+                    content,
+                    content_type=f"{renderer.media_type}; charset={renderer.charset}",
+                )
+            response["ETag"] = etag
+            # 每次都向伺服器確認，部署新版文件後瀏覽器即可取得
+            patch_cache_control(response, no_cache=True)
+            return response
+
+    return PrecomputedSchemaView
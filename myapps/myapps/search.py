@@ -0,0 +1,264 @@
+"""
+全文搜尋索引
+
+使用 SQLite FTS5 虛擬資料表作為倒排索引，rowid 即為資料的主鍵：
+
+- ``teachers_fts``：教師姓名、Email、介紹、學歷、證照、教學經驗
+- ``courses_fts``：課程科目與描述
+
+中文沒有空白分詞，寫入索引前會先以 :func:`tokenize` 將中日韓文字切成雙字詞（bigram），
+英文與數字則以單字為單位；查詢字串以相同規則切分並組成片語查詢，
+因此中英混合的關鍵字都能透過索引查詢，不需要 ``LIKE '%...%'`` 掃描整張表。
+
+模型的 post_save / post_delete 訊號將更新索引的背景工作加入佇列（見 tasks.py），
+並可透過 ``python manage.py rebuild_search_index`` 重建。
+非 SQLite 資料庫則退回 ``icontains`` 查詢。
+"""
+
+import re
+
+from django.apps import apps
+from django.db import connections, router
+from django.db.models import Q
+
+# 中日韓文字：CJK 統一表意文字（含擴充 A 與相容字）、日文假名、韓文音節
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af"
+_TOKEN_RE = re.compile(rf"[{_CJK}]+|(?:(?![{_CJK}])[^\W_])+")
+_CJK_RE = re.compile(rf"[{_CJK}]")
+
+
+class SearchIndex:
+    """描述一個 FTS5 索引：資料表名稱、來源模型、索引欄位與 bm25 欄位權重"""
+
+    def __init__(self, table, model, fields, weights, fallback_ordering):
+        self.table = table
+        self.model_label = model
+        self.fields = fields
+        self.weights = weights
+        self.fallback_ordering = fallback_ordering
+
+    @property
+    def model(self):
+        return apps.get_model(self.model_label)
+
+    def row(self, instance):
+        return [instance.pk] + [
+            tokenize_text(getattr(instance, field)) for field in self.fields
+        ]
+
+
+TEACHER_INDEX = SearchIndex(
+    table="teachers_fts",
+    model="myapps.Teacher",
+    fields=(
+        "name",
+        "email",
+        "intro",
+        "education",
+        "certifications",
+        "teaching_experience",
+    ),
+    # 姓名最重要，其次為 Email 與介紹
+    weights=(10.0, 5.0, 3.0, 2.0, 2.0, 1.0),
+    fallback_ordering=("name",),
+)
+
+COURSE_INDEX = SearchIndex(
+    table="courses_fts",
+    model="myapps.Course",
+    fields=("subject", "description"),
+    weights=(5.0, 1.0),
+    fallback_ordering=("-created_at",),
+)
+
+
+def tokenize(text):
+    """
+    將文字切分為索引詞
+
+    英文與數字以單字為單位並轉為小寫；連續的中日韓文字切成重疊的雙字詞，
+    並在每段結尾補上最後一個字，讓任何單一字元都是某個索引詞的開頭，
+    可用前綴查詢找到。例如「數學老師」會切成「數學 學老 老師 師」。
+    """
+    tokens = []
+    for run in _TOKEN_RE.findall(text or ""):
+        if not _CJK_RE.match(run):
+            tokens.append(run.lower())
+        elif len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i : i + 2] for i in range(len(run) - 1))
+            tokens.append(run[-1])
+    return tokens
+
+
+def tokenize_text(text):
+    """切分後以空白串接，作為寫入 FTS5 的內容"""
+    return " ".join(tokenize(text))
+
+
+def build_match_query(query):
+    """
+    將使用者輸入轉換為 FTS5 MATCH 語法
+
+    - 英文與數字單字：前綴比對，例如 ``"pyth"*``
+    - 單一中文字：前綴比對，可命中以該字開頭的雙字詞
+    - 連續中文：以雙字詞組成片語，例如「數學老師」→ ``"數學 學老 老師"``，
+      片語要求詞位置相鄰，等同於子字串比對
+
+    各關鍵字之間為 AND。所有詞都以雙引號包住，使用者輸入的特殊字元不會被當成運算子。
+    """
+    terms = []
+    for run in _TOKEN_RE.findall(query or ""):
+        if not _CJK_RE.match(run):
+            terms.append(f'"{run.lower()}"*')
+        elif len(run) == 1:
+            terms.append(f'"{run}"*')
+        else:
+            bigrams = " ".join(run[i : i + 2] for i in range(len(run) - 1))
+            terms.append(f'"{bigrams}"')
+    return " ".join(terms)
+
+
+def search_enabled(using):
+    """目前資料庫是否支援 FTS5 索引"""
+    return connections[using].vendor == "sqlite"
+
+
+def create_index(index, connection):
+    """建立 FTS5 索引資料表；內容已預先切分，FTS5 只需以空白切詞"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {index.table} USING fts5("
+            f"{', '.join(index.fields)}, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '1 2')"
+        )
+
+
+def drop_index(index, connection):
+    """移除 FTS5 索引資料表"""
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {index.table}")
+
+
+def _insert_sql(index, verb="INSERT"):
+    placeholders = ", ".join(["%s"] * (len(index.fields) + 1))
+    return (
+        f"{verb} INTO {index.table} (rowid, {', '.join(index.fields)}) "
+        f"VALUES ({placeholders})"
+    )
+
+
+def index_document(index, instance, using=None):
+    """新增或更新單筆資料的索引"""
+    using = using or router.db_for_write(type(instance), instance=instance)
+    if not search_enabled(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(_insert_sql(index, "INSERT OR REPLACE"), index.row(instance))
+
+
+def remove_document(index, pk, using):
+    """移除單筆資料的索引"""
+    if not search_enabled(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"DELETE FROM {index.table} WHERE rowid = %s", [pk])
+
+
+def rebuild_index(index, model=None, using="default", batch_size=1000):
+    """以目前的索引定義重新建立資料表並寫入所有資料，回傳索引的資料筆數"""
+    if not search_enabled(using):
+        return 0
+    model = model or index.model
+
+    queryset = model.objects.using(using).only("id", *index.fields).order_by("id")
+    # 先讀出所有資料列，避免在同一個 SQLite 連線上邊讀邊寫
+    rows = [index.row(instance) for instance in queryset]
+    connection = connections[using]
+    drop_index(index, connection)
+    create_index(index, connection)
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany(_insert_sql(index), rows[start : start + batch_size])
+        cursor.execute(f"INSERT INTO {index.table}({index.table}) VALUES ('optimize')")
+    return len(rows)
+
+
+class RankedSearchResults:
+    """
+    依相關度排序的搜尋結果
+
+    提供分頁器需要的 ``count()`` 與切片介面，每次切片只向索引查詢一頁的 ID，
+    再以主鍵一次載入對應的資料。
+    """
+
+    def __init__(self, index, queryset, match, using):
+        self.index = index
+        self.queryset = queryset
+        self.match = match
+        self.using = using
+
+    def count(self):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                f"SELECT count(*) FROM {self.index.table} "
+                f"WHERE {self.index.table} MATCH %s",
+                [self.match],
+            )
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def ranked_ids(self, offset, limit):
+        table = self.index.table
+        weights = ", ".join(str(weight) for weight in self.index.weights)
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {table} WHERE {table} MATCH %s "
+                f"ORDER BY bm25({table}, {weights}), rowid LIMIT %s OFFSET %s",
+                [self.match, limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start = index.start or 0
+            stop = index.stop if index.stop is not None else start + self.count()
+            ids = self.ranked_ids(start, max(stop - start, 0))
+            objects = self.queryset.in_bulk(ids)
+            return [objects[pk] for pk in ids if pk in objects]
+        results = self[index : index + 1]
+        if not results:
+            raise IndexError(index)
+        return results[0]
+
+
+def search(index, queryset, query):
+    """
+    以索引搜尋資料
+
+    SQLite 使用 FTS5 索引並依 bm25 相關度排序；其他資料庫退回多欄位 ``icontains``。
+    """
+    using = queryset.db
+    if search_enabled(using):
+        match = build_match_query(query)
+        if not match:
+            return queryset.none()
+        return RankedSearchResults(index, queryset, match, using)
+
+    condition = Q()
+    for field in index.fields:
+        condition |= Q(**{f"{field}__icontains": query})
+    return queryset.filter(condition).order_by(*index.fallback_ordering)
+
+
+def search_teachers(queryset, query):
+    """搜尋教師"""
+    return search(TEACHER_INDEX, queryset, query)
+
+
+def search_courses(queryset, query):
+    """搜尋課程"""
+    return search(COURSE_INDEX, queryset, query)
@@ -1,7 +1,12 @@
+from functools import partial
+from typing import ClassVar
+
 from rest_framework import serializers
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from .models import User, Teacher, Student, Course, Booking, Review
+from .schedule import DEFAULT_DURATION, INACTIVE_STATUSES, MAX_DURATION, reserve
+from .values import ValuesSerializer
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -49,6 +54,9 @@ class TeacherSerializer(serializers.ModelSerializer):
         source="user.account", read_only=True, help_text="關聯使用者的帳號"
     )
 
+    # ?expand= 可展開的欄位
+    expandable_fields: ClassVar[dict] = {"user": UserSerializer}
+
     class Meta:
         model = Teacher
         fields = [
@@ -103,6 +111,8 @@ class StudentSerializer(serializers.ModelSerializer):
         source="user.account", read_only=True, help_text="關聯使用者的帳號"
     )
 
+    expandable_fields: ClassVar[dict] = {"user": UserSerializer}
+
     class Meta:
         model = Student
         fields = ["id", "user", "user_name", "user_account", "email", "gender", "age"]
@@ -129,6 +139,8 @@ class CourseSerializer(serializers.ModelSerializer):
         source="teacher.email", read_only=True, help_text="授課教師電子郵件"
     )
 
+    expandable_fields: ClassVar[dict] = {"teacher": TeacherSerializer}
+
     class Meta:
         model = Course
         fields = [
@@ -140,6 +152,8 @@ class CourseSerializer(serializers.ModelSerializer):
             "description",
             "price",
             "location",
+            "latitude",
+            "longitude",
             "avg_rating",
             "created_at",
         ]
@@ -149,9 +163,20 @@ class CourseSerializer(serializers.ModelSerializer):
             "description": {"help_text": "課程詳細描述"},
             "price": {"help_text": "課程價格（新台幣）"},
             "location": {"help_text": "上課地點"},
+            "latitude": {"help_text": "上課地點緯度（與經度同時提供）"},
+            "longitude": {"help_text": "上課地點經度（與緯度同時提供）"},
             "avg_rating": {"help_text": "課程平均評分（自動計算）", "read_only": True},
         }
 
+    def validate(self, attrs):
+        coordinates = [
+            attrs.get(name, getattr(self.instance, name, None))
+            for name in ("latitude", "longitude")
+        ]
+        if (coordinates[0] is None) != (coordinates[1] is None):
+            raise serializers.ValidationError({"longitude": "緯度與經度必須同時提供"})
+        return attrs
+
 
 class BookingSerializer(serializers.ModelSerializer):
     """
@@ -171,6 +196,11 @@ class BookingSerializer(serializers.ModelSerializer):
         source="course.teacher.name", read_only=True, help_text="授課教師姓名"
     )
 
+    expandable_fields: ClassVar[dict] = {
+        "course": CourseSerializer,
+        "student": StudentSerializer,
+    }
+
     class Meta:
         model = Booking
         fields = [
@@ -180,19 +210,63 @@ class BookingSerializer(serializers.ModelSerializer):
             "student",
             "student_name",
             "teacher_name",
-            "schedule_date",
+            "start_at",
+            "end_at",
             "status",
             "created_at",
         ]
         extra_kwargs = {
             "course": {"help_text": "預約的課程 ID"},
             "student": {"help_text": "預約的學生 ID"},
-            "schedule_date": {"help_text": "預約的上課時間"},
+            "start_at": {
+                "required": True,
+                "allow_null": False,
+                "help_text": "上課開始時間（ISO 8601）",
+            },
+            "end_at": {
+                "allow_null": False,
+                "help_text": "上課結束時間（ISO 8601），未指定時為開始後一小時",
+            },
             "status": {
                 "help_text": "預約狀態：pending(待確認)、confirmed(已確認)、completed(已完成)、cancelled(已取消)"
             },
         }
 
+    def validate(self, attrs):
+        start = attrs.get("start_at", getattr(self.instance, "start_at", None))
+        end = attrs.get("end_at", getattr(self.instance, "end_at", None))
+        if start is not None and end is None:
+            attrs["end_at"] = end = start + DEFAULT_DURATION
+        if start is not None and end <= start:
+            raise serializers.ValidationError({"end_at": "結束時間必須晚於開始時間"})
+        if start is not None and end - start > MAX_DURATION:
+            hours = MAX_DURATION.total_seconds() / 3600
+            raise serializers.ValidationError(
+                {"end_at": f"預約時間最長 {hours:g} 小時"}
+            )
+        return attrs
+
+    def reserve(self, instance, validated_data, save):
+        """有上課時段且未取消的預約需確認教師的時段沒有被其他預約佔用"""
+
+        def current(name):
+            return validated_data.get(name, getattr(instance, name, None))
+
+        start, end, course = current("start_at"), current("end_at"), current("course")
+        if start is None or current("status") in INACTIVE_STATUSES:
+            return save()
+        exclude_pk = instance.pk if instance is not None else None
+        return reserve(course.teacher_id, start, end, save, exclude_pk)
+
+    def create(self, validated_data):
+        return self.reserve(
+            None, validated_data, partial(super().create, validated_data)
+        )
+
+    def update(self, instance, validated_data):
+        save = partial(super().update, instance, validated_data)
+        return self.reserve(instance, validated_data, save)
+
 
 class ReviewSerializer(serializers.ModelSerializer):
     """
@@ -209,6 +283,8 @@ class ReviewSerializer(serializers.ModelSerializer):
         source="course.teacher.name", read_only=True, help_text="授課教師姓名"
     )
 
+    expandable_fields: ClassVar[dict] = {"course": CourseSerializer}
+
     class Meta:
         model = Review
         fields = [
@@ -226,6 +302,16 @@ class ReviewSerializer(serializers.ModelSerializer):
             "comment": {"help_text": "評價內容"},
         }
 
+    def validate_rating(self, value):
+        """評分必須為 1 到 5 之間的數字，課程評分統計依此累計"""
+        try:
+            rating = float(value)
+        except (TypeError, ValueError):
+            raise serializers.ValidationError("評分必須為數字")
+        if not 1 <= rating <= 5:
+            raise serializers.ValidationError("評分必須介於 1 到 5 之間")
+        return value
+
 
 # 簡化版序列化器 (用於列表顯示)
 class TeacherListSerializer(serializers.ModelSerializer):
@@ -241,6 +327,80 @@ class CourseListSerializer(serializers.ModelSerializer):
 
     teacher_name = serializers.CharField(source="teacher.name", read_only=True)
 
+    expandable_fields: ClassVar[dict] = {"teacher": TeacherSerializer}
+
     class Meta:
         model = Course
         fields = ["id", "subject", "teacher_name", "price", "location", "avg_rating"]
+
+
+class CourseLeaderboardSerializer(CourseListSerializer):
+    """課程排行榜序列化器"""
+
+    teacher_blue_premium = serializers.BooleanField(
+        source="teacher.blue_premium", read_only=True
+    )
+
+    class Meta(CourseListSerializer.Meta):
+        fields = CourseListSerializer.Meta.fields + [
+            "rating_count",
+            "teacher_blue_premium",
+            "rating_score",
+            "trending_score",
+        ]
+
+
+# 快速序列化器 (列表端點使用，輸出與上方的列表序列化器相同)
+class TeacherListValuesSerializer(ValuesSerializer):
+    """教師列表快速序列化器"""
+
+    serializer_class = TeacherListSerializer
+
+
+class CourseNearbySerializer(CourseListSerializer):
+    """附近課程序列化器"""
+
+    distance = serializers.FloatField(read_only=True, help_text="距離（公里）")
+
+    class Meta(CourseListSerializer.Meta):
+        fields = CourseListSerializer.Meta.fields + [
+            "latitude",
+            "longitude",
+            "distance",
+        ]
+
+
+class CourseListValuesSerializer(ValuesSerializer):
+    """課程列表快速序列化器"""
+
+    serializer_class = CourseListSerializer
+
+
+class CourseLeaderboardValuesSerializer(ValuesSerializer):
+    """課程排行榜快速序列化器"""
+
+    serializer_class = CourseLeaderboardSerializer
+
+
+class CourseNearbyValuesSerializer(ValuesSerializer):
+    """附近課程快速序列化器"""
+
+    serializer_class = CourseNearbySerializer
+
+
+class CourseValuesSerializer(ValuesSerializer):
+    """課程匯出快速序列化器"""
+
+    serializer_class = CourseSerializer
+
+
+class BookingValuesSerializer(ValuesSerializer):
+    """預約匯出快速序列化器"""
+
+    serializer_class = BookingSerializer
+
+
+class ReviewValuesSerializer(ValuesSerializer):
+    """評價匯出快速序列化器"""
+
+    serializer_class = ReviewSerializer
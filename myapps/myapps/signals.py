@@ -0,0 +1,166 @@
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .analytics import (
+    deleted_with_course,
+    record_booking_delete,
+    record_booking_save,
+    record_course_change,
+    record_review_delete,
+    record_review_save,
+)
+from .cache import invalidate
+from .geo import course_geohash
+from .models import Booking, Course, Review, Student, Teacher, User
+from .ratings import apply_rating_delta, parse_rating
+from .taskqueue import enqueue, enqueue_many
+
+
+def _load_snapshot(model, instance, using, fields):
+    """未由資料庫載入但有主鍵的資料（例如直接指定主鍵後儲存），讀取修改前的欄位值"""
+    row = model.objects.using(using).filter(pk=instance.pk).values_list(*fields).first()
+    return row or (None,) * len(fields)
+
+
+@receiver(pre_save, sender=Review)
+def load_rating_snapshot(sender, instance, raw=False, using=None, **kwargs):
+    """記錄修改前的課程與評分，供 post_save 計算評分差值"""
+    if raw or instance.pk is None or hasattr(instance, "_rating_snapshot"):
+        return
+    instance._rating_snapshot = _load_snapshot(
+        sender, instance, using, ("course_id", "rating")
+    )
+
+
+@receiver(post_save, sender=Review)
+def update_course_rating_on_save(sender, instance, created, raw=False, **kwargs):
+    """新增或修改評價時調整課程評分累計值與每日評價統計"""
+    if raw:
+        return
+    rating = parse_rating(instance.rating)
+    snapshot = getattr(instance, "_rating_snapshot", (None, None))
+    record_review_save(instance, created, rating, snapshot)
+    if created:
+        apply_rating_delta(instance.course_id, rating, 1)
+    else:
+        old_course_id, old_rating = snapshot
+        if old_course_id != instance.course_id:
+            apply_rating_delta(old_course_id, -parse_rating(old_rating), -1)
+            apply_rating_delta(instance.course_id, rating, 1)
+        elif parse_rating(old_rating) != rating:
+            apply_rating_delta(instance.course_id, rating - parse_rating(old_rating), 0)
+    instance._rating_snapshot = (instance.course_id, instance.rating)
+
+
+@receiver(post_delete, sender=Review)
+def update_course_rating_on_delete(sender, instance, origin=None, **kwargs):
+    """刪除評價時扣除課程評分累計值與每日評價統計（課程或教師連帶刪除時不需要）"""
+    if deleted_with_course(origin):
+        return
+    rating = parse_rating(instance.rating)
+    record_review_delete(instance, rating)
+    apply_rating_delta(instance.course_id, -rating, -1)
+
+
+@receiver(pre_save, sender=Booking)
+def load_summary_snapshot(sender, instance, raw=False, using=None, **kwargs):
+    """記錄修改前的課程、狀態與日期，供 post_save 調整每日統計"""
+    if raw or instance.pk is None or hasattr(instance, "_summary_snapshot"):
+        return
+    instance._summary_snapshot = _load_snapshot(
+        sender, instance, using, ("course_id", "status", "start_at", "created_at")
+    )
+
+
+@receiver(post_save, sender=Booking)
+def update_booking_summary_on_save(sender, instance, created, raw=False, **kwargs):
+    """新增或修改預約時調整每日預約統計"""
+    if raw:
+        return
+    record_booking_save(instance, created, getattr(instance, "_summary_snapshot", None))
+    instance._summary_snapshot = (
+        instance.course_id,
+        instance.status,
+        instance.start_at,
+        instance.created_at,
+    )
+
+
+@receiver(post_delete, sender=Booking)
+def update_booking_summary_on_delete(sender, instance, origin=None, **kwargs):
+    """刪除預約時扣除每日預約統計（課程或教師連帶刪除時統計會一併刪除）"""
+    if not deleted_with_course(origin):
+        record_booking_delete(instance)
+
+
+@receiver(pre_save, sender=Course)
+def set_course_geohash(sender, instance, **kwargs):
+    """依座標更新課程的 geohash"""
+    instance.geohash = course_geohash(instance.latitude, instance.longitude)
+
+
+@receiver(post_save, sender=Course)
+def enqueue_course_tasks_on_change(sender, instance, created, raw=False, **kwargs):
+    """
+    課程變更後更新全文索引；更換教師或修改價格時調整該課程的每日統計，
+    內容、地點或價格變更時重新計算該課程的相似課程
+    """
+    if raw:
+        return
+    calls = [("search_index", {"index": "course", "pk": instance.pk})]
+    summary = (instance.teacher_id, instance.price)
+    if not created and getattr(instance, "_summary_snapshot", None) != summary:
+        record_course_change(instance)
+    similarity = (
+        instance.subject,
+        instance.description,
+        instance.location,
+        instance.price,
+    )
+    if created or getattr(instance, "_similarity_snapshot", None) != similarity:
+        calls.append(("similar_courses", {"course_id": instance.pk}))
+    enqueue_many(calls)
+    instance._summary_snapshot = summary
+    instance._similarity_snapshot = similarity
+
+
+@receiver(post_delete, sender=Course)
+def remove_course_search_index(sender, instance, **kwargs):
+    """刪除課程後移除全文索引資料"""
+    enqueue("search_index", index="course", pk=instance.pk)
+
+
+@receiver(post_save, sender=Teacher)
+def update_teacher_search_index(sender, instance, raw=False, **kwargs):
+    """教師資料變更後同步全文索引"""
+    if raw:
+        return
+    enqueue("search_index", index="teacher", pk=instance.pk)
+
+
+@receiver(post_delete, sender=Teacher)
+def remove_teacher_search_index(sender, instance, **kwargs):
+    """刪除教師後移除全文索引資料"""
+    enqueue("search_index", index="teacher", pk=instance.pk)
+
+
+def invalidate_response_cache(sender, using=None, **kwargs):
+    """資料變更時讓依賴該模型的 API 回應快取失效"""
+    invalidate(sender)
+    # 交易提交前的讀取仍可能把舊資料寫回快取，提交後再失效一次
+    if using and connections[using].in_atomic_block:
+        transaction.on_commit(lambda: invalidate(sender), using=using)
+
+
+for model in (User, Teacher, Student, Course, Booking, Review):
+    post_save.connect(
+        invalidate_response_cache,
+        sender=model,
+        dispatch_uid=f"invalidate_response_cache_save_{model._meta.model_name}",
+    )
+    post_delete.connect(
+        invalidate_response_cache,
+        sender=model,
+        dispatch_uid=f"invalidate_response_cache_delete_{model._meta.model_name}",
+    )
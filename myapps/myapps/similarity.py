@@ -0,0 +1,278 @@
+"""
+相似課程推薦
+
+每門課程的科目與描述以 :func:`~myapps.myapps.search.tokenize`（中文雙字詞、英文單字）
+切詞後轉為 TF-IDF 稀疏向量，存入 ``course_term_weights``
+（每個詞一列，同時作為倒排索引）。
+兩門課程的相似度為向量的餘弦相似度，上課地點相同與價格級距相同時再乘上加成；
+每門課程分數最高的 :data:`TOP_K` 門存入 ``course_similarities``，
+``GET /api/courses/{id}/similar/`` 只需一次 ``(course, score)`` 索引查詢。
+
+``python manage.py build_course_similarity`` 離線重建全部資料：
+以倒排索引只計算至少有一個共同詞的課程組合，不需要兩兩比較所有課程；
+每個詞只取權重最高的 :data:`MAX_POSTINGS` 門課程，
+常見的詞不會讓計算量隨課程數平方成長。單一課程的科目、描述、地點或價格變更時，
+背景工作只重新計算該課程的向量與相似課程
+（IDF 使用目前的文件頻率，全站的權重在下次重建時更新）。
+"""
+
+import heapq
+import math
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+
+from .search import tokenize
+
+# 每門課程保留的相似課程數
+TOP_K = 10
+# 科目的詞頻權重（相對於描述）
+SUBJECT_WEIGHT = 3
+# 地點相同、價格級距相同時相似度的加成
+LOCATION_BOOST = 0.2
+PRICE_BAND_BOOST = 0.1
+# 出現在超過此比例課程中的詞不用於尋找相似課程（課程數較少時不套用）
+COMMON_TERM_RATIO = 0.5
+COMMON_TERM_MIN_COURSES = 100
+# 每個詞只以權重最高的幾門課程計算內積，讓計算量與課程數成線性
+MAX_POSTINGS = 100
+# 與 CourseTermWeight.term 的長度相同
+MAX_TERM_LENGTH = 64
+
+SOURCE_FIELDS = ("id", "subject", "description", "location", "price")
+
+
+def _get_models():
+    """回傳 (Course, CourseTermWeight, CourseSimilarity)"""
+    from django.apps import apps
+
+    return tuple(
+        apps.get_model("myapps", name)
+        for name in ("Course", "CourseTermWeight", "CourseSimilarity")
+    )
+
+
+def term_counts(subject, description):
+    """科目與描述的詞頻，科目的詞乘上 :data:`SUBJECT_WEIGHT`"""
+    counts = Counter()
+    for text, weight in ((subject, SUBJECT_WEIGHT), (description, 1)):
+        for token in tokenize(text):
+            counts[token[:MAX_TERM_LENGTH]] += weight
+    return counts
+
+
+def idf(document_frequency, total):
+    """平滑的逆文件頻率"""
+    return math.log((1 + total) / (1 + document_frequency)) + 1
+
+
+def tfidf_vector(counts, document_frequencies, total):
+    """以 ``1 + log(tf)`` × IDF 計算並正規化為單位長度的 {詞: 權重}"""
+    vector = {
+        term: (1 + math.log(count)) * idf(document_frequencies.get(term, 0), total)
+        for term, count in counts.items()
+    }
+    norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+    return {term: weight / norm for term, weight in vector.items()} if norm else {}
+
+
+def price_band(price):
+    """價格級距：每增加一倍為一級"""
+    return int(math.log2(price)) if price and price > 0 else -1
+
+
+def boost(source, target):
+    """``source`` / ``target`` 為 (地點, 價格級距)"""
+    factor = 1.0
+    if source[0] == target[0]:
+        factor += LOCATION_BOOST
+    if source[1] == target[1]:
+        factor += PRICE_BAND_BOOST
+    return factor
+
+
+def is_common(document_frequency, total):
+    return (
+        total >= COMMON_TERM_MIN_COURSES
+        and document_frequency > total * COMMON_TERM_RATIO
+    )
+
+
+def top_postings(entries):
+    """
+    詞的 [(課程 ID, 權重)] 中權重最高的 :data:`MAX_POSTINGS` 筆
+    （與 :func:`refresh_course` 的查詢相同順序）
+    """
+    return heapq.nlargest(MAX_POSTINGS, entries, key=lambda item: (item[1], item[0]))
+
+
+def similarity_scores(pk, dot_products, attributes):
+    """由內積（即餘弦相似度）與 (地點, 價格級距) 計算 {課程 ID: 分數}"""
+    source = attributes[pk]
+    return {
+        other: dot * boost(source, attributes[other])
+        for other, dot in dot_products.items()
+        if other != pk and other in attributes and dot > 0
+    }
+
+
+def top_neighbours(scores, top_k=TOP_K):
+    """分數最高的 ``top_k`` 門 [(課程 ID, 分數)]，同分時與端點相同取課程 ID 大的"""
+    return heapq.nlargest(top_k, scores.items(), key=lambda item: (item[1], item[0]))
+
+
+def similar_courses(course_id):
+    """
+    課程的相似課程，依相似度由高到低（``similarity`` 為分數），
+    以 (course, score) 索引依序讀取
+    """
+    from .models import Course
+
+    return (
+        Course.objects.filter(similar_entries__course_id=course_id)
+        .annotate(similarity=F("similar_entries__score"))
+        .order_by("-similarity", "-similar_entries__similar")
+    )
+
+
+def _similarity_rows(similarity_model, pk, neighbours):
+    return [
+        similarity_model(course_id=pk, similar_id=other, score=round(score, 6))
+        for other, score in neighbours
+    ]
+
+
+@transaction.atomic
+def rebuild_similarities(top_k=TOP_K, batch_size=1000):
+    """
+    重建所有課程的 TF-IDF 向量與相似課程，回傳 (課程數, 詞權重列數)
+
+    向量與倒排索引都在記憶體中計算；每門課程只與至少有一個共同（非常見）詞的課程累加內積。
+    """
+    course_model, term_model, similarity_model = _get_models()
+
+    counts, attributes = {}, {}
+    for pk, subject, description, location, price in course_model.objects.values_list(
+        *SOURCE_FIELDS
+    ).order_by("id"):
+        counts[pk] = term_counts(subject, description)
+        attributes[pk] = (location, price_band(price))
+
+    total = len(counts)
+    document_frequencies = Counter()
+    for terms in counts.values():
+        document_frequencies.update(terms.keys())
+
+    vectors = {
+        pk: tfidf_vector(terms, document_frequencies, total)
+        for pk, terms in counts.items()
+    }
+    postings = defaultdict(list)
+    for pk, vector in vectors.items():
+        for term, weight in vector.items():
+            if not is_common(document_frequencies[term], total):
+                postings[term].append((pk, weight))
+    for term, entries in postings.items():
+        postings[term] = top_postings(entries)
+
+    term_rows, similarity_rows = [], []
+    for pk, vector in vectors.items():
+        term_rows.extend(
+            term_model(course_id=pk, term=term, weight=weight)
+            for term, weight in vector.items()
+        )
+        dot_products = defaultdict(float)
+        for term, weight in vector.items():
+            for other, other_weight in postings.get(term, ()):
+                dot_products[other] += weight * other_weight
+        scores = similarity_scores(pk, dot_products, attributes)
+        similarity_rows.extend(
+            _similarity_rows(similarity_model, pk, top_neighbours(scores, top_k))
+        )
+
+    term_model.objects.all().delete()
+    similarity_model.objects.all().delete()
+    term_model.objects.bulk_create(term_rows, batch_size=batch_size)
+    similarity_model.objects.bulk_create(similarity_rows, batch_size=batch_size)
+    return total, len(term_rows)
+
+
+@transaction.atomic
+def refresh_course(course_id, top_k=TOP_K):
+    """
+    重新計算單一課程的向量與相似課程
+
+    已將此課程列為相似課程的其他課程，其分數一併更新（分數降為 0 時移除）；
+    其他課程的排名與全站 IDF 在下次完整重建時才會更新。
+    """
+    course_model, term_model, similarity_model = _get_models()
+
+    row = course_model.objects.filter(pk=course_id).values_list(*SOURCE_FIELDS).first()
+    if row is None:
+        return
+    _, subject, description, location, price = row
+    counts = term_counts(subject, description)
+    total = course_model.objects.count()
+
+    term_model.objects.filter(course_id=course_id).delete()
+    document_frequencies = Counter(
+        dict(
+            term_model.objects.filter(term__in=list(counts))
+            .order_by()
+            .values_list("term")
+            .annotate(frequency=Count("id"))
+        )
+    )
+    # 此課程本身也是其中一份文件
+    document_frequencies.update(counts.keys())
+    vector = tfidf_vector(counts, document_frequencies, total)
+    term_model.objects.bulk_create(
+        term_model(course_id=course_id, term=term, weight=weight)
+        for term, weight in vector.items()
+    )
+
+    search_terms = [
+        term for term in vector if not is_common(document_frequencies[term], total)
+    ]
+    postings = (
+        term_model.objects.filter(term__in=search_terms)
+        .annotate(
+            position=Window(
+                RowNumber(),
+                partition_by=[F("term")],
+                order_by=[F("weight").desc(), F("course_id").desc()],
+            )
+        )
+        .filter(position__lte=MAX_POSTINGS)
+        .values_list("course_id", "term", "weight")
+    )
+    dot_products = defaultdict(float)
+    for other, term, weight in postings:
+        dot_products[other] += vector[term] * weight
+
+    attributes = {course_id: (location, price_band(price))}
+    for pk, other_location, other_price in course_model.objects.filter(
+        pk__in=list(dot_products)
+    ).values_list("id", "location", "price"):
+        attributes[pk] = (other_location, price_band(other_price))
+    scores = similarity_scores(course_id, dot_products, attributes)
+
+    similarity_model.objects.filter(course_id=course_id).delete()
+    similarity_model.objects.bulk_create(
+        _similarity_rows(similarity_model, course_id, top_neighbours(scores, top_k))
+    )
+
+    # 其他課程列表中的此課程：以新的分數取代
+    referencing = list(
+        similarity_model.objects.filter(similar_id=course_id).values_list(
+            "course_id", flat=True
+        )
+    )
+    similarity_model.objects.filter(similar_id=course_id).delete()
+    similarity_model.objects.bulk_create(
+        similarity_model(course_id=other, similar_id=course_id, score=round(score, 6))
+        for other in referencing
+        if (score := scores.get(other, 0)) > 0
+    )
@@ -0,0 +1,289 @@
+"""
+背景工作佇列
+
+相似課程與全文索引更新等寫入後的工作不在請求中執行，
+改由 :func:`enqueue` / :func:`enqueue_many` 在交易提交後寫入 ``tasks`` 資料表，
+請求只需付出一次 INSERT（課程評分與每日統計仍在寫入的交易中以 ``F()`` 差值更新，
+見 ratings.py / analytics.py）。工作函式以 :func:`task` 註冊，參數必須可以轉為 JSON，
+並且只依資料庫的目前狀態重新計算，重複或延後執行的結果都相同：
+
+- 相同名稱與參數的待執行工作只保留一筆（部分唯一索引配合 ``INSERT OR IGNORE``），
+  例如同一門課程短時間內修改多次時只重新計算一次相似課程
+- worker 以條件式 UPDATE 取得工作，成功後刪除；失敗時依 ``RETRY_DELAY`` 指數延後重試，
+  執行 ``MAX_ATTEMPTS`` 次仍失敗時標記為失敗並保留錯誤訊息
+- 執行超過 ``LEASE_SECONDS`` 仍未結束的工作（worker 中途結束）重新排入佇列
+
+``TASK_QUEUE["AUTOSTART"]`` 時 WSGI / ASGI 應用程式載入後即在背景執行緒中處理工作
+（:func:`autostart`），也可以另外執行 ``python manage.py run_tasks``。
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+import traceback
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "EAGER": False,
+    "AUTOSTART": True,
+    "WORKERS": 2,
+    "POLL_INTERVAL": 1.0,
+    "MAX_ATTEMPTS": 5,
+    "RETRY_DELAY": 10,
+    "LEASE_SECONDS": 300,
+}
+
+# 工作名稱 -> 函式
+TASKS = {}
+
+# 同一個行程中加入工作時喚醒等待中的 worker，不必等到下一次輪詢
+_wakeup = threading.Event()
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_setting(name):
+    return getattr(settings, "TASK_QUEUE", {}).get(name, DEFAULTS[name])
+
+
+def task(name):
+    """將函式註冊為名稱為 ``name`` 的工作"""
+
+    def decorator(func):
+        TASKS[name] = func
+        return func
+
+    return decorator
+
+
+def dedupe_key(name, kwargs):
+    """工作名稱與參數的雜湊，相同的工作有相同的鍵"""
+    payload = json.dumps([name, kwargs], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def enqueue(name, **kwargs):
+    """交易提交後加入一筆工作"""
+    enqueue_many([(name, kwargs)])
+
+
+def enqueue_many(calls):
+    """
+    交易提交後以單一 INSERT 加入多筆工作，``calls`` 為 (工作名稱, 參數) 的序列
+
+    不在交易中時立即寫入，交易復原時不會加入；``EAGER`` 時直接執行。
+    """
+    pending = {}
+    for name, kwargs in calls:
+        if name not in TASKS:
+            raise KeyError(f"未註冊的工作：{name}")
+        pending.setdefault(dedupe_key(name, kwargs), (name, kwargs))
+    if not pending:
+        return
+    if get_setting("EAGER"):
+        for name, kwargs in pending.values():
+            TASKS[name](**kwargs)
+        return
+    transaction.on_commit(partial(_insert, pending))
+
+
+def _insert(pending):
+    from .models import Task
+
+    Task.objects.bulk_create(
+        [
+            Task(name=name, kwargs=kwargs, dedupe_key=key)
+            for key, (name, kwargs) in pending.items()
+        ],
+        # 已有相同的待執行工作時略過
+        ignore_conflicts=True,
+    )
+    _wakeup.set()
+
+
+def claim():
+    """取得一筆可執行的工作並標記為執行中，沒有工作時回傳 None"""
+    from .models import Task
+
+    while True:
+        now = timezone.now()
+        job = (
+            Task.objects.filter(status=Task.PENDING, run_after__lte=now)
+            .order_by("run_after", "id")
+            .first()
+        )
+        if job is None:
+            return None
+        # 其他 worker 可能同時選到同一筆，只有更新成功的一方取得工作
+        if Task.objects.filter(pk=job.pk, status=Task.PENDING).update(
+            status=Task.RUNNING, attempts=F("attempts") + 1, locked_at=now
+        ):
+            job.status, job.attempts, job.locked_at = (
+                Task.RUNNING,
+                job.attempts + 1,
+                now,
+            )
+            return job
+
+
+def run_task(job):
+    """執行已取得的工作，成功時刪除、失敗時安排重試，回傳是否成功"""
+    from .models import Task
+
+    try:
+        func = TASKS.get(job.name)
+        if func is None:
+            raise LookupError(f"未註冊的工作：{job.name}")
+        func(**job.kwargs)
+    except Exception:
+        logger.warning(
+            "工作 %s(%s) 第 %d 次執行失敗",
+            job.name,
+            job.kwargs,
+            job.attempts,
+            exc_info=True,
+        )
+        _fail(job, traceback.format_exc())
+        return False
+    Task.objects.filter(pk=job.pk).delete()
+    return True
+
+
+def _fail(job, error):
+    from .models import Task
+
+    queryset = Task.objects.filter(pk=job.pk)
+    if job.attempts >= get_setting("MAX_ATTEMPTS"):
+        queryset.update(status=Task.FAILED, locked_at=None, last_error=error)
+        return
+    delay = get_setting("RETRY_DELAY") * 2 ** (job.attempts - 1)
+    _requeue(
+        queryset,
+        run_after=timezone.now() + timedelta(seconds=delay),
+        last_error=error,
+    )
+
+
+def _requeue(queryset, **fields):
+    """將工作改回待執行；已有相同的待執行工作時直接刪除"""
+    from .models import Task
+
+    try:
+        with transaction.atomic():
+            return queryset.update(status=Task.PENDING, locked_at=None, **fields)
+    except IntegrityError:
+        queryset.delete()
+        return 0
+
+
+def requeue_stale():
+    """將執行超過 ``LEASE_SECONDS`` 的工作重新排入佇列，回傳筆數"""
+    from .models import Task
+
+    cutoff = timezone.now() - timedelta(seconds=get_setting("LEASE_SECONDS"))
+    pks = list(
+        Task.objects.filter(status=Task.RUNNING, locked_at__lt=cutoff).values_list(
+            "pk", flat=True
+        )
+    )
+    for pk in pks:
+        _requeue(Task.objects.filter(pk=pk, status=Task.RUNNING))
+    return len(pks)
+
+
+def retry_failed():
+    """將失敗的工作重新排入佇列並重設執行次數，回傳筆數"""
+    from .models import Task
+
+    pks = list(Task.objects.filter(status=Task.FAILED).values_list("pk", flat=True))
+    for pk in pks:
+        _requeue(
+            Task.objects.filter(pk=pk, status=Task.FAILED),
+            attempts=0,
+            run_after=timezone.now(),
+        )
+    return len(pks)
+
+
+def run_pending(limit=None):
+    """執行目前可執行的工作直到佇列清空（或達到 ``limit`` 筆），回傳 (成功數, 失敗數)"""
+    succeeded = failed = 0
+    while limit is None or succeeded + failed < limit:
+        job = claim()
+        if job is None:
+            break
+        if run_task(job):
+            succeeded += 1
+        else:
+            failed += 1
+    return succeeded, failed
+
+
+class WorkerPool:
+    """在背景執行緒中處理工作的 worker"""
+
+    def __init__(self, workers=None, poll_interval=None):
+        self.workers = workers or get_setting("WORKERS")
+        self.poll_interval = (
+            get_setting("POLL_INTERVAL") if poll_interval is None else poll_interval
+        )
+        self.stopping = threading.Event()
+        self.threads = []
+
+    def start(self):
+        for number in range(self.workers):
+            thread = threading.Thread(
+                target=self.run, name=f"task-worker-{number}", daemon=True
+            )
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self, timeout=None):
+        """等待執行中的工作完成後結束"""
+        self.stopping.set()
+        _wakeup.set()
+        for thread in self.threads:
+            thread.join(timeout)
+
+    def run(self):
+        next_check = 0.0
+        try:
+            while not self.stopping.is_set():
+                close_old_connections()
+                try:
+                    if time.monotonic() >= next_check:
+                        requeue_stale()
+                        next_check = time.monotonic() + get_setting("LEASE_SECONDS")
+                    job = claim()
+                    if job is not None:
+                        run_task(job)
+                        continue
+                except Exception:
+                    logger.exception("無法從背景工作佇列取得工作")
+                _wakeup.wait(self.poll_interval)
+                _wakeup.clear()
+        finally:
+            connections.close_all()
+
+
+def autostart():
+    """``AUTOSTART`` 時在目前的行程中啟動 worker（只會啟動一次）"""
+    global _pool
+
+    if get_setting("EAGER") or not get_setting("AUTOSTART"):
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = WorkerPool()
+            _pool.start()
+    return _pool
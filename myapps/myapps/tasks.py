@@ -0,0 +1,37 @@
+"""
+資料寫入後的背景工作（由 signals.py 加入佇列，見 taskqueue.py）
+
+每個工作只以 ID 為參數，從資料的目前狀態重新計算，重複或延後執行的結果都相同。
+"""
+
+from django.db import router
+
+from .search import COURSE_INDEX, TEACHER_INDEX, index_document, remove_document
+from .similarity import refresh_course
+from .taskqueue import task
+
+SEARCH_INDEXES = {"teacher": TEACHER_INDEX, "course": COURSE_INDEX}
+
+
+@task("similar_courses")
+def update_similar_courses(course_id):
+    """重新計算課程的相似課程"""
+    refresh_course(course_id)
+
+
+@task("search_index")
+def update_search_index(index, pk):
+    """以資料的目前內容更新全文索引，資料已刪除時移除索引"""
+    search_index = SEARCH_INDEXES[index]
+    model = search_index.model
+    using = router.db_for_write(model)
+    instance = (
+        model.objects.using(using)
+        .only("id", *search_index.fields)
+        .filter(pk=pk)
+        .first()
+    )
+    if instance is None:
+        remove_document(search_index, pk, using)
+    else:
+        index_document(search_index, instance, using=using)
@@ -1,3 +1,1816 @@
-from django.test import TestCase
+import csv
+import datetime
+import itertools
+import json
+import os
+import re
+import tempfile
+import unittest
+from decimal import Decimal
+from importlib import import_module
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.apps import apps as django_apps
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import IntegrityError, connection, connections, transaction
+from django.db import router as db_router
+from django.http import HttpResponse
+from django.test import AsyncClient, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from myapps.urls import router
+
+from . import views
+from .analytics import rebuild_summaries
+from .cache import get_cache, latest_update
+from .geo import (
+    encode_geohash,
+    geocode,
+    geocode_courses,
+    haversine,
+    load_gazetteer,
+    nearby_courses,
+)
+from .leaderboard import LeaderboardPagination, leaderboard_queryset, recompute_scores
+from .models import (
+    Booking,
+    BookingDailySummary,
+    Course,
+    CourseSimilarity,
+    Review,
+    ReviewDailySummary,
+    Student,
+    Task,
+    Teacher,
+    User,
+)
+from .pagination import KeysetPagination, KeysetPaginationMixin
+from .profiler import QueryBudgetExceeded, fingerprint
+from .ratings import rebuild_course_ratings
+from .replicas import ReadReplicaMiddleware, read_from_replicas
+from .schedule import busy_bookings
+from .search import build_match_query, tokenize
+from .serializers import (
+    CourseLeaderboardValuesSerializer,
+    CourseListSerializer,
+    CourseListValuesSerializer,
+    TeacherListSerializer,
+    TeacherListValuesSerializer,
+)
+from .similarity import rebuild_similarities, similar_courses
+from .taskqueue import TASKS, enqueue, requeue_stale, retry_failed, run_pending
+
+
+@unittest.skipUnless(
+    connection.vendor == "sqlite", "EXPLAIN QUERY PLAN 僅適用於 SQLite"
+)
+class QueryPlanTests(TestCase):
+    """確認各 ViewSet 的查詢都走索引，不會退回全表掃描或額外排序"""
+
+    # 每個 ViewSet 常見的篩選組合
+    CASES = (
+        (views.UserViewSet, {}),
+        (views.UserViewSet, {"role": "teacher"}),
+        (views.TeacherViewSet, {}),
+        (views.TeacherViewSet, {"status": "active"}),
+        (views.StudentViewSet, {}),
+        (views.CourseViewSet, {}),
+        (views.CourseViewSet, {"teacher_id": "1"}),
+        (views.BookingViewSet, {}),
+        (views.BookingViewSet, {"status": "pending"}),
+        (views.BookingViewSet, {"student_id": "1"}),
+        (views.BookingViewSet, {"course_id": "1"}),
+        (views.BookingViewSet, {"status": "pending", "student_id": "1"}),
+        (views.ReviewViewSet, {}),
+        (views.ReviewViewSet, {"course_id": "1"}),
+    )
+
+    TABLE_SCAN = re.compile(r"\bSCAN \w+\b(?! USING)")
+    TEMP_SORT = re.compile(r"USE TEMP B-TREE")
+
+    def get_queryset(self, viewset_class, params, action="list"):
+        view = viewset_class()
+        view.request = Request(APIRequestFactory().get("/", params))
+        view.action = action
+        view.format_kwarg = None
+        view.kwargs = {}
+        return view.filter_queryset(view.get_queryset())
+
+    def assertIndexedPlan(self, queryset):
+        plan = queryset.explain()
+        self.assertIsNone(self.TABLE_SCAN.search(plan), f"出現全表掃描：\n{plan}")
+        self.assertIsNone(self.TEMP_SORT.search(plan), f"出現暫存排序：\n{plan}")
+
+    def test_list_querysets_use_indexes(self):
+        for viewset_class, params in self.CASES:
+            with self.subTest(viewset=viewset_class.__name__, params=params):
+                queryset = self.get_queryset(viewset_class, params)
+                self.assertIndexedPlan(queryset[:20])
+
+    def test_keyset_pages_use_indexes(self):
+        position = KeysetPagination()._before(timezone.now(), 1)
+        for viewset_class, params in self.CASES:
+            if not issubclass(viewset_class, KeysetPaginationMixin):
+                continue
+            with self.subTest(viewset=viewset_class.__name__, params=params):
+                queryset = self.get_queryset(viewset_class, params)
+                self.assertIndexedPlan(queryset.filter(position)[:21])
+
+    def test_leaderboard_pages_use_score_indexes(self):
+        for field in ("rating_score", "trending_score"):
+            position = LeaderboardPagination(field)._before(4.5, 1)
+            for params in ({}, {"subject": "數學"}, {"location": "線上"}):
+                with self.subTest(field=field, params=params):
+                    queryset = leaderboard_queryset(Course.objects.all(), params)
+                    rows = CourseLeaderboardValuesSerializer.values(queryset, field)
+                    self.assertIndexedPlan(
+                        rows.filter(position).order_by(f"-{field}", "-id")[:21]
+                    )
+
+    def test_similar_courses_use_score_index(self):
+        self.assertIndexedPlan(similar_courses(1))
+
+    def test_calendar_queries_use_range_index(self):
+        start = timezone.now()
+        end = start + datetime.timedelta(days=7)
+        cases = [
+            (views.TeacherViewSet, Teacher(pk=1), "bookings_course_interval_idx"),
+            (views.StudentViewSet, Student(pk=1), "bookings_student_start_idx"),
+        ]
+        for viewset_class, owner, index in cases:
+            with self.subTest(viewset=viewset_class.__name__):
+                queryset = viewset_class().get_calendar_queryset(owner, start, end)
+                plan = queryset.explain()
+                self.assertIn(f"USING INDEX {index} (", plan)
+                self.assertIn("start_at>? AND start_at<?", plan)
+                self.assertIsNone(self.TABLE_SCAN.search(plan), plan)
+
+    def test_latest_update_uses_index(self):
+        with CaptureQueriesContext(connection) as queries:
+            latest_update(Course)
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {queries[0]['sql']}")
+            plan = "\n".join(row[-1] for row in cursor.fetchall())
+        self.assertIn("courses_updated_at_idx", plan)
+
+    def test_conflict_lookup_uses_interval_index(self):
+        start = timezone.now()
+        plan = busy_bookings(1, start, start + datetime.timedelta(hours=1)).explain()
+        self.assertIn("USING INDEX bookings_course_interval_idx (", plan)
+        self.assertIsNone(self.TABLE_SCAN.search(plan), plan)
+
+
+class ValuesSerializerTests(TestCase):
+    """快速序列化器的 JSON 輸出必須與 ModelSerializer 逐位元組相同"""
+
+    @classmethod
+    def setUpTestData(cls):
+        for index, name in enumerate(["王小明", 'Amy "A" O\'Neil', "李老師 😀"]):
+            user = User.objects.create(
+                name=name, account=f"teacher{index}", password="x", role="teacher"
+            )
+            teacher = Teacher.objects.create(
+                user=user,
+                name=name,
+                email=f"t{index}@example.com",
+                phone="0912345678",
+                gender="F",
+                age="30",
+                status="active",
+                blue_premium=index == 0,
+            )
+            for price, rating in [(Decimal(100), 0.0), (Decimal("99.5"), 4.33)]:
+                Course.objects.create(
+                    subject=f"數學 {index}",
+                    teacher=teacher,
+                    description="",
+                    price=price,
+                    location="台北市",
+                    avg_rating=rating,
+                )
+
+    def test_output_matches_model_serializer(self):
+        renderer = JSONRenderer()
+        cases = [
+            (
+                Teacher.objects.order_by("name"),
+                TeacherListSerializer,
+                TeacherListValuesSerializer,
+            ),
+            (
+                Course.objects.select_related("teacher").order_by("-created_at", "-id"),
+                CourseListSerializer,
+                CourseListValuesSerializer,
+            ),
+        ]
+        for queryset, model_serializer, values_serializer in cases:
+            with self.subTest(serializer=model_serializer.__name__):
+                expected = renderer.render(model_serializer(queryset, many=True).data)
+                rows = values_serializer.values(queryset)
+                actual = renderer.render(values_serializer(rows, many=True).data)
+                self.assertEqual(actual, expected)
+
+
+def create_sample_data(indexes):
+    """每個編號建立一組教師、學生、課程、預約與評價"""
+    for index in indexes:
+        teacher_user = User.objects.create(
+            name=f"教師{index}", account=f"t{index}", password="x", role="teacher"
+        )
+        teacher = Teacher.objects.create(
+            user=teacher_user,
+            name=f"教師{index}",
+            email=f"t{index}@example.com",
+            phone="0912345678",
+            gender="M",
+            age="40",
+        )
+        student_user = User.objects.create(
+            name=f"學生{index}", account=f"s{index}", password="x", role="student"
+        )
+        student = Student.objects.create(
+            user=student_user, email=f"s{index}@example.com", gender="F", age="15"
+        )
+        course = Course.objects.create(
+            subject=f"課程{index}",
+            teacher=teacher,
+            description="",
+            price=Decimal(500),
+            location="線上",
+        )
+        Booking.objects.create(course=course, student=student, start_at=timezone.now())
+        Review.objects.create(course=course, rating="5", comment="")
+
+
+def expandable_paths(serializer_class, prefix=""):
+    """列出序列化器所有可展開的路徑，例如 ``course``、``course.teacher``"""
+    paths = []
+    for name, nested in getattr(serializer_class, "expandable_fields", {}).items():
+        paths.append(f"{prefix}{name}")
+        paths += expandable_paths(nested, f"{prefix}{name}.")
+    return paths
+
+
+@override_settings(API_RESPONSE_CACHE={"ENABLED": False})
+class ExpandQueryCountTests(TestCase):
+    """?expand= 的所有組合都不會逐筆產生額外查詢"""
+
+    ENDPOINTS = (
+        ("/api/courses/", views.CourseViewSet),
+        ("/api/bookings/", views.BookingViewSet),
+        ("/api/reviews/", views.ReviewViewSet),
+    )
+    # 列表：ETag 彙總、COUNT(*)、資料各一次；單筆：一次
+    LIST_QUERIES = 3
+    DETAIL_QUERIES = 1
+
+    @classmethod
+    def setUpTestData(cls):
+        create_sample_data(range(3))
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def expansions(self, viewset_class):
+        paths = expandable_paths(viewset_class.serializer_class)
+        for size in range(1, len(paths) + 1):
+            for combination in itertools.combinations(paths, size):
+                yield ",".join(combination)
+
+    def test_expansions_use_constant_queries(self):
+        for url, viewset_class in self.ENDPOINTS:
+            pk = viewset_class.queryset.model.objects.values_list("pk", flat=True)[0]
+            for expand in self.expansions(viewset_class):
+                with self.subTest(url=url, expand=expand):
+                    with self.assertNumQueries(self.LIST_QUERIES):
+                        response = self.client.get(url, {"expand": expand})
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(len(response.json()["results"]), 3)
+
+                    with self.assertNumQueries(self.DETAIL_QUERIES):
+                        response = self.client.get(f"{url}{pk}/", {"expand": expand})
+                    self.assertEqual(response.status_code, 200)
+
+    def test_expanded_fields_are_nested(self):
+        response = self.client.get(
+            "/api/bookings/", {"expand": "course.teacher,student.user"}
+        )
+        booking = response.json()["results"][0]
+        self.assertEqual(booking["course"]["teacher"]["name"], booking["teacher_name"])
+        self.assertEqual(booking["student"]["user"]["name"], booking["student_name"])
+
+    def test_unknown_expansion_is_rejected(self):
+        response = self.client.get("/api/reviews/", {"expand": "course.student"})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(
+    API_RESPONSE_CACHE={"ENABLED": False},
+    QUERY_PROFILER={
+        "ENABLED": True,
+        "MAX_QUERIES": None,
+        "MAX_DB_TIME_MS": None,
+        "MAX_DUPLICATES": 0,
+        "STRICT": True,
+    },
+)
+class QueryProfilerTests(TestCase):
+    """每個列表端點的查詢次數不隨資料筆數增加，也沒有重複的查詢"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def list_query_counts(self):
+        counts = {}
+        for prefix, viewset_class, basename in router.registry:
+            response = self.client.get(f"/api/{prefix}/")
+            self.assertEqual(response.status_code, 200, prefix)
+            self.assertIn("db;dur=", response["Server-Timing"])
+            counts[prefix] = response.wsgi_request.query_profile.count
+        return counts
+
+    def test_list_queries_do_not_grow_with_rows(self):
+        create_sample_data(range(1))
+        small = self.list_query_counts()
+        create_sample_data(range(1, 6))
+        self.assertEqual(self.list_query_counts(), small)
+
+    def test_strict_mode_rejects_duplicated_queries(self):
+        create_sample_data(range(2))
+        with (
+            mock.patch.object(
+                views.BookingViewSet,
+                "queryset",
+                Booking.objects.select_related("course", "student", "course__teacher"),
+            ),
+            mock.patch.object(
+                views.BookingViewSet,
+                "get_queryset",
+                lambda self: self.queryset.order_by("id"),
+            ),
+            self.assertRaises(QueryBudgetExceeded),
+        ):
+            self.client.get("/api/bookings/")
+
+    async def test_async_views_are_profiled(self):
+        # 非同步 ORM 的查詢在 sync_to_async 的執行緒中執行
+        await sync_to_async(create_sample_data)(range(3))
+        response = await AsyncClient().get("/api/async/courses/")
+        self.assertEqual(response.status_code, 200)
+        profile = response.asgi_request.query_profile
+        self.assertGreater(profile.count, 0)
+        self.assertIn(f'desc="{profile.count} queries"', response["Server-Timing"])
+
+    def test_fingerprint_ignores_parameters(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM "t" WHERE "id" IN (%s, %s, %s)'),
+            fingerprint('SELECT *  FROM "t"\nWHERE "id" IN (%s,%s)'),
+        )
+
+
+@override_settings(API_RESPONSE_CACHE={"ENABLED": False})
+class MetricsTests(TestCase):
+    """/metrics 以路由名稱統計，並合併其他 worker 寫入的檔案"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        settings_override = override_settings(
+            METRICS={"DIRECTORY": self.directory.name, "FLUSH_INTERVAL": 0}
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_metrics_are_keyed_by_route_and_merged_across_workers(self):
+        create_sample_data(range(1))
+        labels = '{route="teacher-search",method="GET",status="200"}'
+        before = self.client.get("/metrics").content.decode()
+        match = re.search(
+            rf"^http_requests_total{re.escape(labels)} (\d+)$", before, re.MULTILINE
+        )
+        count = int(match.group(1)) if match else 0
+
+        self.client.get("/api/teachers/search/", {"q": "教師"})
+        other_worker = {
+            "counters": [
+                [
+                    "http_requests_total",
+                    [["route", "teacher-search"], ["method", "GET"], ["status", "200"]],
+                    5,
+                ]
+            ],
+            "histograms": [],
+        }
+        with open(os.path.join(self.directory.name, "metrics-0.json"), "w") as file:
+            json.dump(other_worker, file)
+
+        response = self.client.get("/metrics")
+        self.assertTrue(
+            response["Content-Type"].startswith("text/plain; version=0.0.4")
+        )
+        body = response.content.decode()
+        self.assertIn(f"http_requests_total{labels} {count + 6}", body)
+        self.assertIn(
+            'http_request_duration_seconds_count{route="teacher-search",method="GET"}',
+            body,
+        )
+        self.assertIn('http_request_db_queries_total{route="teacher-search"', body)
+        self.assertNotIn('route="metrics"', body)
+
+    async def test_async_views_record_db_queries(self):
+        await sync_to_async(create_sample_data)(range(1))
+        client = AsyncClient()
+        with override_settings(QUERY_PROFILER={"ENABLED": False}):
+            response = await client.get("/api/async/teachers/")
+        self.assertEqual(response.status_code, 200)
+        body = (await client.get("/metrics")).content.decode()
+        match = re.search(
+            r'^http_request_db_queries_total\{route="async-teacher-list",'
+            r'method="GET"\} (\d+)$',
+            body,
+            re.MULTILINE,
+        )
+        self.assertIsNotNone(match, body)
+        self.assertGreater(int(match.group(1)), 0)
+
+
+@override_settings(
+    READ_REPLICAS={
+        "ENABLED": True,
+        "ALIASES": ["replica"],
+        "STICKY_SECONDS": 10,
+        "COOKIE_NAME": "db_primary",
+    }
+)
+class ReadReplicaTests(TestCase):
+    """GET 讀取副本、寫入走主資料庫，寫入後的讀取在期限內仍走主資料庫"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def route(self, request):
+        """回傳請求處理期間讀取與寫入分配到的資料庫"""
+        used = {}
+
+        def get_response(request):
+            used["read"] = db_router.db_for_read(Course)
+            used["write"] = db_router.db_for_write(Course)
+            return HttpResponse()
+
+        response = ReadReplicaMiddleware(get_response)(request)
+        return used, response
+
+    def test_safe_requests_read_from_replica(self):
+        used, response = self.route(self.factory.get("/api/courses/"))
+        self.assertEqual(used, {"read": "replica", "write": "default"})
+        self.assertNotIn("db_primary", response.cookies)
+
+    def test_writes_pin_client_to_primary(self):
+        used, response = self.route(self.factory.post("/api/courses/"))
+        self.assertEqual(used, {"read": "default", "write": "default"})
+        self.assertEqual(response.cookies["db_primary"]["max-age"], 10)
+
+        request = self.factory.get("/api/courses/")
+        request.COOKIES["db_primary"] = "1"
+        used, _ = self.route(request)
+        self.assertEqual(used["read"], "default")
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(db_router.allow_migrate("replica", "myapps"))
+        self.assertTrue(db_router.allow_migrate("default", "myapps"))
+
+    def test_response_cache_key_follows_snapshot(self):
+        view = views.TeacherViewSet(action="list")
+        request = Request(APIRequestFactory().get("/api/teachers/"))
+        with tempfile.NamedTemporaryFile() as snapshot:
+            replica = connections["replica"].settings_dict
+            with mock.patch.dict(replica, {"NAME": snapshot.name}):
+                with read_from_replicas():
+                    key = view.get_response_cache_key(request)
+                    self.assertEqual(key, view.get_response_cache_key(request))
+                    # sync_replicas 在其他行程產生新快照
+                    os.utime(snapshot.name, ns=(0, 0))
+                    replica_key = view.get_response_cache_key(request)
+                self.assertNotEqual(replica_key, key)
+                self.assertNotIn(
+                    view.get_response_cache_key(request), (key, replica_key)
+                )
+
+
+@override_settings(API_RESPONSE_CACHE={"ENABLED": False})
+class BookingScheduleTests(TestCase):
+    """預約時段的解析、驗證與行事曆端點"""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_sample_data(range(2))
+        cls.start = timezone.make_aware(datetime.datetime(2025, 7, 21, 9, 0))
+        for day, booking in enumerate(Booking.objects.order_by("pk")):
+            booking.start_at = cls.start + datetime.timedelta(days=day * 10)
+            booking.end_at = booking.start_at + datetime.timedelta(hours=2)
+            booking.save()
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_parse_legacy_schedule(self):
+        parse_schedule = import_module(
+            "myapps.myapps.migrations.0008_booking_start_end"
+        ).parse_schedule
+        reference = timezone.make_aware(datetime.datetime(2025, 7, 22, 8, 30))
+        cases = {
+            "12:00": ("2025-07-22 12:00", "2025-07-22 13:00"),
+            "2025-07-25 14:00": ("2025-07-25 14:00", "2025-07-25 15:00"),
+            "2025/07/25 14:00-15:30": ("2025-07-25 14:00", "2025-07-25 15:30"),
+            "07/25 09:30": ("2025-07-25 09:30", "2025-07-25 10:30"),
+            # 超過上限的時段縮短為 8 小時
+            "2025/07/25 08:00-20:00": ("2025-07-25 08:00", "2025-07-25 16:00"),
+        }
+        for value, expected in cases.items():
+            with self.subTest(value=value):
+                start, end = parse_schedule(value, reference)
+                actual = tuple(
+                    timezone.localtime(moment).strftime("%Y-%m-%d %H:%M")
+                    for moment in (start, end)
+                )
+                self.assertEqual(actual, expected)
+        self.assertEqual(parse_schedule("週六", reference), (None, None))
+
+    def test_end_must_follow_start(self):
+        booking = Booking.objects.first()
+        data = {
+            "course": booking.course_id,
+            "student": booking.student_id,
+            "start_at": "2025-08-01T10:00:00Z",
+            "status": "pending",
+        }
+        response = self.client.post("/api/bookings/", data, format="json")
+        self.assertEqual(response.json()["end_at"], "2025-08-01T11:00:00Z")
+        data["end_at"] = "2025-08-01T09:00:00Z"
+        response = self.client.post("/api/bookings/", data, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_duration_is_capped(self):
+        booking = Booking.objects.first()
+        booking.end_at = booking.start_at + datetime.timedelta(hours=9)
+        with self.assertRaises(ValidationError) as ctx:
+            booking.full_clean()
+        self.assertIn("end_at", ctx.exception.message_dict)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            booking.save()
+
+        # 遷移將加上約束前的舊資料縮短為上限長度
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA ignore_check_constraints = ON")
+            Booking.objects.filter(pk=booking.pk).update(end_at=booking.end_at)
+            cursor.execute("PRAGMA ignore_check_constraints = OFF")
+        import_module(
+            "myapps.myapps.migrations.0017_booking_max_duration"
+        ).clamp_long_bookings(django_apps, None)
+        booking.refresh_from_db()
+        self.assertEqual(booking.end_at - booking.start_at, datetime.timedelta(hours=8))
+
+    def test_calendar_returns_bookings_in_range(self):
+        first, second = Booking.objects.order_by("pk")
+        week = {"from": "2025-07-21", "to": "2025-07-28"}
+        cases = [
+            (f"/api/teachers/{first.course.teacher_id}/calendar/", first),
+            (f"/api/students/{second.student_id}/calendar/", None),
+            (f"/api/students/{first.student_id}/calendar/", first),
+        ]
+        for url, expected in cases:
+            with self.subTest(url=url):
+                response = self.client.get(url, week)
+                ids = [booking["id"] for booking in response.json()["results"]]
+                self.assertEqual(ids, [expected.pk] if expected else [])
+
+        response = self.client.get(
+            f"/api/students/{first.student_id}/calendar/",
+            {"from": "2025-01-01", "to": "2026-01-01"},
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_overlapping_bookings_conflict(self):
+        first = Booking.objects.order_by("pk").first()
+        other_course = Course.objects.create(
+            subject="另一門課",
+            teacher=first.course.teacher,
+            description="",
+            price=Decimal(500),
+            location="線上",
+        )
+        data = {
+            "course": other_course.pk,
+            "student": first.student_id,
+            "start_at": "2025-07-21T10:00:00Z",
+            "status": "pending",
+        }
+        response = self.client.post("/api/bookings/", data, format="json")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["conflicting_bookings"], [first.pk])
+
+        for start, status in [("2025-07-21T11:00:00Z", "pending"), (None, "cancelled")]:
+            with self.subTest(start=start, status=status):
+                data.update(status=status, start_at=start or data["start_at"])
+                response = self.client.post("/api/bookings/", data, format="json")
+                self.assertEqual(response.status_code, 201)
+
+        response = self.client.patch(
+            f"/api/bookings/{response.json()['id']}/",
+            {"status": "pending"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 409)
+
+    def test_availability_excludes_busy_slots(self):
+        teacher_id = Booking.objects.order_by("pk").first().course.teacher_id
+        params = {
+            "from": "2025-07-21",
+            "to": "2025-07-23",
+            "day_start": "08:00",
+            "day_end": "12:00",
+        }
+        # 教師資料與佔用時段各一次查詢，與期間長短無關
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                f"/api/teachers/{teacher_id}/availability/", params
+            )
+        windows = [
+            (window["start_at"], window["end_at"])
+            for window in response.json()["windows"]
+        ]
+        self.assertEqual(
+            windows,
+            [
+                ("2025-07-21T08:00:00Z", "2025-07-21T09:00:00Z"),
+                ("2025-07-21T11:00:00Z", "2025-07-21T12:00:00Z"),
+                ("2025-07-22T08:00:00Z", "2025-07-22T12:00:00Z"),
+            ],
+        )
+
+
+@override_settings(API_RESPONSE_CACHE={"ENABLED": False})
+class DashboardAnalyticsTests(TestCase):
+    """每日統計表的增量維護與教師儀表板端點"""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_sample_data(range(2))
+        cls.teacher = Teacher.objects.get(name="教師0")
+        cls.course = Course.objects.get(teacher=cls.teacher)
+        cls.student = Student.objects.first()
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def summaries(self):
+        return (
+            sorted(
+                BookingDailySummary.objects.values_list(
+                    "teacher_id", "course_id", "day", "status", "count", "amount"
+                )
+            ),
+            sorted(
+                ReviewDailySummary.objects.values_list(
+                    "teacher_id", "course_id", "day", "count", "rating_sum"
+                )
+            ),
+        )
+
+    def book(self, start_at, status="pending"):
+        data = {
+            "course": self.course.pk,
+            "student": self.student.pk,
+            "start_at": start_at,
+            "status": status,
+        }
+        response = self.client.post("/api/bookings/", data, format="json")
+        self.assertEqual(response.status_code, 201)
+        return response.json()["id"]
+
+    def test_incremental_updates_match_rebuild(self):
+        first = self.book("2025-03-03T10:00:00Z")
+        second = self.book("2025-03-04T10:00:00Z")
+        self.book("2025-04-01T10:00:00Z", status="completed")
+        self.client.patch(
+            f"/api/bookings/{first}/", {"status": "completed"}, format="json"
+        )
+        self.client.patch(
+            f"/api/bookings/{second}/",
+            {"start_at": "2025-05-01T10:00:00Z", "end_at": "2025-05-01T11:00:00Z"},
+            format="json",
+        )
+        self.client.delete(f"/api/bookings/{second}/")
+        review = Review.objects.get(course=self.course)
+        self.client.patch(f"/api/reviews/{review.pk}/", {"rating": "3"}, format="json")
+        other = Course.objects.exclude(pk=self.course.pk).get()
+        other.price = Decimal(800)
+        other.save()
+        other.teacher = self.teacher
+        other.save()
+
+        incremental = self.summaries()
+        rebuild_summaries()
+        self.assertEqual(self.summaries(), incremental)
+
+    def test_analytics_reads_only_summaries(self):
+        self.book("2025-03-03T10:00:00Z", status="completed")
+        self.book("2025-03-10T10:00:00Z", status="completed")
+        self.book("2025-05-01T10:00:00Z", status="cancelled")
+        url = f"/api/teachers/{self.teacher.pk}/analytics/"
+        # 教師資料與兩張統計表各一次查詢，不讀取原始的預約與評價
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {"from": "2025-03", "to": "2025-05"})
+        self.assertEqual(len(queries), 3)
+        for query in queries:
+            self.assertNotRegex(query["sql"], r'"(bookings|reviews)"')
+
+        data = response.json()
+        self.assertEqual(
+            [month["month"] for month in data["months"]],
+            [
+                "2025-03",
+                "2025-04",
+                "2025-05",
+            ],
+        )
+        march = data["months"][0]
+        self.assertEqual(march["bookings"]["completed"], 2)
+        self.assertEqual(march["revenue"], "1000.00")
+        self.assertEqual(data["totals"]["total_bookings"], 3)
+        self.assertEqual(data["totals"]["revenue"], "1000.00")
+
+        response = self.client.get(url, {"from": "2020-01", "to": "2025-01"})
+        self.assertEqual(response.status_code, 400)
+        for course in ("abc", "²", ""):
+            response = self.client.get(url, {"course": course})
+            self.assertEqual(response.status_code, 400)
+
+
+@override_settings(
+    API_RESPONSE_CACHE={"ENABLED": False},
+    LEADERBOARD={"PRIOR_WEIGHT": 10, "PREMIUM_BOOST": 1.05},
+    TASK_QUEUE={"EAGER": True},
+)
+class LeaderboardTests(TestCase):
+    """課程排行分數的計算與排行榜端點"""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_sample_data(range(3))
+        cls.single, cls.many, cls.premium = Course.objects.order_by("pk")
+        # single 只有一則五星評價，many 有多則略低的評價
+        for rating in ["5"] * 9 + ["4"]:
+            Review.objects.create(course=cls.many, rating=rating, comment="")
+        review = Review.objects.get(course=cls.premium)
+        review.rating = "1"
+        review.save()
+        Teacher.objects.filter(pk=cls.premium.teacher_id).update(blue_premium=True)
+        student = Student.objects.first()
+        for _ in range(3):
+            Booking.objects.create(
+                course=cls.premium, student=student, start_at=timezone.now()
+            )
+        recompute_scores()
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def ids(self, url, params=None):
+        return [row["id"] for row in self.client.get(url, params).json()["results"]]
+
+    def test_bayesian_score_outranks_single_review(self):
+        self.assertEqual(
+            self.ids("/api/courses/top_rated/"),
+            [self.many.pk, self.single.pk, self.premium.pk],
+        )
+        self.assertEqual(self.ids("/api/courses/trending/")[0], self.premium.pk)
+        # 四筆最近的預約，藍鑽會員加成 1.05 倍
+        self.premium.refresh_from_db()
+        self.assertAlmostEqual(self.premium.trending_score, 4 * 1.05)
+        self.assertEqual(recompute_scores(), 0)
+
+    def test_pages_are_single_index_reads(self):
+        url = "/api/courses/top_rated/"
+        with mock.patch.object(LeaderboardPagination, "page_size", 2):
+            # 每頁只有一次查詢，不需要 COUNT(*)
+            with self.assertNumQueries(1):
+                first = self.client.get(url).json()
+            second = self.client.get(first["next"]).json()
+        ids = [row["id"] for row in first["results"] + second["results"]]
+        self.assertEqual(ids, self.ids(url))
+        self.assertIsNone(second["next"])
+        self.assertEqual(
+            self.ids(url, {"location": "線上", "subject": "課程1"}), [self.many.pk]
+        )
+
+    @override_settings(
+        API_RESPONSE_CACHE={"ENABLED": True, "ALIAS": "api", "TIMEOUT": 60}
+    )
+    def test_recompute_refreshes_cached_courses(self):
+        get_cache().clear()
+        self.addCleanup(get_cache().clear)
+        url = f"/api/courses/{self.single.pk}/"
+        self.client.get(url)
+        # 不經過訊號的寫入（例如其他行程的批次指令），
+        # recompute_scores 寫入 updated_at 後快取失效
+        Course.objects.filter(pk=self.single.pk).update(rating_sum=1.0)
+        self.assertEqual(self.client.get(url)["X-Cache"], "HIT")
+        self.assertEqual(recompute_scores(), 3)
+        self.assertEqual(self.client.get(url)["X-Cache"], "MISS")
+        course = Course.objects.get(pk=self.single.pk)
+        self.assertGreater(course.updated_at, self.single.updated_at)
+
+
+@override_settings(
+    API_RESPONSE_CACHE={"ENABLED": False},
+    # 寫入後的統計與相似課程更新直接執行，不經過背景工作佇列
+    TASK_QUEUE={"EAGER": True},
+)
+class SimilarCoursesTests(TestCase):
+    """TF-IDF 相似課程的離線計算、單一課程更新與端點"""
+
+    COURSES = (
+        ("國中數學", "代數與幾何基礎，適合國中生", "台北市", "500"),
+        ("高中數學", "微積分先修與代數複習", "台北市", "800"),
+        ("數學競賽", "奧林匹亞數學解題技巧", "台中市", "1500"),
+        ("英文會話", "日常英文口說練習 speaking", "台北市", "600"),
+        ("多益英文", "TOEIC 聽力與閱讀 speaking", "線上", "700"),
+        ("鋼琴入門", "古典鋼琴指法", "台北市", "1000"),
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        create_sample_data(range(1))
+        teacher = Teacher.objects.get()
+        Course.objects.all().delete()
+        cls.courses = [
+            Course.objects.create(
+                subject=subject,
+                description=description,
+                location=location,
+                price=Decimal(price),
+                teacher=teacher,
+            )
+            for subject, description, location, price in cls.COURSES
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def neighbours(self):
+        return {
+            course.pk: list(
+                CourseSimilarity.objects.filter(course=course)
+                .order_by("-score", "similar_id")
+                .values_list("similar_id", "score")
+            )
+            for course in self.courses
+        }
+
+    def test_similar_courses_share_content(self):
+        rebuild_similarities()
+        junior, senior, contest, talk, toeic, piano = self.courses
+        with self.assertNumQueries(2):
+            response = self.client.get(f"/api/courses/{junior.pk}/similar/")
+        ids = [row["id"] for row in response.json()["results"]]
+        self.assertEqual(ids, [senior.pk, contest.pk])
+        response = self.client.get(f"/api/courses/{talk.pk}/similar/")
+        self.assertEqual(response.json()["results"][0]["id"], toeic.pk)
+        response = self.client.get(f"/api/courses/{piano.pk}/similar/")
+        self.assertEqual(response.json()["results"], [])
+        response = self.client.get("/api/courses/0/similar/")
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get("/api/courses/abc/similar/")
+        self.assertEqual(response.status_code, 404)
+
+    def test_course_update_refreshes_only_its_neighbours(self):
+        # 修改後立即反映在該課程的相似課程，其他課程的列表不受影響
+        rebuild_similarities()
+        before = self.neighbours()
+        piano = self.courses[-1]
+        piano.subject = "鋼琴數學"
+        piano.save()
+        after = self.neighbours()
+        self.assertIn(self.courses[0].pk, [pk for pk, _ in after[piano.pk]])
+        for course in self.courses[3:5]:
+            self.assertEqual(after[course.pk], before[course.pk])
+
+        # 與完整重建的排名相同
+        rebuild_similarities()
+        self.assertEqual(
+            [pk for pk, _ in self.neighbours()[piano.pk]],
+            [pk for pk, _ in after[piano.pk]],
+        )
+
+
+@override_settings(API_RESPONSE_CACHE={"ENABLED": False})
+class FacetedSearchTests(TestCase):
+    """課程分面搜尋的篩選、排序與分面統計"""
+
+    COURSES = (
+        ("數學", "台北市", "400", 4.8),
+        ("數學", "台北市", "900", 4.2),
+        ("英文", "台北市", "1200", 3.0),
+        ("數學", "台中市", "700", 4.6),
+        ("英文", "線上", "3500", 0.0),
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        create_sample_data(range(1))
+        teacher = Teacher.objects.get()
+        Course.objects.all().delete()
+        cls.courses = [
+            Course.objects.create(
+                subject=subject,
+                description="",
+                location=location,
+                price=Decimal(price),
+                avg_rating=rating,
+                teacher=teacher,
+            )
+            for subject, location, price, rating in cls.COURSES
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_facets_follow_filters_in_one_query(self):
+        # COUNT、結果頁與分面統計各一次查詢
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                "/api/courses/faceted/",
+                {"location": "台北市,台中市", "price_max": "1000", "ordering": "price"},
+            )
+        data = response.json()
+        self.assertEqual(
+            [row["id"] for row in data["results"]],
+            [self.courses[0].pk, self.courses[3].pk, self.courses[1].pk],
+        )
+        facets = data["facets"]
+        self.assertEqual(
+            facets["location"],
+            [{"value": "台北市", "count": 2}, {"value": "台中市", "count": 1}],
+        )
+        self.assertEqual([bucket["count"] for bucket in facets["price"]][:3], [1, 2, 0])
+        self.assertEqual(facets["price"][-1], {"min": 3000, "max": None, "count": 0})
+        self.assertEqual(
+            {band["min_rating"]: band["count"] for band in facets["rating"]},
+            {4.5: 2, 4.0: 3, 3.5: 3, 3.0: 3},
+        )
+
+        data = self.client.get(
+            "/api/courses/faceted/",
+            {"min_rating": "4.5", "subject": "數學", "ordering": "-rating"},
+        ).json()
+        self.assertEqual(
+            [row["id"] for row in data["results"]],
+            [self.courses[0].pk, self.courses[3].pk],
+        )
+        self.assertEqual(sum(row["count"] for row in data["facets"]["location"]), 2)
+
+    def test_invalid_parameters(self):
+        for params in (
+            {"price_min": "abc"},
+            {"price_min": "500", "price_max": "100"},
+            {"ordering": "teacher"},
+            {"price_min": "NaN"},
+            {"price_min": "NaN", "price_max": "5"},
+            {"price_max": "Infinity"},
+            {"price_min": "-inf"},
+            {"price_min": "sNaN"},
+            {"min_rating": "nan"},
+        ):
+            response = self.client.get("/api/courses/faceted/", params)
+            self.assertEqual(response.status_code, 400, params)
+
+    def test_cursor_pagination_keeps_ordering(self):
+        # 分面搜尋不使用游標分頁，?ordering= 仍然有效
+        data = self.client.get(
+            "/api/courses/faceted/", {"ordering": "price", "pagination": "cursor"}
+        ).json()
+        self.assertEqual(
+            [row["id"] for row in data["results"]],
+            [self.courses[i].pk for i in (0, 3, 1, 2, 4)],
+        )
+        self.assertIn("count", data)
+        self.assertIn("facets", data)
+
+
+@override_settings(API_RESPONSE_CACHE={"ENABLED": False})
+class NearbyCoursesTests(TestCase):
+    """課程座標、geohash 網格索引與附近課程查詢"""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_sample_data(range(1))
+        teacher = Teacher.objects.get()
+        Course.objects.all().delete()
+        # 台北市附近 400 門課程，以固定間距分布
+        Course.objects.bulk_create(
+            Course(
+                subject=f"課程{index}",
+                teacher=teacher,
+                price=Decimal(500),
+                location="台北市",
+                latitude=24.9 + index // 20 * 0.015,
+                longitude=121.4 + index % 20 * 0.015,
+            )
+            for index in range(400)
+        )
+        for course in Course.objects.all():
+            course.save()
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_geohash(self):
+        self.assertEqual(encode_geohash(57.64911, 10.40744, 11), "u4pruydqqvj")
+        course = Course.objects.first()
+        self.assertEqual(
+            course.geohash, encode_geohash(course.latitude, course.longitude)
+        )
+
+    def test_nearby_matches_exact_distance(self):
+        center = (25.0330, 121.5654)
+        for radius in (1, 3, 10):
+            expected = sorted(
+                (haversine(*center, latitude, longitude), pk)
+                for pk, latitude, longitude in Course.objects.values_list(
+                    "id", "latitude", "longitude"
+                )
+            )
+            expected = [pk for distance, pk in expected if distance <= radius]
+            nearby = nearby_courses(Course.objects.all(), *center, radius)
+            self.assertEqual(list(nearby.values_list("id", flat=True)), expected)
+            data = self.client.get(
+                "/api/courses/nearby/", {"near": "25.0330,121.5654", "radius": radius}
+            ).json()
+            self.assertEqual(data["count"], len(expected))
+            self.assertEqual([row["id"] for row in data["results"]], expected[:20])
+
+        # 附近課程不使用游標分頁，仍依距離排序
+        data = self.client.get(
+            "/api/courses/nearby/",
+            {"near": "25.0330,121.5654", "radius": 10, "pagination": "cursor"},
+        ).json()
+        self.assertEqual([row["id"] for row in data["results"]], expected[:20])
+        distances = [row["distance"] for row in data["results"]]
+        self.assertEqual(distances, sorted(distances))
+
+    def test_candidates_read_through_geohash_index(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get("/api/courses/nearby/", {"near": "25.0330,121.5654"})
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + queries.captured_queries[-1]["sql"])
+            plan = " ".join(str(row[-1]) for row in cursor.fetchall())
+        self.assertIn("courses_geohash_idx", plan)
+        self.assertNotIn("SCAN courses", plan)
+
+    def test_invalid_parameters(self):
+        for params in (
+            {},
+            {"near": "25.03"},
+            {"near": "95,121"},
+            {"near": "25,121", "radius": "0"},
+        ):
+            response = self.client.get("/api/courses/nearby/", params)
+            self.assertEqual(response.status_code, 400, params)
+
+    def test_geocode_from_gazetteer(self):
+        gazetteer = load_gazetteer()
+        self.assertEqual(geocode("臺北市大安區", gazetteer), gazetteer["台北市"])
+        self.assertIsNone(geocode("線上", gazetteer))
+        Course.objects.filter(pk__in=Course.objects.values("pk")[:2]).update(
+            location="高雄市前鎮區", latitude=None, longitude=None, geohash=""
+        )
+        before = Course.objects.first()
+        etag = self.client.get(f"/api/courses/{before.pk}/")["ETag"]
+        self.assertEqual(geocode_courses(gazetteer), (2, 0))
+        course = Course.objects.get(location="高雄市前鎮區", pk=before.pk)
+        self.assertEqual((course.latitude, course.longitude), gazetteer["高雄市"])
+        self.assertEqual(course.geohash, encode_geohash(*gazetteer["高雄市"]))
+        # bulk_update 也要更新 updated_at，否則條件式請求會拿到舊的 ETag
+        self.assertGreater(course.updated_at, before.updated_at)
+        response = self.client.get(
+            f"/api/courses/{course.pk}/", HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["latitude"], gazetteer["高雄市"][0])
+
+
+@override_settings(API_RESPONSE_CACHE={"ENABLED": False})
+class AsyncReadViewTests(TestCase):
+    """非同步唯讀端點與同步 ViewSet 的回應相同"""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_sample_data(range(25))
+
+    def urls(self):
+        teacher, course, booking = (
+            model.objects.order_by("pk").last().pk
+            for model in (Teacher, Course, Booking)
+        )
+        return [
+            "teachers/",
+            "teachers/?page=2&status=active",
+            f"teachers/{teacher}/",
+            "courses/?fields=id,subject",
+            f"courses/?teacher_id={Teacher.objects.first().pk}",
+            f"courses/{course}/",
+            "bookings/?page=last",
+            f"bookings/{booking}/",
+            "courses/0/",
+            "bookings/?page=9",
+            "teachers/?fields=unknown",
+        ]
+
+    async def test_matches_sync_viewsets(self):
+        # 非同步情境中同步的 ORM 呼叫會拋出 SynchronousOnlyOperation
+        urls = await sync_to_async(self.urls)()
+        client = AsyncClient()
+        for url in urls:
+            expected = await sync_to_async(self.client.get)(f"/api/{url}")
+            response = await client.get(f"/api/async/{url}")
+            self.assertEqual(response.status_code, expected.status_code, url)
+            self.assertEqual(
+                response.content.replace(b"/api/async/", b"/api/"),
+                expected.content,
+                url,
+            )
+
+
+@override_settings(
+    API_RESPONSE_CACHE={"ENABLED": False},
+    TASK_QUEUE={"MAX_ATTEMPTS": 3, "RETRY_DELAY": 0, "LEASE_SECONDS": 60},
+)
+class TaskQueueTests(TestCase):
+    """背景工作的加入、去重、重試與中斷後的重新排入"""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_sample_data(range(1))
+        cls.course = Course.objects.get()
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_course_writes_one_task_insert_and_dedupes(self):
+        url = f"/api/courses/{self.course.pk}/"
+        for subject in ["鋼琴", "小提琴", "大提琴"]:
+            with (
+                CaptureQueriesContext(connection) as queries,
+                self.captureOnCommitCallbacks(execute=True),
+            ):
+                response = self.client.patch(url, {"subject": subject})
+            self.assertEqual(response.status_code, 200)
+            inserts = [
+                query["sql"]
+                for query in queries
+                if query["sql"].startswith('INSERT OR IGNORE INTO "tasks"')
+            ]
+            self.assertEqual(len(inserts), 1)
+
+        # 同一門課程的全文索引與相似課程各只保留一筆待執行的工作
+        self.assertEqual(
+            sorted(Task.objects.values_list("name", flat=True)),
+            ["search_index", "similar_courses"],
+        )
+        self.assertEqual(run_pending(), (2, 0))
+        self.assertFalse(Task.objects.exists())
+
+    def test_reviews_update_aggregates_without_tasks(self):
+        # 評分與每日統計在寫入的交易中以差值更新，不加入佇列
+        for rating in ["4", "3", "2"]:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    "/api/reviews/",
+                    {"course": self.course.pk, "rating": rating, "comment": ""},
+                )
+            self.assertEqual(response.status_code, 201)
+        self.assertFalse(Task.objects.exists())
+        self.course.refresh_from_db()
+        self.assertEqual((self.course.rating_count, self.course.avg_rating), (4, 3.5))
+        self.assertEqual(ReviewDailySummary.objects.get().count, 4)
+
+    def test_migration_drains_aggregate_tasks(self):
+        drain = import_module(
+            "myapps.myapps.migrations.0015_drain_aggregate_tasks"
+        ).drain_aggregate_tasks
+        Review.objects.bulk_create([Review(course=self.course, rating="3")])
+        for name in ("course_rating", "course_summaries", "search_index"):
+            Task.objects.create(
+                name=name, kwargs={"course_id": self.course.pk}, dedupe_key=name
+            )
+        drain(django_apps, None)
+        self.course.refresh_from_db()
+        self.assertEqual((self.course.rating_count, self.course.avg_rating), (2, 4.0))
+        self.assertEqual(ReviewDailySummary.objects.get().count, 2)
+        self.assertEqual(
+            list(Task.objects.values_list("name", flat=True)), ["search_index"]
+        )
+
+    def test_failed_tasks_are_retried(self):
+        calls = []
+
+        def flaky(fail_times):
+            calls.append(fail_times)
+            if len(calls) <= fail_times:
+                raise RuntimeError("暫時無法連線")
+
+        with mock.patch.dict(TASKS, {"flaky": flaky}):
+            with self.captureOnCommitCallbacks(execute=True):
+                enqueue("flaky", fail_times=1)
+            with self.assertLogs("myapps.myapps.taskqueue", "WARNING"):
+                self.assertEqual(run_pending(), (1, 1))
+            self.assertFalse(Task.objects.exists())
+
+            calls.clear()
+            with self.captureOnCommitCallbacks(execute=True):
+                enqueue("flaky", fail_times=5)
+            with self.assertLogs("myapps.myapps.taskqueue", "WARNING"):
+                self.assertEqual(run_pending(), (0, 3))
+            task = Task.objects.get()
+            self.assertEqual((task.status, task.attempts), (Task.FAILED, 3))
+            self.assertIn("暫時無法連線", task.last_error)
+
+            self.assertEqual(retry_failed(), 1)
+            self.assertEqual(Task.objects.get().status, Task.PENDING)
+
+    def test_stale_running_tasks_are_requeued(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            enqueue("similar_courses", course_id=self.course.pk)
+        stale = timezone.now() - datetime.timedelta(minutes=5)
+        Task.objects.update(status=Task.RUNNING, locked_at=stale)
+        # 執行中的工作不影響加入相同的工作
+        with self.captureOnCommitCallbacks(execute=True):
+            enqueue("similar_courses", course_id=self.course.pk)
+        self.assertEqual(Task.objects.count(), 2)
+
+        # 已有相同的待執行工作，中斷的工作直接刪除
+        self.assertEqual(requeue_stale(), 1)
+        self.assertEqual(Task.objects.get().status, Task.PENDING)
+        self.assertEqual(run_pending(), (1, 0))
+
+
+@override_settings(
+    API_RESPONSE_CACHE={"ENABLED": False},
+    QUERY_PROFILER={"ENABLED": False},
+)
+class CourseRatingTests(TestCase):
+    """評價新增、修改、移動與刪除後的課程評分統計"""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_sample_data(range(2))
+        cls.first, cls.second = Course.objects.order_by("pk")
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def assertRating(self, course, rating_sum, rating_count, avg_rating):
+        course.refresh_from_db()
+        self.assertEqual(
+            (course.rating_sum, course.rating_count, course.avg_rating),
+            (rating_sum, rating_count, avg_rating),
+        )
+
+    def test_review_changes_update_aggregates(self):
+        response = self.client.post(
+            "/api/reviews/", {"course": self.first.pk, "rating": "4", "comment": ""}
+        )
+        self.assertEqual(response.status_code, 201)
+        url = f"/api/reviews/{response.json()['id']}/"
+        self.assertRating(self.first, 9.0, 2, 4.5)
+
+        self.client.patch(url, {"rating": "2"})
+        self.assertRating(self.first, 7.0, 2, 3.5)
+
+        # 移到另一門課程時兩門課程都要更新
+        self.client.patch(url, {"course": self.second.pk})
+        self.assertRating(self.first, 5.0, 1, 5.0)
+        self.assertRating(self.second, 7.0, 2, 3.5)
+
+        self.client.delete(url)
+        self.assertRating(self.second, 5.0, 1, 5.0)
+        Review.objects.filter(course=self.second).delete()
+        self.assertRating(self.second, 0.0, 0, 0.0)
+
+    def test_delta_is_one_update_in_the_write_transaction(self):
+        with CaptureQueriesContext(connection) as queries:
+            Review.objects.create(course=self.first, rating="3", comment="")
+        updates = [q["sql"] for q in queries if q["sql"].startswith('UPDATE "courses"')]
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn('"reviews"', updates[0])
+        self.assertRating(self.first, 8.0, 2, 4.0)
+
+        # 差值更新與評價的寫入在同一個交易區塊中執行
+        depth = len(connection.atomic_blocks)
+        depths = []
+        with mock.patch(
+            "myapps.myapps.signals.apply_rating_delta",
+            side_effect=lambda *args: depths.append(len(connection.atomic_blocks)),
+        ):
+            Review.objects.create(course=self.first, rating="1", comment="")
+        self.assertEqual(depths, [depth + 1])
+
+    def test_unloaded_instance_uses_stored_values(self):
+        # 未由資料庫載入的評價以儲存前的資料計算差值
+        review = Review.objects.get(course=self.first)
+        Review(
+            pk=review.pk, course=self.second, rating="1", created_at=review.created_at
+        ).save()
+        self.assertRating(self.first, 0.0, 0, 0.0)
+        self.assertRating(self.second, 6.0, 2, 3.0)
+
+    def test_rebuild_course_ratings(self):
+        Course.objects.update(rating_sum=0, rating_count=0, avg_rating=0)
+        # bulk_create 不觸發訊號
+        Review.objects.bulk_create([Review(course=self.second, rating="2", comment="")])
+        self.assertEqual(rebuild_course_ratings(), 2)
+        self.assertRating(self.first, 5.0, 1, 5.0)
+        self.assertRating(self.second, 7.0, 2, 3.5)
+        self.assertEqual(rebuild_course_ratings(), 0)
+
+
+@override_settings(
+    API_RESPONSE_CACHE={"ENABLED": False},
+    # 索引更新直接執行，不經過背景工作佇列
+    TASK_QUEUE={"EAGER": True},
+)
+class TeacherSearchTests(TestCase):
+    """教師全文索引的排序、分頁與資料變更後的同步"""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_sample_data(range(25))
+        cls.by_name = Teacher.objects.get(name="教師0")
+        cls.by_name.name = "鋼琴教師"
+        cls.by_name.save()
+        cls.by_intro = Teacher.objects.get(name="教師1")
+        cls.by_intro.intro = "擅長鋼琴與樂理"
+        cls.by_intro.save()
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def ids(self, query, **params):
+        response = self.client.get("/api/teachers/search/", {"q": query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [row["id"] for row in response.json()["results"]]
+
+    def test_name_matches_rank_first(self):
+        self.assertEqual(self.ids("鋼琴"), [self.by_name.pk, self.by_intro.pk])
+
+    def test_results_are_paginated(self):
+        first = self.client.get("/api/teachers/search/", {"q": "教師"}).json()
+        self.assertEqual(first["count"], 25)
+        second = self.ids("教師", page=2)
+        self.assertEqual(len(first["results"]), 20)
+        self.assertEqual(len(second), 5)
+        self.assertFalse({row["id"] for row in first["results"]} & set(second))
+
+    def test_index_follows_updates_and_deletes(self):
+        teacher = Teacher.objects.get(name="教師2")
+        teacher.name = "小提琴老師"
+        teacher.save()
+        self.assertEqual(self.ids("小提琴"), [teacher.pk])
+        self.assertNotIn(teacher.pk, self.ids("教師2"))
+
+        teacher.delete()
+        self.assertEqual(self.ids("小提琴"), [])
+
+
+@override_settings(API_RESPONSE_CACHE={"ENABLED": False}, TASK_QUEUE={"EAGER": True})
+class SearchTokenizerTests(TestCase):
+    """中日韓文字的雙字詞切分與 MATCH 查詢的組成"""
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize("數學老師"), ["數學", "學老", "老師", "師"])
+        self.assertEqual(
+            tokenize("Python程式設計 v3.12"),
+            ["python", "程式", "式設", "設計", "計", "v3", "12"],
+        )
+        self.assertEqual(tokenize("國 English"), ["國", "english"])
+        self.assertEqual(tokenize(None), [])
+
+    def test_build_match_query(self):
+        self.assertEqual(build_match_query("數學老師"), '"數學 學老 老師"')
+        self.assertEqual(build_match_query("數 Pyth"), '"數"* "pyth"*')
+        self.assertEqual(build_match_query("Python數學"), '"python"* "數學"')
+        # 引號與 FTS5 運算子只會成為一般的詞
+        self.assertEqual(
+            build_match_query('"數學" OR NOT pyth* NEAR(a b) -c'),
+            '"數學" "or"* "not"* "pyth"* "near"* "a"* "b"* "c"*',
+        )
+        self.assertEqual(build_match_query('"*()'), "")
+
+    def test_course_search(self):
+        create_sample_data(range(1))
+        teacher = Teacher.objects.get()
+        python, math = (
+            Course.objects.create(
+                subject=subject,
+                teacher=teacher,
+                description=description,
+                price=Decimal(500),
+                location="線上",
+            )
+            for subject, description in (
+                ("Python 入門", "程式設計基礎"),
+                ("國中數學", "代數與幾何"),
+            )
+        )
+
+        def ids(query):
+            response = self.client.get("/api/courses/search/", {"q": query})
+            self.assertEqual(response.status_code, 200)
+            return [row["id"] for row in response.json()["results"]]
+
+        self.assertEqual(ids("pyth"), [python.pk])
+        self.assertEqual(ids("程式"), [python.pk])
+        self.assertEqual(ids("中數"), [math.pk])
+        self.assertEqual(ids("數學 幾何"), [math.pk])
+        self.assertEqual(ids("數學 程式"), [])
+        self.assertEqual(ids('數學" OR "python'), [])
+        self.assertEqual(ids('"*'), [])
+
+
+@override_settings(API_RESPONSE_CACHE={"ENABLED": False})
+class KeysetPaginationTests(TestCase):
+    """游標分頁的前後翻頁、同一建立時間的資料與無效的游標"""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_sample_data(range(2))
+        course = Course.objects.first()
+        Review.objects.bulk_create(
+            Review(course=course, rating="4", comment=str(index)) for index in range(5)
+        )
+        # 前五筆建立時間相同，只能依 id 區分
+        now = timezone.now()
+        pks = list(Review.objects.order_by("pk").values_list("pk", flat=True))
+        Review.objects.filter(pk__in=pks[:5]).update(created_at=now)
+        Review.objects.filter(pk__in=pks[5:]).update(
+            created_at=now - datetime.timedelta(hours=1)
+        )
+        cls.expected = sorted(
+            Review.objects.values_list("created_at", "pk"), reverse=True
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        patcher = mock.patch.object(KeysetPagination, "page_size", 2)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_next_and_previous_links(self):
+        pages = []
+        url = "/api/reviews/?pagination=cursor"
+        while url:
+            data = self.client.get(url).json()
+            self.assertNotIn("count", data)
+            pages.append([row["id"] for row in data["results"]])
+            url = data["next"]
+        self.assertEqual(
+            [pk for page in pages for pk in page], [pk for _, pk in self.expected]
+        )
+        self.assertEqual([len(page) for page in pages], [2, 2, 2, 1])
+
+        # 從最後一頁往前翻，回到第一頁
+        url = data["previous"]
+        for page in reversed(pages[:-1]):
+            data = self.client.get(url).json()
+            self.assertEqual([row["id"] for row in data["results"]], page)
+            url = data["previous"]
+        self.assertIsNone(url)
+
+    def test_invalid_cursor(self):
+        for cursor in ("not-a-cursor", "Zg==", "ZnxiYWR8MQ=="):
+            with self.subTest(cursor=cursor):
+                response = self.client.get("/api/reviews/", {"cursor": cursor})
+                self.assertEqual(response.status_code, 404)
+
+    def test_other_actions_keep_page_numbers(self):
+        response = self.client.get(
+            "/api/courses/search/", {"q": "課程", "pagination": "cursor"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("count", response.json())
+        response = self.client.get(
+            f"/api/courses/by_teacher/{Teacher.objects.first().pk}/",
+            {"pagination": "cursor"},
+        )
+        self.assertNotIn("count", response.json())
+
+
+@override_settings(API_RESPONSE_CACHE={"ENABLED": True, "ALIAS": "api", "TIMEOUT": 60})
+class ResponseCacheTests(TestCase):
+    """回應快取的命中與依賴模型寫入後的失效"""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_sample_data(range(2))
+
+    def setUp(self):
+        self.client = APIClient()
+        get_cache().clear()
+        self.addCleanup(get_cache().clear)
+
+    def get(self, url, params=None):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response["X-Cache"], response.json()
+
+    def test_miss_then_hit(self):
+        self.assertEqual(self.get("/api/courses/", {"page": 1})[0], "MISS")
+        self.assertEqual(self.get("/api/courses/", {"page": 1})[0], "HIT")
+        # 查詢參數不同時各自快取
+        self.assertEqual(self.get("/api/courses/", {"page": 1, "x": 1})[0], "MISS")
+        course = Course.objects.first()
+        self.assertEqual(self.get(f"/api/courses/{course.pk}/")[0], "MISS")
+        self.assertEqual(self.get(f"/api/courses/{course.pk}/")[0], "HIT")
+
+    def test_related_write_evicts(self):
+        self.get("/api/courses/")
+        # 學生不在課程的依賴中
+        Student.objects.first().save()
+        self.assertEqual(self.get("/api/courses/")[0], "HIT")
+
+        teacher = Teacher.objects.get(name="教師0")
+        teacher.name = "新名字"
+        teacher.save()
+        outcome, data = self.get("/api/courses/")
+        self.assertEqual(outcome, "MISS")
+        self.assertIn("新名字", [row["teacher_name"] for row in data["results"]])
+        self.assertEqual(self.get("/api/courses/")[0], "HIT")
+
+    def test_batch_update_without_signals_evicts(self):
+        # 其他行程的批次指令不觸發訊號，快取鍵中的 MAX(updated_at) 讓舊回應失效
+        course = Course.objects.first()
+        url = f"/api/courses/{course.pk}/"
+        for path in (url, "/api/courses/"):
+            self.get(path)
+        gazetteer = load_gazetteer()
+        Course.objects.update(location="高雄市")
+        self.assertEqual(self.get(url)[0], "HIT")
+        geocode_courses(gazetteer, overwrite=True)
+        outcome, data = self.get(url)
+        self.assertEqual(outcome, "MISS")
+        self.assertEqual(data["latitude"], gazetteer["高雄市"][0])
+        self.assertEqual(self.get("/api/courses/")[0], "MISS")
+
+
+@override_settings(API_RESPONSE_CACHE={"ENABLED": False})
+class ConditionalRequestTests(TestCase):
+    """ETag 的 304 回應與 If-Match 樂觀鎖"""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_sample_data(range(2))
+        cls.course = Course.objects.first()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = f"/api/courses/{self.course.pk}/"
+
+    def test_if_none_match(self):
+        for url in (self.url, "/api/courses/"):
+            with self.subTest(url=url):
+                etag = self.client.get(url)["ETag"]
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response["ETag"], etag)
+
+        # 資料更新後 ETag 改變
+        etag = self.client.get(self.url)["ETag"]
+        self.course.price = Decimal(900)
+        self.course.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_if_match(self):
+        stale = self.client.get(self.url)["ETag"]
+        # 其他用戶端在這之後修改了資料
+        Course.objects.filter(pk=self.course.pk).update(
+            updated_at=timezone.now() + datetime.timedelta(seconds=1)
+        )
+        response = self.client.patch(
+            self.url, {"price": "700"}, HTTP_IF_MATCH=stale, format="json"
+        )
+        self.assertEqual(response.status_code, 412)
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.price, Decimal(500))
+
+        current = response["ETag"]
+        self.assertEqual(current, self.client.get(self.url)["ETag"])
+        response = self.client.patch(
+            self.url, {"price": "700"}, HTTP_IF_MATCH=current, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], current)
+        self.assertEqual(response["ETag"], self.client.get(self.url)["ETag"])
+
+
+@override_settings(DEBUG=False)
+class SchemaArtifactTests(TestCase):
+    """預先產生的 OpenAPI 文件：ETag / 304 與檔案不存在時的 503"""
+
+    def setUp(self):
+        self.client = APIClient()
+        schema_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(schema_dir.cleanup)
+        self.schema_dir = Path(schema_dir.name)
+        settings_override = override_settings(API_SCHEMA_DIR=self.schema_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_missing_artifact(self):
+        response = self.client.get("/swagger.json")
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("generate_schema", response.json()["detail"])
+
+    def test_etag(self):
+        call_command("generate_schema", output_dir=self.schema_dir, stdout=StringIO())
+        response = self.client.get("/swagger.json")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("/api/courses/", json.loads(response.content)["paths"])
+        etag = response["ETag"]
+        self.assertIn("no-cache", response["Cache-Control"])
+
+        response = self.client.get("/swagger.json", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        self.assertFalse(response.content)
+
+        # 重新產生不同內容的文件後 ETag 改變
+        path = self.schema_dir / "openapi.json"
+        path.write_bytes(b"{}")
+        os.utime(path, ns=(0, 0))
+        response = self.client.get("/swagger.json", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+@override_settings(API_RESPONSE_CACHE={"ENABLED": False})
+class ExportTests(TestCase):
+    """串流匯出：NDJSON / CSV、Accept 內容協商與不支援的格式"""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_sample_data(range(5))
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def export(self, params=None, **headers):
+        response = self.client.get("/api/courses/export/", params, **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b"".join(response.streaming_content).decode()
+
+    def test_ndjson(self):
+        with mock.patch.object(views.CourseViewSet, "export_chunk_size", 2):
+            response = self.client.get("/api/courses/export/")
+            chunks = list(response.streaming_content)
+        self.assertEqual(
+            response["Content-Type"], "application/x-ndjson; charset=utf-8"
+        )
+        self.assertIn('filename="courses.ndjson"', response["Content-Disposition"])
+        # 每批 2 筆，分 3 次送出
+        self.assertEqual(len(chunks), 3)
+        rows = [json.loads(line) for line in b"".join(chunks).decode().splitlines()]
+        self.assertEqual(
+            sorted(row["subject"] for row in rows), [f"課程{i}" for i in range(5)]
+        )
+
+    def test_csv(self):
+        teacher = Teacher.objects.get(name="教師3")
+        response, content = self.export(
+            {"output": "csv", "fields": "id,subject", "teacher_id": teacher.pk}
+        )
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertIn('filename="courses.csv"', response["Content-Disposition"])
+        course = Course.objects.get(teacher=teacher)
+        self.assertEqual(
+            list(csv.reader(StringIO(content))),
+            [["id", "subject"], [str(course.pk), "課程3"]],
+        )
+
+    def test_accept_negotiation(self):
+        response, content = self.export(HTTP_ACCEPT="text/csv")
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertEqual(len(content.splitlines()), 6)
+
+        response, content = self.export(HTTP_ACCEPT="application/x-ndjson")
+        self.assertTrue(response["Content-Type"].startswith("application/x-ndjson"))
+        self.assertEqual(len(content.splitlines()), 5)
+
+        # ?output= 優先於 Accept
+        response, _ = self.export({"output": "ndjson"}, HTTP_ACCEPT="text/csv")
+        self.assertTrue(response["Content-Type"].startswith("application/x-ndjson"))
+
+    def test_invalid_output(self):
+        response = self.client.get("/api/courses/export/", {"output": "xml"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("output", response.json())
+
+
+@override_settings(API_RESPONSE_CACHE={"ENABLED": False})
+class SparseFieldsTests(TestCase):
+    """?fields= / ?omit= 只讀取需要的資料行，未知的欄位回傳 400"""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_sample_data(range(2))
+        cls.teacher = Teacher.objects.first()
+        cls.course = Course.objects.first()
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def select_columns(self, url, table):
+        """回傳請求的資料與查詢 ``table`` 時 SELECT 的欄位"""
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        selects = [
+            query["sql"].split(" FROM ")[0]
+            for query in ctx.captured_queries
+            if query["sql"].startswith("SELECT")
+            and f' FROM "{table}"' in query["sql"]
+            and "COUNT(" not in query["sql"]
+        ]
+        self.assertEqual(len(selects), 1, ctx.captured_queries)
+        columns = re.findall(r'"(\w+)"\."(\w+)"', selects[0])
+        return response.json(), {f"{table}.{column}" for table, column in columns}
+
+    def test_retrieve_only_selected_columns(self):
+        data, columns = self.select_columns(
+            f"/api/teachers/{self.teacher.pk}/?fields=id,name", "teachers"
+        )
+        self.assertEqual(data, {"id": self.teacher.pk, "name": "教師0"})
+        # 其餘欄位只有 ETag 需要的 updated_at 與關聯的外鍵
+        self.assertEqual(
+            columns,
+            {
+                "teachers.id",
+                "teachers.name",
+                "teachers.user_id",
+                "teachers.updated_at",
+                "users.id",
+                "users.updated_at",
+            },
+        )
+
+        data, columns = self.select_columns(
+            f"/api/courses/{self.course.pk}/?omit=teacher_name,description", "courses"
+        )
+        self.assertNotIn("teacher_name", data)
+        self.assertIn("teacher_email", data)
+        self.assertIn("teachers.email", columns)
+        self.assertNotIn("teachers.name", columns)
+        self.assertNotIn("courses.description", columns)
+
+    def test_list_only_selected_columns(self):
+        data, columns = self.select_columns("/api/teachers/?fields=id,name", "teachers")
+        self.assertEqual([set(row) for row in data["results"]], [{"id", "name"}] * 2)
+        self.assertEqual(columns, {"teachers.id", "teachers.name"})
+
+        data, columns = self.select_columns(
+            "/api/teachers/?omit=email,phone", "teachers"
+        )
+        self.assertNotIn("email", data["results"][0])
+        self.assertFalse({"teachers.email", "teachers.phone"} & columns)
+
+    def test_empty_fields_selects_everything(self):
+        full = self.client.get("/api/teachers/").json()["results"]
+        for url in ("/api/teachers/?fields=", "/api/teachers/?fields=,&omit="):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json()["results"], full)
+
+    def test_unknown_fields(self):
+        for url in (
+            "/api/teachers/?fields=id,unknown",
+            "/api/teachers/?omit=intro",
+            f"/api/teachers/{self.teacher.pk}/?fields=unknown",
+            f"/api/courses/{self.course.pk}/?omit=unknown",
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("fields", response.json())
@@ -0,0 +1,138 @@
+"""
+列表的快速序列化
+
+``ModelSerializer`` 每一筆資料都要建立模型實例，再逐一呼叫 DRF 欄位的
+``get_attribute`` / ``to_representation``。熱門的列表端點只輸出少數欄位，
+:class:`ValuesSerializer` 改用 ``.values()`` 直接取出需要的欄位（包含
+``teacher__name`` 等關聯欄位，由同一個 JOIN 取得），只對需要轉換的欄位
+（例如 Decimal 轉為字串）呼叫原本 DRF 欄位的 ``to_representation``。
+
+每一筆資料都是由 str / int / float / bool 組成的 dict，交由原本的 JSONRenderer
+以標準函式庫的 C 編碼器輸出，結果與 ``ModelSerializer`` 逐位元組相同。
+"""
+
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from .fields import FieldSelection
+
+# to_representation 對資料庫取出的值不會有任何改變的欄位，直接沿用原值
+PASSTHROUGH_FIELDS = (
+    serializers.CharField,
+    serializers.EmailField,
+    serializers.IntegerField,
+    serializers.BooleanField,
+)
+
+
+class ValuesSerializer:
+    """
+    唯讀的列表序列化器，輸出與 ``serializer_class`` 相同
+
+    只支援一般欄位、以 ``source`` 指向關聯欄位（例如 ``teacher.name``）的欄位
+    以及主鍵關聯欄位。
+    """
+
+    serializer_class = None
+
+    def __init__(self, instance=None, many=False, selection=None, **kwargs):
+        self.instance = instance
+        self.many = many
+        self.columns = self.get_columns(selection)
+
+    @classmethod
+    def get_all_columns(cls):
+        """回傳 [(輸出欄位, values() 鍵, 轉換函式或 None)]，每個類別只計算一次"""
+        if "_columns" not in cls.__dict__:
+            if cls.serializer_class is None:
+                raise ImproperlyConfigured(f"{cls.__name__} 需要設定 serializer_class")
+            columns = []
+            for name, field in cls.serializer_class().fields.items():
+                if field.write_only:
+                    continue
+                if isinstance(field, serializers.PrimaryKeyRelatedField):
+                    # values() 取出的即為主鍵
+                    columns.append((name, f"{field.source}_id", None))
+                    continue
+                if field.source == "*" or isinstance(
+                    field, (serializers.SerializerMethodField, serializers.Serializer)
+                ):
+                    raise ImproperlyConfigured(
+                        f"{cls.__name__} 不支援欄位 {name}（{type(field).__name__}）"
+                    )
+                convert = (
+                    None
+                    if type(field) in PASSTHROUGH_FIELDS
+                    else field.to_representation
+                )
+                columns.append((name, "__".join(field.source_attrs), convert))
+            cls._columns = columns
+        return cls._columns
+
+    @classmethod
+    def get_columns(cls, selection=None):
+        """
+        依 ``?fields=`` / ``?omit=`` 篩選欄位
+        （:class:`~myapps.myapps.fields.FieldSelection`）
+        """
+        columns = cls.get_all_columns()
+        if selection is None:
+            return columns
+        names = set(selection.apply(name for name, _, _ in columns))
+        return [column for column in columns if column[0] in names]
+
+    @classmethod
+    def values(cls, queryset, *extra, selection=None):
+        """
+        回傳只取出所需欄位的 values() 查詢
+
+        ``extra`` 為分頁等額外需要的欄位；未選取的關聯欄位不會產生 JOIN。
+        """
+        fields = [key for _, key, _ in cls.get_columns(selection)]
+        return queryset.values(*fields, *(name for name in extra if name not in fields))
+
+    def to_representation(self, row):
+        data = {}
+        for name, key, convert in self.columns:
+            value = row[key]
+            if convert is not None and value is not None:
+                value = convert(value)
+            data[name] = value
+        return data
+
+    @property
+    def data(self):
+        if self.many:
+            return [self.to_representation(row) for row in self.instance]
+        return self.to_representation(self.instance)
+
+
+class ValuesListMixin:
+    """
+    ViewSet 的 ``list`` 改以 ``values_serializer_class`` 產生回應
+
+    篩選、排序與分頁仍沿用 ``get_queryset`` / ``filter_queryset`` / 分頁器。
+    """
+
+    values_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        # ?expand= 需要巢狀序列化器，改走一般的序列化流程
+        if self.values_serializer_class is None or request.query_params.get("expand"):
+            return super().list(request, *args, **kwargs)
+        return self.values_response(self.filter_queryset(self.get_queryset()))
+
+    def values_response(self, queryset, serializer_class=None):
+        """以快速序列化器回傳（分頁後的）列表回應"""
+        serializer_class = serializer_class or self.values_serializer_class
+        selection = FieldSelection.from_request(self.request)
+        # 游標分頁需要 created_at 與 id 來產生游標
+        time_field = getattr(self.paginator, "time_field", None)
+        extra = ("id", time_field) if time_field else ()
+        rows = serializer_class.values(queryset, *extra, selection=selection)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            serializer = serializer_class(page, many=True, selection=selection)
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer_class(rows, many=True, selection=selection).data)
@@ -1,9 +1,8 @@
-from rest_framework import viewsets, status
+from rest_framework import viewsets
 from rest_framework.decorators import api_view, action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
-from django.shortcuts import get_object_or_404
-from django.db.models import Q
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
@@ -17,7 +16,36 @@ from .serializers import (
     ReviewSerializer,
     TeacherListSerializer,
     CourseListSerializer,
+    TeacherListValuesSerializer,
+    CourseListValuesSerializer,
+    CourseLeaderboardSerializer,
+    CourseLeaderboardValuesSerializer,
+    CourseNearbySerializer,
+    CourseNearbyValuesSerializer,
+    CourseValuesSerializer,
+    BookingValuesSerializer,
+    ReviewValuesSerializer,
 )
+from .analytics import parse_month_range, teacher_dashboard
+from .cache import CachedResponseMixin, get_stats
+from .conditional import ConditionalRequestMixin
+from .expand import ExpandMixin
+from .export import ExportMixin
+from .facets import ORDERINGS, course_facets, filter_courses, order_courses
+from .fields import SparseFieldsMixin
+from .geo import DEFAULT_RADIUS_KM, MAX_RADIUS_KM, nearby_courses, parse_near
+from .leaderboard import BOARDS, LeaderboardPagination, leaderboard_queryset
+from .pagination import KeysetPaginationMixin
+from .schedule import (
+    CalendarMixin,
+    busy_bookings,
+    free_windows,
+    parse_availability_options,
+    parse_calendar_range,
+)
+from .search import search_courses, search_teachers
+from .similarity import similar_courses
+from .values import ValuesListMixin
 
 
 # API 概覽視圖
@@ -27,6 +55,8 @@ def api_overview(request):
     data = {
         "message": "歡迎使用教學平台 API",
         "version": "1.0",
+        "cache_stats": "GET /api/cache/stats/",
+        "metrics": "GET /metrics",
         "endpoints": {
             "users": {
                 "list": "GET /api/users/",
@@ -42,6 +72,13 @@ def api_overview(request):
                 "update": "PUT /api/teachers/{id}/",
                 "delete": "DELETE /api/teachers/{id}/",
                 "search": "GET /api/teachers/search/?q=keyword",
+                "calendar": (
+                    "GET /api/teachers/{id}/calendar/?from=2025-07-21&to=2025-07-28"
+                ),
+                "availability": "GET /api/teachers/{id}/availability/?from=2025-07-21",
+                "analytics": (
+                    "GET /api/teachers/{id}/analytics/?from=2025-01&to=2025-12"
+                ),
             },
             "students": {
                 "list": "GET /api/students/",
@@ -49,6 +86,9 @@ def api_overview(request):
                 "detail": "GET /api/students/{id}/",
                 "update": "PUT /api/students/{id}/",
                 "delete": "DELETE /api/students/{id}/",
+                "calendar": (
+                    "GET /api/students/{id}/calendar/?from=2025-07-21&to=2025-07-28"
+                ),
             },
             "courses": {
                 "list": "GET /api/courses/",
@@ -57,6 +97,15 @@ def api_overview(request):
                 "update": "PUT /api/courses/{id}/",
                 "delete": "DELETE /api/courses/{id}/",
                 "by_teacher": "GET /api/courses/by_teacher/{teacher_id}/",
+                "search": "GET /api/courses/search/?q=keyword",
+                "faceted": (
+                    "GET /api/courses/faceted/"
+                    "?location=台北市&price_max=1000&ordering=price"
+                ),
+                "nearby": "GET /api/courses/nearby/?near=25.0330,121.5654&radius=5",
+                "top_rated": "GET /api/courses/top_rated/?subject=數學",
+                "trending": "GET /api/courses/trending/?location=台北",
+                "similar": "GET /api/courses/{id}/similar/",
             },
             "bookings": {
                 "list": "GET /api/bookings/",
@@ -77,22 +126,42 @@ def api_overview(request):
     return Response(data)
 
 
-class UserViewSet(viewsets.ModelViewSet):
+@api_view(["GET"])
+def cache_stats(request):
+    """API 回應快取的命中統計"""
+    return Response(get_stats())
+
+
+class UserViewSet(
+    ConditionalRequestMixin,
+    CachedResponseMixin,
+    SparseFieldsMixin,
+    KeysetPaginationMixin,
+    viewsets.ModelViewSet,
+):
     """使用者 CRUD ViewSet"""
 
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [AllowAny]
+    cache_dependencies = (User,)
 
     def get_queryset(self):
         queryset = User.objects.all()
         role = self.request.query_params.get("role", None)
         if role is not None:
             queryset = queryset.filter(role=role)
-        return queryset.order_by("-created_at")
+        return queryset.order_by("-created_at", "-id")
 
 
-class TeacherViewSet(viewsets.ModelViewSet):
+class TeacherViewSet(
+    ConditionalRequestMixin,
+    CachedResponseMixin,
+    SparseFieldsMixin,
+    ValuesListMixin,
+    CalendarMixin,
+    viewsets.ModelViewSet,
+):
     """
     教師管理 API
 
@@ -103,11 +172,19 @@ class TeacherViewSet(viewsets.ModelViewSet):
     - 更新教師資料
     - 刪除教師
     - 搜尋教師（支援姓名、Email、介紹搜尋）
+    - 教師的預約行事曆
+    - 教師儀表板統計
     """
 
     queryset = Teacher.objects.select_related("user").all()
     serializer_class = TeacherSerializer
     permission_classes = [AllowAny]
+    cache_dependencies = (Teacher, User)
+    conditional_related = ("user",)
+    values_serializer_class = TeacherListValuesSerializer
+    calendar_lookup = "course__teacher"
+    booking_serializer_class = BookingSerializer
+    max_analytics_months = 36
 
     def get_serializer_class(self):
         if self.action == "list":
@@ -140,46 +217,183 @@ class TeacherViewSet(viewsets.ModelViewSet):
             openapi.Parameter(
                 "q",
                 openapi.IN_QUERY,
-                description="搜尋關鍵字（搜尋姓名、Email、介紹）",
+                description="搜尋關鍵字（搜尋姓名、Email、介紹、學歷、證照、教學經驗）",
                 type=openapi.TYPE_STRING,
                 required=True,
             )
         ],
-        operation_description="搜尋教師，支援多欄位搜尋",
+        operation_description="搜尋教師，使用全文索引並依相關度排序，結果分頁回傳",
         responses={200: TeacherListSerializer(many=True)},
     )
     @action(detail=False, methods=["get"])
     def search(self, request):
         """搜尋教師"""
-        query = request.query_params.get("q", "")
+        query = request.query_params.get("q", "").strip()
         if query:
-            teachers = Teacher.objects.filter(
-                Q(name__icontains=query)
-                | Q(email__icontains=query)
-                | Q(intro__icontains=query)
-            ).select_related("user")
-            serializer = TeacherListSerializer(teachers, many=True)
-            return Response(serializer.data)
-        return Response([])
+            teachers = search_teachers(Teacher.objects.select_related("user"), query)
+        else:
+            teachers = Teacher.objects.none()
+        page = self.paginate_queryset(teachers)
+        serializer = TeacherListSerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(
+                "from",
+                openapi.IN_QUERY,
+                description="開始日期或日期時間（預設為本週一）",
+                type=openapi.TYPE_STRING,
+            ),
+            openapi.Parameter(
+                "to",
+                openapi.IN_QUERY,
+                description="結束日期或日期時間，不含（預設為開始後七天）",
+                type=openapi.TYPE_STRING,
+            ),
+            openapi.Parameter(
+                "day_start",
+                openapi.IN_QUERY,
+                description="每天可預約的開始時間 HH:MM（預設 09:00）",
+                type=openapi.TYPE_STRING,
+            ),
+            openapi.Parameter(
+                "day_end",
+                openapi.IN_QUERY,
+                description="每天可預約的結束時間 HH:MM（預設 21:00）",
+                type=openapi.TYPE_STRING,
+            ),
+            openapi.Parameter(
+                "min_minutes",
+                openapi.IN_QUERY,
+                description="只列出至少幾分鐘的空檔（預設 60）",
+                type=openapi.TYPE_INTEGER,
+            ),
+        ],
+        operation_description="教師在指定期間內可預約的空檔（以一次查詢取得已佔用的時段後計算）",
+    )
+    @action(detail=True, methods=["get"])
+    def availability(self, request, pk=None):
+        """教師的空檔"""
+        teacher = self.get_object()
+        params = request.query_params
+        start, end = parse_calendar_range(params, self.max_calendar_days)
+        day_start, day_end, min_length = parse_availability_options(params)
+        busy = busy_bookings(teacher.pk, start, end).values_list("start_at", "end_at")
+        windows = free_windows(busy, start, end, day_start, day_end, min_length)
+        return Response(
+            {
+                "from": start,
+                "to": end,
+                "windows": [
+                    {"start_at": window_start, "end_at": window_end}
+                    for window_start, window_end in windows
+                ],
+            }
+        )
 
-class StudentViewSet(viewsets.ModelViewSet):
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(
+                "from",
+                openapi.IN_QUERY,
+                description="開始月份 YYYY-MM（預設為 11 個月前）",
+                type=openapi.TYPE_STRING,
+            ),
+            openapi.Parameter(
+                "to",
+                openapi.IN_QUERY,
+                description="結束月份 YYYY-MM，包含（預設為本月）",
+                type=openapi.TYPE_STRING,
+            ),
+            openapi.Parameter(
+                "course",
+                openapi.IN_QUERY,
+                description="只統計指定課程 ID",
+                type=openapi.TYPE_INTEGER,
+            ),
+        ],
+        operation_description="教師每月各狀態的預約數、營收（已完成預約）與評分趨勢，由每日統計表彙總",
+    )
+    @action(detail=True, methods=["get"])
+    def analytics(self, request, pk=None):
+        """教師儀表板統計"""
+        teacher = self.get_object()
+        start, end = parse_month_range(request.query_params, self.max_analytics_months)
+        course_id = request.query_params.get("course")
+        if course_id is not None:
+            try:
+                course_id = int(course_id)
+            except ValueError:
+                raise ValidationError({"course": "請輸入課程 ID"})
+        return Response(teacher_dashboard(teacher.pk, start, end, course_id))
+
+
+class StudentViewSet(
+    ConditionalRequestMixin,
+    CachedResponseMixin,
+    SparseFieldsMixin,
+    CalendarMixin,
+    viewsets.ModelViewSet,
+):
     """學生 CRUD ViewSet"""
 
     queryset = Student.objects.select_related("user").all()
     serializer_class = StudentSerializer
     permission_classes = [AllowAny]
+    cache_dependencies = (Student, User)
+    conditional_related = ("user",)
+    calendar_lookup = "student"
+    booking_serializer_class = BookingSerializer
 
     def get_queryset(self):
         return Student.objects.select_related("user").order_by("user__name")
 
 
-class CourseViewSet(viewsets.ModelViewSet):
+LEADERBOARD_PARAMETERS = [
+    openapi.Parameter(
+        "subject",
+        openapi.IN_QUERY,
+        description="按科目篩選（完全相符）",
+        type=openapi.TYPE_STRING,
+    ),
+    openapi.Parameter(
+        "location",
+        openapi.IN_QUERY,
+        description="按上課地點篩選（完全相符）",
+        type=openapi.TYPE_STRING,
+    ),
+    openapi.Parameter(
+        "cursor",
+        openapi.IN_QUERY,
+        description="上一頁回應中 next 連結帶的游標",
+        type=openapi.TYPE_STRING,
+    ),
+]
+
+
+class CourseViewSet(
+    ExpandMixin,
+    ConditionalRequestMixin,
+    CachedResponseMixin,
+    SparseFieldsMixin,
+    KeysetPaginationMixin,
+    ValuesListMixin,
+    ExportMixin,
+    viewsets.ModelViewSet,
+):
     """課程 CRUD ViewSet"""
 
     queryset = Course.objects.select_related("teacher").all()
     serializer_class = CourseSerializer
     permission_classes = [AllowAny]
+    cache_dependencies = (Course, Teacher, User, Review)
+    # 座標與排行分數由 geocode_courses / recompute_leaderboard 在其他行程中批次寫入
+    cache_freshness_models = (Course,)
+    conditional_related = ("teacher",)
+    values_serializer_class = CourseListValuesSerializer
+    export_serializer_class = CourseValuesSerializer
+    keyset_actions = ("list", "by_teacher")
 
     def get_serializer_class(self):
         if self.action == "list":
@@ -191,28 +405,193 @@ class CourseViewSet(viewsets.ModelViewSet):
         teacher_id = self.request.query_params.get("teacher_id", None)
         if teacher_id is not None:
             queryset = queryset.filter(teacher_id=teacher_id)
-        return queryset.order_by("-created_at")
+        return queryset.order_by("-created_at", "-id")
 
     @action(detail=False, methods=["get"], url_path="by_teacher/(?P<teacher_id>[^/.]+)")
     def by_teacher(self, request, teacher_id=None):
         """根據教師 ID 獲取課程"""
-        courses = Course.objects.filter(teacher_id=teacher_id).select_related("teacher")
-        serializer = CourseListSerializer(courses, many=True)
-        return Response(serializer.data)
+        courses = Course.objects.filter(teacher_id=teacher_id).order_by(
+            "-created_at", "-id"
+        )
+        return self.values_response(courses)
 
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(
+                "price_min",
+                openapi.IN_QUERY,
+                description="最低價格（包含）",
+                type=openapi.TYPE_NUMBER,
+            ),
+            openapi.Parameter(
+                "price_max",
+                openapi.IN_QUERY,
+                description="最高價格（包含）",
+                type=openapi.TYPE_NUMBER,
+            ),
+            openapi.Parameter(
+                "location",
+                openapi.IN_QUERY,
+                description="上課地點，多個地點以逗號分隔",
+                type=openapi.TYPE_STRING,
+            ),
+            openapi.Parameter(
+                "min_rating",
+                openapi.IN_QUERY,
+                description="最低平均評分",
+                type=openapi.TYPE_NUMBER,
+            ),
+            openapi.Parameter(
+                "subject",
+                openapi.IN_QUERY,
+                description="科目（完全相符）",
+                type=openapi.TYPE_STRING,
+            ),
+            openapi.Parameter(
+                "ordering",
+                openapi.IN_QUERY,
+                description=f"排序方式：{', '.join(ORDERINGS)}（預設 -created_at）",
+                type=openapi.TYPE_STRING,
+            ),
+        ],
+        operation_description=(
+            "依價格、地點、評分與科目篩選課程，"
+            "回應的 facets 為目前條件下的價格分布、地點與評分統計"
+        ),
+    )
+    @action(detail=False, methods=["get"])
+    def faceted(self, request):
+        """分面搜尋課程"""
+        queryset = filter_courses(
+            Course.objects.select_related("teacher"), request.query_params
+        )
+        response = self.values_response(order_courses(queryset, request.query_params))
+        response.data["facets"] = course_facets(queryset)
+        return response
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(
+                "near",
+                openapi.IN_QUERY,
+                description="中心點座標「緯度,經度」，例如 25.0330,121.5654",
+                type=openapi.TYPE_STRING,
+                required=True,
+            ),
+            openapi.Parameter(
+                "radius",
+                openapi.IN_QUERY,
+                description=(
+                    f"搜尋半徑（公里，預設 {DEFAULT_RADIUS_KM}，最多 {MAX_RADIUS_KM}）"
+                ),
+                type=openapi.TYPE_NUMBER,
+            ),
+        ],
+        operation_description="指定座標附近的課程，依距離由近到遠排序（沒有座標的課程不會出現）",
+        responses={200: CourseNearbySerializer(many=True)},
+    )
+    @action(detail=False, methods=["get"])
+    def nearby(self, request):
+        """附近的課程"""
+        latitude, longitude, radius = parse_near(request.query_params)
+        queryset = nearby_courses(
+            Course.objects.select_related("teacher"), latitude, longitude, radius
+        )
+        return self.values_response(queryset, CourseNearbyValuesSerializer)
+
+    @swagger_auto_schema(
+        operation_description="內容（科目、描述）相近的課程，地點與價格級距相同者優先",
+        responses={200: CourseListSerializer(many=True)},
+    )
+    @action(detail=True, methods=["get"])
+    def similar(self, request, pk=None):
+        """相似課程"""
+        course = self.get_object()
+        rows = list(
+            CourseListValuesSerializer.values(similar_courses(course.pk), "similarity")
+        )
+        serializer = CourseListValuesSerializer(rows, many=True)
+        results = [
+            {**data, "similarity": row["similarity"]}
+            for data, row in zip(serializer.data, rows)
+        ]
+        return Response({"course": course.pk, "results": results})
+
+    def leaderboard_response(self, board):
+        """依排行分數由高到低以游標分頁回傳課程"""
+        self._paginator = LeaderboardPagination(BOARDS[board])
+        queryset = leaderboard_queryset(Course.objects.all(), self.request.query_params)
+        return self.values_response(queryset, CourseLeaderboardValuesSerializer)
 
-class BookingViewSet(viewsets.ModelViewSet):
+    @swagger_auto_schema(
+        manual_parameters=LEADERBOARD_PARAMETERS,
+        operation_description="依貝氏加權評分排序的課程（評價數少的課程不會因少數高分評價排在前面）",
+        responses={200: CourseLeaderboardSerializer(many=True)},
+    )
+    @action(detail=False, methods=["get"])
+    def top_rated(self, request):
+        """評分最高的課程"""
+        return self.leaderboard_response("top_rated")
+
+    @swagger_auto_schema(
+        manual_parameters=LEADERBOARD_PARAMETERS,
+        operation_description="依最近預約熱門度排序的課程",
+        responses={200: CourseLeaderboardSerializer(many=True)},
+    )
+    @action(detail=False, methods=["get"])
+    def trending(self, request):
+        """熱門課程"""
+        return self.leaderboard_response("trending")
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(
+                "q",
+                openapi.IN_QUERY,
+                description="搜尋關鍵字（搜尋科目、課程描述，支援中英混合）",
+                type=openapi.TYPE_STRING,
+                required=True,
+            )
+        ],
+        operation_description="搜尋課程，使用全文索引並依相關度排序，結果分頁回傳",
+        responses={200: CourseListSerializer(many=True)},
+    )
+    @action(detail=False, methods=["get"])
+    def search(self, request):
+        """搜尋課程"""
+        query = request.query_params.get("q", "").strip()
+        if query:
+            courses = search_courses(Course.objects.select_related("teacher"), query)
+        else:
+            courses = Course.objects.none()
+        page = self.paginate_queryset(courses)
+        serializer = CourseListSerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+
+class BookingViewSet(
+    ExpandMixin,
+    ConditionalRequestMixin,
+    CachedResponseMixin,
+    SparseFieldsMixin,
+    KeysetPaginationMixin,
+    ExportMixin,
+    viewsets.ModelViewSet,
+):
     """預約 CRUD ViewSet"""
 
     queryset = Booking.objects.select_related(
-        "course", "student", "course__teacher"
+        "course", "student", "student__user", "course__teacher"
     ).all()
     serializer_class = BookingSerializer
     permission_classes = [AllowAny]
+    cache_dependencies = (Booking, Course, Student, User, Teacher)
+    conditional_related = ("course", "student", "student__user", "course__teacher")
+    export_serializer_class = BookingValuesSerializer
 
     def get_queryset(self):
         queryset = Booking.objects.select_related(
-            "course", "student", "course__teacher"
+            "course", "student", "student__user", "course__teacher"
         ).all()
         status_filter = self.request.query_params.get("status", None)
         student_id = self.request.query_params.get("student_id", None)
@@ -225,37 +604,30 @@ class BookingViewSet(viewsets.ModelViewSet):
         if course_id is not None:
             queryset = queryset.filter(course_id=course_id)
 
-        return queryset.order_by("-created_at")
+        return queryset.order_by("-created_at", "-id")
 
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(
+    ExpandMixin,
+    ConditionalRequestMixin,
+    CachedResponseMixin,
+    SparseFieldsMixin,
+    KeysetPaginationMixin,
+    ExportMixin,
+    viewsets.ModelViewSet,
+):
     """評價 CRUD ViewSet"""
 
     queryset = Review.objects.select_related("course", "course__teacher").all()
     serializer_class = ReviewSerializer
     permission_classes = [AllowAny]
+    cache_dependencies = (Review, Course, Teacher, User)
+    conditional_related = ("course", "course__teacher")
+    export_serializer_class = ReviewValuesSerializer
 
     def get_queryset(self):
         queryset = Review.objects.select_related("course", "course__teacher").all()
         course_id = self.request.query_params.get("course_id", None)
         if course_id is not None:
             queryset = queryset.filter(course_id=course_id)
-        return queryset.order_by("-created_at")
-
-    def create(self, request, *args, **kwargs):
-        """建立評價並更新課程平均評分"""
-        response = super().create(request, *args, **kwargs)
-        if response.status_code == status.HTTP_201_CREATED:
-            # 更新課程平均評分
-            course_id = request.data.get("course")
-            if course_id:
-                course = Course.objects.get(id=course_id)
-                reviews = Review.objects.filter(course=course)
-                if reviews.exists():
-                    avg_rating = (
-                        sum(float(review.rating) for review in reviews)
-                        / reviews.count()
-                    )
-                    course.avg_rating = round(avg_rating, 2)
-                    course.save()
-        return response
+        return queryset.order_by("-created_at", "-id")
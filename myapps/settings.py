@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,6 +46,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",  # CORS middleware should be first
+    "myapps.myapps.metrics.MetricsMiddleware",  # Prometheus 指標（/metrics）
+    "myapps.myapps.profiler.QueryProfilerMiddleware",  # 查詢次數 / 時間分析
+    "myapps.myapps.replicas.ReadReplicaMiddleware",  # GET 請求讀取副本
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -77,13 +81,140 @@ WSGI_APPLICATION = "myapps.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# WAL 讓讀取與寫入互不阻擋，但模式記錄在資料庫檔頭中，每次連線都會改寫檔案；
+# 預設不啟用，避免任何 manage.py 指令改動 git 追蹤的 db.sqlite3，
+# 部署時設定環境變數 SQLITE_WAL=1
+SQLITE_WAL = os.environ.get("SQLITE_WAL", "").lower() in ("1", "true", "yes")
+
+# SQLite 連線時執行的 PRAGMA
+# （可用 SQLITE_WAL=1 python manage.py bench_sqlite 比較效果）：
+# 被鎖定時最多等待 busy_timeout 毫秒而不是直接回報 "database is locked"
+SQLITE_PRAGMAS = {
+    "busy_timeout": 5000,
+    "cache_size": -20000,  # 負值為 KiB，約 20 MB
+    "mmap_size": 134217728,  # 128 MB
+    "temp_store": "MEMORY",
+}
+if SQLITE_WAL:
+    # WAL 下只在 checkpoint 時 fsync
+    SQLITE_PRAGMAS = {"journal_mode": "WAL", "synchronous": "NORMAL", **SQLITE_PRAGMAS}
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
-    }
+        # 保留連線供後續請求使用，不必每個請求重新連線並執行 PRAGMA
+        "CONN_MAX_AGE": 600,
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            "init_command": "; ".join(
+                f"PRAGMA {name}={value}" for name, value in SQLITE_PRAGMAS.items()
+            ),
+            # 交易一開始就取得寫入鎖（BEGIN IMMEDIATE），
+            # 避免讀取後才升級為寫入時的鎖定錯誤
+            "transaction_mode": "IMMEDIATE",
+        },
+    },
+    # 唯讀副本：由 python manage.py sync_replicas 以 VACUUM INTO 從主資料庫產生快照，
+    # 不保留連線，每個請求都會讀到最新的快照
+    "replica": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / "db.replica.sqlite3",
+        "CONN_MAX_AGE": 0,
+        "OPTIONS": {
+            "init_command": "; ".join(
+                ["PRAGMA query_only=ON"]
+                + [
+                    f"PRAGMA {name}={value}"
+                    for name, value in SQLITE_PRAGMAS.items()
+                    if name != "journal_mode"
+                ]
+            ),
+        },
+        "TEST": {"MIRROR": "default"},
+    },
+}
+
+DATABASE_ROUTERS = ["myapps.myapps.replicas.ReadReplicaRouter"]
+
+# 讀寫分離（見 myapps/myapps/replicas.py）：先執行 python manage.py sync_replicas 再啟用
+READ_REPLICAS = {
+    "ENABLED": False,
+    "ALIASES": ["replica"],
+    "STICKY_SECONDS": 10,
+    "COOKIE_NAME": "db_primary",
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # API 回應快取：LocMemCache 超過 MAX_ENTRIES 時依 LRU 淘汰，TIMEOUT 為 TTL（秒）
+    # 多個 worker 需共用快取時可改用：
+    #   "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+    #   "LOCATION": BASE_DIR / ".cache" / "api",
+    "api": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "api-responses",
+        "TIMEOUT": 300,
+        "OPTIONS": {"MAX_ENTRIES": 5000},
+    },
+}
+
+# API 回應快取設定（見 myapps/myapps/cache.py）
+API_RESPONSE_CACHE = {
+    "ENABLED": True,
+    "ALIAS": "api",
+    "TIMEOUT": 300,
 }
 
+# 預先產生的 OpenAPI 文件目錄
+# （python manage.py generate_schema，見 myapps/myapps/schema.py）
+API_SCHEMA_DIR = BASE_DIR / "schema"
+
+# 每個請求的查詢分析與預算（見 myapps/myapps/profiler.py），None 表示不限制
+QUERY_PROFILER = {
+    "ENABLED": True,
+    "HEADERS": True,
+    "MAX_QUERIES": 20,
+    "MAX_DB_TIME_MS": 200,
+    "MAX_DUPLICATES": 5,
+    "STRICT": False,
+}
+
+# Prometheus 指標（見 myapps/myapps/metrics.py）
+# 多個 worker（gunicorn 等）時將 DIRECTORY 設為共用目錄，例如 BASE_DIR / "metrics"
+METRICS = {
+    "ENABLED": True,
+    "DIRECTORY": None,
+    "FLUSH_INTERVAL": 1.0,
+}
+
+# 課程排行榜分數（見 myapps/myapps/leaderboard.py），
+# 以 python manage.py recompute_leaderboard 更新
+LEADERBOARD = {
+    "PRIOR_WEIGHT": 10,
+    "PREMIUM_BOOST": 1.05,
+    "TRENDING_DAYS": 28,
+    "TRENDING_HALF_LIFE_DAYS": 7,
+}
+
+# 背景工作佇列（見 myapps/myapps/taskqueue.py）
+# AUTOSTART 時 WSGI / ASGI 應用程式啟動後在同一個行程中執行 WORKERS 個工作執行緒，
+# 也可以關閉後另外執行 python manage.py run_tasks；EAGER 時工作直接在呼叫處執行
+TASK_QUEUE = {
+    "EAGER": False,
+    "AUTOSTART": True,
+    "WORKERS": 2,
+    "POLL_INTERVAL": 1.0,
+    "MAX_ATTEMPTS": 5,
+    "RETRY_DELAY": 10,
+    "LEASE_SECONDS": 300,
+}
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
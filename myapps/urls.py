@@ -19,13 +19,14 @@ from django.contrib import admin
 from django.urls import path, include, re_path
 from rest_framework.routers import DefaultRouter
 from rest_framework import permissions
-from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
-from myapps.myapps import views
+from myapps.myapps import asyncviews, views
+from myapps.myapps.metrics import metrics_view
+from myapps.myapps.schema import get_precomputed_schema_view
 
-# 建立 Swagger 文檔配置
-schema_view = get_schema_view(
+# 建立 Swagger 文檔配置（文件由 generate_schema 指令預先產生）
+schema_view = get_precomputed_schema_view(
     openapi.Info(
         title="教學平台 API",
         default_version="v1",
@@ -80,24 +81,47 @@ router.register(r"courses", views.CourseViewSet)
 router.register(r"bookings", views.BookingViewSet)
 router.register(r"reviews", views.ReviewViewSet)
 
+# (網址前綴, 路由名稱, 非同步視圖)
+ASYNC_READ_VIEWS = [
+    ("teachers", "teacher", asyncviews.TeacherReadView),
+    ("courses", "course", asyncviews.CourseReadView),
+    ("bookings", "booking", asyncviews.BookingReadView),
+]
+
 urlpatterns = [
     # 管理介面
     path("admin/", admin.site.urls),
     # API 文檔 - Swagger
     re_path(
         r"^swagger(?P<format>\.json|\.yaml)$",
-        schema_view.without_ui(cache_timeout=0),
+        schema_view.without_ui(),
         name="schema-json",
     ),
     path(
         "swagger/",
-        schema_view.with_ui("swagger", cache_timeout=0),
+        schema_view.with_ui("swagger"),
         name="schema-swagger-ui",
     ),
-    path("redoc/", schema_view.with_ui("redoc", cache_timeout=0), name="schema-redoc"),
+    path("redoc/", schema_view.with_ui("redoc"), name="schema-redoc"),
     # API 端點
     path("api/", views.api_overview, name="api_overview"),
+    path("api/cache/stats/", views.cache_stats, name="cache_stats"),
+    # ASGI 部署的非同步唯讀端點
+    *(
+        path(f"api/async/{prefix}/", view.as_view(), name=f"async-{name}-list")
+        for prefix, name, view in ASYNC_READ_VIEWS
+    ),
+    *(
+        path(
+            f"api/async/{prefix}/<int:pk>/",
+            view.as_view(),
+            name=f"async-{name}-detail",
+        )
+        for prefix, name, view in ASYNC_READ_VIEWS
+    ),
     path("api/", include(router.urls)),
+    # Prometheus 指標
+    path("metrics", metrics_view, name="metrics"),
     # DRF 瀏覽式 API 認證
     path("api-auth/", include("rest_framework.urls")),
 ]
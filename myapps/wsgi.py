@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "myapps.settings")
 
 application = get_wsgi_application()
+
+# 在同一個行程中處理背景工作（TASK_QUEUE["AUTOSTART"]，見 myapps/myapps/taskqueue.py）
+from myapps.myapps.taskqueue import autostart
+
+autostart()
@@ -18,6 +18,9 @@ echo "🗄️ 檢查資料庫遷移..."
 uv run python manage.py makemigrations
 uv run python manage.py migrate
 
+echo "📄 產生 API 文件..."
+uv run python manage.py generate_schema
+
 echo "🌐 啟動 Django 開發服務器..."
 echo "服務器將在 http://127.0.0.1:8000/ 啟動"
 echo ""